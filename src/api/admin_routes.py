@@ -13,7 +13,7 @@ from sqlalchemy.orm import Session
 from src.database import get_db
 from src.models.user import User, ApiToken
 from src.services.auth_service import (
-    get_current_user, generate_api_token, generate_random_token
+    get_current_user, generate_api_token, generate_random_token, token_cache
 )
 from src.api.common import templates
 
@@ -40,7 +40,7 @@ def require_admin(request: Request, db: Session = Depends(get_db)) -> User:
 
 
 @router.get("", response_class=HTMLResponse)
-async def admin_page(
+def admin_page(
     request: Request,
     db: Session = Depends(get_db),
     admin: User = Depends(require_admin),
@@ -65,7 +65,7 @@ async def admin_page(
 
 
 @router.post("/users/{user_id}/validate", response_class=JSONResponse)
-async def validate_user(
+def validate_user(
     user_id: int,
     status: str = Form(...),
     db: Session = Depends(get_db),
@@ -88,6 +88,7 @@ async def validate_user(
     old_status = user.status
     user.status = status
     db.commit()
+    token_cache.invalidate_user(user_id)
 
     logger.info(f"Admin {admin.email} a changé le statut de {user.email} : {old_status} -> {status}")
 
@@ -95,7 +96,7 @@ async def validate_user(
 
 
 @router.post("/users/{user_id}/suspend", response_class=JSONResponse)
-async def suspend_user(
+def suspend_user(
     user_id: int,
     db: Session = Depends(get_db),
     admin: User = Depends(require_admin),
@@ -107,6 +108,7 @@ async def suspend_user(
 
     user.status = "suspended"
     db.commit()
+    token_cache.invalidate_user(user_id)
 
     logger.info(f"Admin {admin.email} a suspendu {user.email}")
 
@@ -114,7 +116,7 @@ async def suspend_user(
 
 
 @router.post("/users/{user_id}/token", response_class=JSONResponse)
-async def create_token(
+def create_token(
     user_id: int,
     source: str = Form(...),
     db: Session = Depends(get_db),
@@ -146,6 +148,8 @@ async def create_token(
     )
     db.add(new_token)
     db.commit()
+    # Les anciens tokens sont désactivés : ils ne doivent plus être servis par le cache
+    token_cache.invalidate_user(user_id)
 
     logger.info(f"Admin {admin.email} a créé un token pour {user.email} (source: '{source}')")
 
@@ -153,7 +157,7 @@ async def create_token(
 
 
 @router.post("/users/{user_id}/token/random", response_class=JSONResponse)
-async def create_random_token(
+def create_random_token(
     user_id: int,
     db: Session = Depends(get_db),
     admin: User = Depends(require_admin),
@@ -178,6 +182,8 @@ async def create_random_token(
     )
     db.add(new_token)
     db.commit()
+    # Les anciens tokens sont désactivés : ils ne doivent plus être servis par le cache
+    token_cache.invalidate_user(user_id)
 
     logger.info(f"Admin {admin.email} a créé un token aléatoire pour {user.email}")
 
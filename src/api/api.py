@@ -7,19 +7,24 @@ de setup, et tous les routeurs.
 
 import os
 import re
+import secrets
+import time
 import logging
 from contextlib import asynccontextmanager
+from urllib.parse import parse_qsl
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from starlette_csrf import CSRFMiddleware
 
 from src import __version__
+from src.config import model_registry
 from src.database import init_db
+from src.services import metrics
 from src.api.traits_endpoints import router as traits_router
 from src.api.setup_routes import router as setup_router, is_setup_done
 from src.api.admin_routes import router as admin_router
@@ -29,62 +34,172 @@ from src.api.user_routes import router as user_router
 logger = logging.getLogger(__name__)
 
 
-class SetupMiddleware(BaseHTTPMiddleware):
-    """Middleware qui redirige vers /setup si la configuration initiale n'est pas faite."""
+# URL exemptées de la vérification CSRF : les routes API utilisent l'authentification par token
+CSRF_EXEMPT_URLS = [
+    re.compile(r".*/api/.*"),
+    re.compile(r".*/health$"),
+    re.compile(r".*/static/.*"),
+]
+
+# Chemins accessibles avant la configuration initiale
+SETUP_ALLOWED_PATHS = ("/setup", "/static", "/health", "/api/docs", "/api/redoc", "/api/openapi.json")
+
+
+class SetupMiddleware:
+    """Middleware ASGI qui redirige vers /setup si la configuration initiale n'est pas faite.
+
+    Une fois le setup effectué, la requête est transmise sans autre travail
+    qu'un test de booléen (voir is_setup_done).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or is_setup_done():
+            await self.app(scope, receive, send)
+            return
 
-    async def dispatch(self, request: Request, call_next):
-        """Vérifie si le setup est fait, sinon redirige."""
         # Nettoyer le chemin brut en supprimant le préfixe si Nginx ne l'a pas fait
-        path = request.scope.get('path', '')
-        root_path = request.scope.get('root_path', '')
+        path = scope.get('path', '')
+        root_path = scope.get('root_path', '')
         if root_path and path.startswith(root_path):
             path = path[len(root_path):]
             if not path.startswith('/'):
                 path = '/' + path
-                
-        allowed_paths = ["/setup", "/static", "/health", "/api/docs", "/api/redoc", "/api/openapi.json"]
 
-        if not is_setup_done() and not any(path.startswith(p) for p in allowed_paths):
-            return RedirectResponse(url=f"{root_path}/setup", status_code=302)
+        if not path.startswith(SETUP_ALLOWED_PATHS):
+            response = RedirectResponse(url=f"{root_path}/setup", status_code=302)
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
 
-        return await call_next(request)
 
+class ProxyPrefixMiddleware:
+    """Middleware ASGI qui FORCE le root_path à partir du header nginx X-Forwarded-Prefix."""
 
-class ProxyPrefixMiddleware(BaseHTTPMiddleware):
-    """Middleware qui FORCE le root_path à partir du header nginx X-Forwarded-Prefix."""
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-    async def dispatch(self, request: Request, call_next):
-        prefix = request.headers.get("x-forwarded-prefix")
-        if prefix:
-            request.scope["root_path"] = prefix
-        return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] in ("http", "websocket"):
+            for name, value in scope["headers"]:
+                if name == b"x-forwarded-prefix":
+                    if value:
+                        scope = dict(scope, root_path=value.decode("latin-1"))
+                    break
+        await self.app(scope, receive, send)
 
 
-class CSRFFormMiddleware(BaseHTTPMiddleware):
-    """Middleware qui extrait le token CSRF du corps du formulaire (POST)
+class CSRFFormMiddleware:
+    """Middleware ASGI qui extrait le token CSRF du corps du formulaire (POST)
     pour le rendre disponible au CSRFMiddleware via les headers.
     Nécessaire car starlette-csrf v3+ ne lit pas le corps du formulaire par défaut.
+
+    Le corps n'est lu que pour les POST urlencodés soumis à la vérification
+    CSRF (cookie présent, URL non exemptée, pas de header x-csrftoken) ;
+    il est ensuite rejoué tel quel pour la route.
     """
 
-    async def dispatch(self, request: Request, call_next):
-        if request.method == "POST":
-            content_type = request.headers.get("content-type", "")
-            if "application/x-www-form-urlencoded" in content_type:
-                try:
-                    # Lire le formulaire. Starlette met en cache le résultat dans request._form.
-                    form = await request.form()
-                    csrf_token = form.get("csrf_token")
-                    if csrf_token:
+    def __init__(self, app: ASGIApp, exempt_urls=None, cookie_name: str = "csrftoken",
+                 header_name: str = "x-csrftoken"):
+        self.app = app
+        self.exempt_urls = exempt_urls or []
+        self.cookie_name = cookie_name
+        self.header_name = header_name.encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if not self._needs_form_token(scope):
+            await self.app(scope, receive, send)
+            return
+
+        # Lire le corps complet, puis le rejouer pour la route
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                # Client déconnecté avant la fin du corps
+                await self.app(scope, _replay_receive([message], receive), send)
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+
+        try:
+            for key, value in parse_qsl(body.decode("latin-1")):
+                if key == "csrf_token":
+                    if value:
                         # Ajouter le token aux headers dans le scope (car headers est immuable)
                         # Starlette-csrf cherche par défaut 'x-csrftoken'
-                        headers = list(request.scope["headers"])
-                        headers.append((b"x-csrftoken", csrf_token.encode()))
-                        request.scope["headers"] = headers
-                except Exception as e:
-                    logger.debug(f"Erreur lors de l'extraction du token depuis le formulaire : {e}")
-
-        return await call_next(request)
+                        scope = dict(scope, headers=[*scope["headers"], (self.header_name, value.encode("latin-1"))])
+                    break
+        except Exception as e:
+            logger.debug(f"Erreur lors de l'extraction du token depuis le formulaire : {e}")
+
+        await self.app(scope, _replay_receive([{"type": "http.request", "body": body, "more_body": False}], receive), send)
+
+    def _needs_form_token(self, scope: Scope) -> bool:
+        """Indique si le token CSRF doit être cherché dans le corps de la requête."""
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return False
+        content_type = b""
+        has_cookie = False
+        for name, value in scope["headers"]:
+            if name == self.header_name:
+                return False
+            if name == b"content-type":
+                content_type = value
+            elif name == b"cookie" and self.cookie_name.encode("latin-1") + b"=" in value:
+                has_cookie = True
+        if not has_cookie or b"application/x-www-form-urlencoded" not in content_type:
+            # Sans cookie, CSRFMiddleware refuse la requête quel que soit le formulaire
+            return False
+        path = scope.get("path", "")
+        return not any(pattern.match(path) for pattern in self.exempt_urls)
+
+
+def _replay_receive(messages: list, receive: Receive) -> Receive:
+    """Retourne un receive ASGI qui restitue les messages déjà lus, puis délègue à l'original."""
+    pending = list(messages)
+
+    async def replay() -> Message:
+        if pending:
+            return pending.pop(0)
+        return await receive()
+
+    return replay
+
+
+
+def _authorize_metrics(request: Request):
+    """
+    Vérifie l'accès à /metrics : jeton du collecteur (METRICS_TOKEN) ou administrateur connecté.
 
+    Raises:
+        HTTPException: 401 sans jeton ni session valide, 403 pour un non-administrateur
+    """
+    expected = os.environ.get("METRICS_TOKEN")
+    authorization = request.headers.get("Authorization", "")
+    if expected and authorization.startswith("Bearer ") and secrets.compare_digest(
+            authorization[7:].encode(), expected.encode()):
+        return
+
+    from src.database import SessionLocal
+    from src.services.auth_service import get_current_user
+
+    user = None
+    if SessionLocal is not None:
+        db = SessionLocal()
+        try:
+            user = get_current_user(request, db)
+        finally:
+            db.close()
+    if user is None:
+        raise HTTPException(status_code=401, detail="Jeton de collecte (METRICS_TOKEN) ou session administrateur requis")
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Accès réservé aux administrateurs")
 
 
 def create_application(start_worker: bool = True) -> FastAPI:
@@ -114,25 +229,80 @@ def create_application(start_worker: bool = True) -> FastAPI:
         init_db()
         logger.info("Base de données initialisée")
 
+        from src.services.rate_limiter import rate_limiter
+        rate_limiter.start()
+
+        # Registre des modèles : rechargé si deploy.conf change ou sur SIGHUP
+        model_registry.reload()
+        model_registry.install_sighup_handler()
+        apply_model_limits = None
+
+        journal = None
+        result_store = None
+        engine = None
         if start_worker:
             from src.services.request_queue import RequestQueue
-            from src.services.traits_extractor import TraitsExtractor
+            from src.services.queue_journal import QueueJournal
+            from src.services.result_cache import ResultCache
+            from src.services.result_store import ResultStore
+            from src.services.traits_extractor import (
+                build_result,
+                configure_http_pool,
+                extractor_registry,
+                record_inference_stages,
+            )
 
             queue = RequestQueue()
 
-            def process_request(text, directive, model_name):
-                """Fonction de traitement pour la file d'attente."""
-                extractor = TraitsExtractor(model_name)
-                traits, validated_model = extractor.extract_traits(text, directive)
-                summary = extractor.generate_summary(traits)
-                return {
-                    "traits": [{"trait": t.trait, "score": t.score, "category": t.category} for t in traits],
-                    "summary": summary,
-                    "model_used": model_name,
-                    "validated_model": validated_model,
-                }
-
-            queue.start_worker(process_request)
+            # Rejouer les requêtes perdues lors de l'arrêt précédent (crash, déploiement)
+            if os.environ.get("QUEUE_JOURNAL", "true").lower() == "true":
+                journal = QueueJournal()
+                queue.attach_journal(journal)
+
+            if os.environ.get("RESULT_CACHE", "true").lower() == "true":
+                queue.attach_result_cache(ResultCache())
+
+            # Résultats récents en mémoire, écrits en base par lots hors des workers
+            if os.environ.get("RESULT_STORE", "true").lower() == "true":
+                result_store = ResultStore(journal=journal)
+                queue.attach_result_store(result_store)
+
+            configure_http_pool()
+
+            def process_request(text, directive, model_name, on_partial=None, timings=None):
+                """Fonction de traitement pour la file d'attente (timings : horodatages de l'élément)."""
+                extractor = extractor_registry.get(model_name)
+                durations = {}
+                publish = None
+                if on_partial is not None:
+                    def publish(trait):
+                        on_partial({"trait": trait.trait, "score": trait.score, "category": trait.category})
+                started = time.time()
+                traits, validated_model = extractor.extract_traits(
+                    text, directive, timings=durations, on_partial=publish
+                )
+                if timings is not None:
+                    record_inference_stages(timings, started, durations)
+                logger.debug(
+                    f"Inférence {model_name} : {durations['inference_seconds']:.3f}s "
+                    f"(dont connexion {durations['connection_setup_seconds']:.3f}s)"
+                )
+                return build_result(traits, model_name, validated_model)
+
+            def apply_model_limits(registry):
+                """Applique les limites de concurrence de deploy.conf à la file."""
+                queue.set_model_limits(registry.model_limits())
+
+            if os.environ.get("EXTRACTION_MODE", "threads").lower() == "async":
+                # Appels d'inférence en asyncio : pas de thread bloqué par appel en cours
+                from src.services.async_extraction import AsyncExtractionEngine
+                engine = AsyncExtractionEngine()
+                queue.start_async_worker(engine.submit, max_in_flight=engine.max_concurrency)
+            else:
+                queue.start_worker(process_request)
+            # Limites par modèle de deploy.conf, réappliquées à chaque rechargement
+            apply_model_limits(model_registry)
+            model_registry.add_listener(apply_model_limits)
             logger.info("Worker de la file d'attente démarré")
         else:
             logger.info("Démarrage du worker ignoré (start_worker=False)")
@@ -143,6 +313,16 @@ def create_application(start_worker: bool = True) -> FastAPI:
         from src.services.request_queue import RequestQueue
         queue = RequestQueue()
         queue.stop_worker()
+        if apply_model_limits is not None:
+            model_registry.remove_listener(apply_model_limits)
+        if engine is not None:
+            engine.close()
+        # Écrire les derniers résultats avant d'arrêter le journal (sorties du journal)
+        if result_store is not None:
+            result_store.close()
+        if journal is not None:
+            journal.close()
+        rate_limiter.close()
         logger.info("Worker de la file d'attente arrêté proprement")
 
     app = FastAPI(
@@ -183,15 +363,11 @@ def create_application(start_worker: bool = True) -> FastAPI:
         CSRFMiddleware,
         secret=csrf_secret,
         required_urls=[],
-        exempt_urls=[
-            re.compile(r".*/api/.*"),
-            re.compile(r".*/health$"),
-            re.compile(r".*/static/.*")
-        ],
+        exempt_urls=CSRF_EXEMPT_URLS,
     )
 
     # Ajouter le middleware d'extraction du formulaire (avant CSRFMiddleware dans la pile d'exécution)
-    app.add_middleware(CSRFFormMiddleware)
+    app.add_middleware(CSRFFormMiddleware, exempt_urls=CSRF_EXEMPT_URLS)
 
     # Ajouter le middleware de proxy/root_path EN DERNIER pour qu'il s'exécute EN PREMIER
     app.add_middleware(ProxyPrefixMiddleware)
@@ -213,9 +389,16 @@ def create_application(start_worker: bool = True) -> FastAPI:
         """Point de terminaison de vérification de santé."""
         return {"status": "en bonne santé", "version": __version__}
 
+    # Métriques au format d'exposition texte de Prometheus (collecteur ou administrateur)
+    @app.get("/metrics", tags=["Santé"], response_class=Response)
+    def metrics_endpoint(request: Request):
+        """Expose les métriques de la file, de l'inférence, des caches et de la base de données."""
+        _authorize_metrics(request)
+        return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
     # Page d'accueil — redirige vers login ou dashboard
     @app.get("/")
-    async def root(request: Request):
+    def root(request: Request):
         """Redirige la racine vers la page appropriée."""
         from src.services.auth_service import get_current_user
         from src.database import SessionLocal
@@ -7,14 +7,16 @@ pour configurer l'administrateur et les variables d'environnement.
 import os
 import secrets
 import logging
+import threading
 
 from fastapi import APIRouter, Request, Form, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlalchemy.orm import Session
 
 from src.database import get_db
 from src.models.user import User
-from src.services.auth_service import hash_password
+from src.services.auth_service import hash_password_async
 from src.api.common import templates
 
 # Configuration du logging
@@ -26,14 +28,59 @@ router = APIRouter(tags=["Setup"])
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 ENV_FILE = os.path.join(BASE_DIR, ".env")
 
+# État du setup mis en cache : une fois le setup effectué, la vérification
+# faite par le middleware à chaque requête se réduit à un test de booléen.
+_setup_done = False
+# Date de modification (ns) du .env lors de la dernière lecture
+_env_mtime_ns = None
+_setup_lock = threading.Lock()
 
 
 def is_setup_done() -> bool:
-    """Vérifie si le setup initial a déjà été effectué."""
-    if not os.path.exists(ENV_FILE):
+    """
+    Vérifie si le setup initial a déjà été effectué.
+
+    Tant que le setup n'est pas fait, le .env n'est relu que si sa date de
+    modification a changé ; une fois le setup constaté, le résultat est définitif
+    pour le processus (voir mark_setup_done).
+    """
+    global _setup_done, _env_mtime_ns
+    if _setup_done:
+        return True
+    try:
+        mtime_ns = os.stat(ENV_FILE).st_mtime_ns
+    except OSError:
+        return False
+    if mtime_ns == _env_mtime_ns:
         return False
-    with open(ENV_FILE, 'r') as f:
-        return "ADMIN_EMAIL=" in f.read()
+    with _setup_lock:
+        try:
+            with open(ENV_FILE, 'r') as f:
+                done = "ADMIN_EMAIL=" in f.read()
+        except OSError:
+            return False
+        _env_mtime_ns = mtime_ns
+        _setup_done = done
+    return done
+
+
+def mark_setup_done(done: bool = True):
+    """
+    Met à jour l'état du setup mis en cache.
+
+    Args:
+        done: True une fois l'administrateur créé, False si le .env a été supprimé
+    """
+    global _setup_done, _env_mtime_ns
+    with _setup_lock:
+        _setup_done = done
+        _env_mtime_ns = None
+
+
+def _add_and_commit(db: Session, instance):
+    """Ajoute un objet et valide la transaction (exécuté hors de la boucle d'événements)."""
+    db.add(instance)
+    db.commit()
 
 
 @router.get("/setup", response_class=HTMLResponse)
@@ -143,19 +190,20 @@ async def setup_submit(
     try:
         admin_user = User(
             email=email,
-            hashed_password=hash_password(password),
+            hashed_password=await hash_password_async(password),
             status="vip",
             role="admin",
         )
-        db.add(admin_user)
-        db.commit()
+        await run_in_threadpool(_add_and_commit, db, admin_user)
+        mark_setup_done()
         logger.info(f"Administrateur créé : {email}")
     except Exception as e:
-        db.rollback()
+        await run_in_threadpool(db.rollback)
         logger.error(f"Erreur lors de la création de l'administrateur : {str(e)}")
         # Supprimer le .env en cas d'erreur
         if os.path.exists(ENV_FILE):
             os.remove(ENV_FILE)
+        mark_setup_done(False)
         return templates.TemplateResponse("setup.html", {
             "request": request,
             "error": f"Erreur lors de la création de l'administrateur : {str(e)}",
@@ -5,20 +5,36 @@ Ce module définit les points de terminaison FastAPI pour extraire les traits de
 Les requêtes sont authentifiées par token API et soumises à une file d'attente FIFO.
 """
 
+import asyncio
+import json
 import logging
+import os
+from typing import List
 
 from fastapi import APIRouter, HTTPException, Depends, Header, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from src.database import get_db
+from pydantic import ValidationError
+
 from src.models.character_traits import (
+    BulkItemStatus,
+    BulkProcessingStatus,
     CharacterDescription,
     CharacterTraitsResponse,
     CharacterProcessingStatus,
+    ResultsQuery,
 )
 from src.models.user import RequestLog
-from src.services.auth_service import validate_api_token
-from src.services.request_queue import RequestQueue, QueueItem
+from src.services import metrics
+from src.services.auth_service import (
+    AuthenticatedToken, AuthenticatedUser, authenticate_api_token, get_rate_limit, validate_api_token
+)
+from src.services.queue_events import SSE_KEEPALIVE_SECONDS, event_broker, format_sse
+from src.services.rate_limiter import rate_limiter
+from src.services.request_queue import RequestQueue, QueueItem, QueueItemStatus, stage_durations
 from src.utils.url_fetcher import is_url, fetch_text_content
 from src.config import get_default_model
 
@@ -28,6 +44,18 @@ logger = logging.getLogger(__name__)
 # Création du routeur avec préfixe versionné
 router = APIRouter(prefix="/api/v1/traits", tags=["Traits de Caractère"])
 
+# Nombre maximal de demandes par appel d'extraction en masse (surchargeable via BULK_MAX_ITEMS)
+DEFAULT_BULK_MAX_ITEMS = 5000
+# Téléchargements simultanés des textes fournis sous forme d'URL (extraction en masse)
+BULK_URL_FETCH_CONCURRENCY = 8
+
+
+def _result_url_base(request: Request) -> str:
+    """Construit l'URL de base de récupération des résultats (derrière le proxy éventuel)."""
+    scheme = request.headers.get("x-forwarded-proto", request.url.scheme)
+    host = request.headers.get("x-forwarded-host", request.url.netloc)
+    root_path = request.scope.get("root_path", "")
+    return f"{scheme}://{host}{root_path}/api/v1/traits/get_character/"
 
 @router.post("/extract", response_model=CharacterProcessingStatus, status_code=202)
 async def extract_character_traits(
@@ -57,7 +85,7 @@ async def extract_character_traits(
     auth_input = token or authorization
     
     # Valider le token API et vérifier le rate limit
-    user, api_token = validate_api_token(auth_input, db)
+    user, api_token = await run_in_threadpool(validate_api_token, auth_input, db)
 
     request_id = description.request_id
     logger.info(
@@ -76,7 +104,48 @@ async def extract_character_traits(
             logger.error(f"Échec du téléchargement du contenu de l'URL : {str(e)}")
             raise HTTPException(status_code=400, detail=str(e))
 
-    # Enregistrer le log de requête (rate limiting)
+    # Décompte atomique de la requête (une requête concurrente a pu consommer le quota entre-temps)
+    rate_limit = get_rate_limit(user)
+    if not rate_limiter.try_consume(user.id, rate_limit):
+        metrics.RATE_LIMIT_REJECTIONS.labels(endpoint="extract").inc()
+        raise HTTPException(
+            status_code=429,
+            detail=f"Limite de requêtes atteinte ({rate_limit}/24h). Réessayez plus tard."
+        )
+
+    # Construction de l'URL de résultat de façon robuste
+    result_url = f"{_result_url_base(request)}{request_id}"
+
+    # Accès à la base et au journal de la file : hors de la boucle d'événements
+    return await run_in_threadpool(
+        _submit_extraction, db, user, api_token, description, text, webhook, result_url
+    )
+
+
+def _submit_extraction(
+    db: Session,
+    user: AuthenticatedUser,
+    api_token: AuthenticatedToken,
+    description: CharacterDescription,
+    text: str,
+    webhook: str | None,
+    result_url: str,
+) -> CharacterProcessingStatus:
+    """
+    Enregistre la requête et l'ajoute à la file d'attente (exécuté dans le pool de threads).
+
+    Args:
+        db: Session de base de données
+        user: Utilisateur authentifié
+        api_token: Token API utilisé
+        description: Entrée de description du personnage
+        text: Texte à analyser (contenu téléchargé si une URL a été fournie)
+        webhook: URL de notification optionnelle
+        result_url: URL de récupération du résultat
+    """
+    request_id = description.request_id
+
+    # Enregistrer la requête (déjà décomptée par le rate limiting) dans le journal d'audit
     request_log = RequestLog(
         user_id=user.id,
         token_id=api_token.id,
@@ -85,18 +154,10 @@ async def extract_character_traits(
     db.add(request_log)
     db.commit()
 
-    # Gérer la surcharge si la requête est déjà connue
+    # Surcharge : une requête de même request_id encore en attente est remplacée par
+    # enqueue, sous le verrou de la file ; une requête en cours ou terminée verra son
+    # résultat écrasé par le nouveau traitement.
     queue = RequestQueue()
-    existing = queue.get_request_status(request_id)
-    if existing:
-        if existing["status"] == "waiting":
-            # Si elle est encore en attente, on la retire pour ne pas faire un double traitement inutile
-            queue.remove_waiting_request(request_id)
-            logger.info(f"Requête {request_id} existante en attente retirée pour surcharge.")
-        else:
-            # Si elle est en cours (processing) ou terminée (completed/failed),
-            # le nouveau traitement écrasera l'ancien résultat une fois terminé.
-            logger.info(f"Requête {request_id} va être surchargée (statut précédent: {existing['status']}).")
 
     # Détermination du modèle à utiliser
     # 1. Spécifié dans la requête API explicitement
@@ -104,12 +165,6 @@ async def extract_character_traits(
     # 3. Modèle par défaut de l'application
     model_name_to_use = description.model_name or user.preferred_model or get_default_model()
     
-    # Construction de l'URL de résultat de façon robuste
-    scheme = request.headers.get("x-forwarded-proto", request.url.scheme)
-    host = request.headers.get("x-forwarded-host", request.url.netloc)
-    root_path = request.scope.get("root_path", "")
-    result_url = f"{scheme}://{host}{root_path}/api/v1/traits/get_character/{request_id}"
-    
     if webhook:
         logger.info(f"Webhook configuré pour cette requête : {webhook}")
         
@@ -122,10 +177,19 @@ async def extract_character_traits(
         directive=description.directive,
         model_name=model_name_to_use,
         webhook=webhook,
-        result_url=result_url
+        result_url=result_url,
+        stream=description.stream,
     )
     position = queue.enqueue(queue_item)
 
+    if queue_item.status == QueueItemStatus.COMPLETED:
+        # Contenu déjà analysé : le résultat est disponible immédiatement
+        return CharacterProcessingStatus(
+            request_id=request_id,
+            status="completed",
+            message="Résultat disponible (cache)"
+        )
+
     logger.info(f"Requête {request_id} ajoutée en file d'attente (position: {position})")
 
     return CharacterProcessingStatus(
@@ -135,8 +199,208 @@ async def extract_character_traits(
     )
 
 
+@router.post("/extract/bulk", response_model=BulkProcessingStatus, status_code=202)
+async def extract_character_traits_bulk(
+    request: Request,
+    authorization: str = Header(None, alias="Authorization"),
+    token: str = Header(None, alias="token"),
+    webhook: str | None = Header(None),
+    db: Session = Depends(get_db),
+) -> BulkProcessingStatus:
+    """
+    Lance l'extraction asynchrone de plusieurs personnages en un seul appel.
+
+    Le corps est soit un tableau JSON de descriptions (mêmes champs que
+    /extract), soit du NDJSON (Content-Type: application/x-ndjson), une
+    description par ligne, lu au fil de la réception. Le token est validé une
+    seule fois, le quota est décompté en une fois pour toutes les demandes
+    (tout ou rien), les entrées du journal d'audit sont écrites en une seule
+    transaction et les demandes sont ajoutées à la file en une seule opération.
+
+    Args:
+        request: Requête HTTP FastApi
+        authorization: Header Authorization avec le token API
+        token: Header spécifique 'token' avec le token API
+        webhook: Header contenant l'URL de notification (appliquée à chaque demande)
+        db: Session de base de données
+
+    Returns:
+        Position de chaque demande dans la file, dans l'ordre de soumission
+    """
+    # Authentifier avant de lire le corps (potentiellement volumineux)
+    user, api_token = await run_in_threadpool(authenticate_api_token, token or authorization, db)
+
+    max_items = int(os.environ.get("BULK_MAX_ITEMS", DEFAULT_BULK_MAX_ITEMS))
+    descriptions = await _read_bulk_descriptions(request, max_items)
+    count = len(descriptions)
+    logger.info(f"Requête d'extraction en masse reçue — {count} demande(s), Utilisateur: {user.email}")
+
+    # Vérifier le quota avant de télécharger les éventuelles URL
+    rate_limit = get_rate_limit(user)
+    if rate_limit is not None and rate_limiter.remaining(user.id, rate_limit) < count:
+        metrics.RATE_LIMIT_REJECTIONS.labels(endpoint="bulk").inc()
+        raise HTTPException(
+            status_code=429,
+            detail=f"Limite de requêtes insuffisante pour {count} demande(s) "
+                   f"({rate_limiter.remaining(user.id, rate_limit)} restante(s), {rate_limit}/24h). "
+                   f"Réessayez plus tard."
+        )
+
+    texts = await _fetch_bulk_texts(descriptions)
+
+    # Décompte atomique de toutes les demandes (une requête concurrente a pu consommer le quota entre-temps)
+    if not rate_limiter.try_consume(user.id, rate_limit, amount=count):
+        metrics.RATE_LIMIT_REJECTIONS.labels(endpoint="bulk").inc()
+        raise HTTPException(
+            status_code=429,
+            detail=f"Limite de requêtes atteinte ({rate_limit}/24h). Réessayez plus tard."
+        )
+
+    return await run_in_threadpool(
+        _submit_bulk_extraction, db, user, api_token, descriptions, texts, webhook, _result_url_base(request)
+    )
+
+
+async def _read_bulk_descriptions(request: Request, max_items: int) -> List[CharacterDescription]:
+    """
+    Lit et valide les descriptions d'une extraction en masse (tableau JSON ou NDJSON).
+
+    Raises:
+        HTTPException: 422 si le corps ou une description est invalide, 413 si
+                       le nombre de demandes dépasse max_items
+    """
+    raw_items = []
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        # Lecture au fil de l'eau : le corps complet n'est jamais conservé en mémoire
+        buffer = b""
+        async for chunk in request.stream():
+            *lines, buffer = (buffer + chunk).split(b"\n")
+            for line in lines:
+                _append_ndjson_line(raw_items, line, max_items)
+        _append_ndjson_line(raw_items, buffer, max_items)
+    else:
+        try:
+            raw_items = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=422, detail="Corps JSON invalide")
+        if not isinstance(raw_items, list):
+            raise HTTPException(status_code=422, detail="Le corps doit être un tableau JSON de descriptions")
+        if len(raw_items) > max_items:
+            raise HTTPException(status_code=413, detail=f"Trop de demandes (maximum {max_items} par appel)")
+
+    if not raw_items:
+        raise HTTPException(status_code=422, detail="Aucune demande fournie")
+
+    descriptions = []
+    errors = []
+    seen = set()
+    for index, raw in enumerate(raw_items):
+        try:
+            description = CharacterDescription.model_validate(raw)
+        except ValidationError as e:
+            errors.append({"index": index, "errors": e.errors(include_url=False, include_context=False)})
+            continue
+        if description.request_id in seen:
+            errors.append({"index": index, "errors": [{"msg": f"request_id en double : {description.request_id}"}]})
+            continue
+        seen.add(description.request_id)
+        descriptions.append(description)
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    return descriptions
+
+
+def _append_ndjson_line(raw_items: list, line: bytes, max_items: int):
+    """Décode une ligne NDJSON (les lignes vides sont ignorées)."""
+    line = line.strip()
+    if not line:
+        return
+    if len(raw_items) >= max_items:
+        raise HTTPException(status_code=413, detail=f"Trop de demandes (maximum {max_items} par appel)")
+    try:
+        raw_items.append(json.loads(line))
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Ligne NDJSON invalide (demande {len(raw_items)})")
+
+
+async def _fetch_bulk_texts(descriptions: List[CharacterDescription]) -> List[str]:
+    """Télécharge, avec une concurrence bornée, les textes fournis sous forme d'URL."""
+    semaphore = asyncio.Semaphore(BULK_URL_FETCH_CONCURRENCY)
+
+    async def resolve(index: int, description: CharacterDescription) -> str:
+        if not is_url(description.text):
+            return description.text
+        async with semaphore:
+            try:
+                return await fetch_text_content(description.text)
+            except ValueError as e:
+                logger.error(f"Échec du téléchargement du contenu de l'URL ({description.request_id}) : {str(e)}")
+                raise HTTPException(status_code=400, detail=f"Demande {index} ({description.request_id}) : {str(e)}")
+
+    return list(await asyncio.gather(*(resolve(i, d) for i, d in enumerate(descriptions))))
+
+
+def _submit_bulk_extraction(
+    db: Session,
+    user: AuthenticatedUser,
+    api_token: AuthenticatedToken,
+    descriptions: List[CharacterDescription],
+    texts: List[str],
+    webhook: str | None,
+    result_url_base: str,
+) -> BulkProcessingStatus:
+    """
+    Enregistre les demandes et les ajoute à la file en une fois (exécuté dans le pool de threads).
+
+    Args:
+        db: Session de base de données
+        user: Utilisateur authentifié
+        api_token: Token API utilisé
+        descriptions: Descriptions validées, dans l'ordre de soumission
+        texts: Textes à analyser (contenus téléchargés pour les URL)
+        webhook: URL de notification optionnelle
+        result_url_base: URL de récupération des résultats, sans le request_id
+    """
+    # Journal d'audit : une seule transaction pour toutes les demandes
+    db.add_all([
+        RequestLog(user_id=user.id, token_id=api_token.id, request_id=description.request_id)
+        for description in descriptions
+    ])
+    db.commit()
+
+    default_model = user.preferred_model or get_default_model()
+    items = [
+        QueueItem(
+            request_id=description.request_id,
+            user_id=user.id,
+            user_email=user.email,
+            text=text,
+            directive=description.directive,
+            model_name=description.model_name or default_model,
+            webhook=webhook,
+            result_url=f"{result_url_base}{description.request_id}",
+            stream=description.stream,
+        )
+        for description, text in zip(descriptions, texts)
+    ]
+    positions = RequestQueue().enqueue_many(items)
+
+    return BulkProcessingStatus(
+        accepted=len(items),
+        items=[
+            BulkItemStatus(
+                request_id=item.request_id,
+                status="completed" if item.status == QueueItemStatus.COMPLETED else "pending",
+                position=position,
+            )
+            for item, position in zip(items, positions)
+        ],
+    )
+
+
 @router.get("/get_character/{request_id}", response_model=CharacterTraitsResponse)
-async def get_character_result(request_id: str):
+def get_character_result(request_id: str):
     """
     Récupère le résultat d'une extraction de traits de caractère précédemment demandée.
 
@@ -162,7 +426,11 @@ async def get_character_result(request_id: str):
         logger.info(f"Traitement en cours pour l'ID: {request_id}")
         # Audit 5.7 : Ne pas lever d'erreur pour un 202
         from fastapi.responses import JSONResponse
-        return JSONResponse(status_code=202, content={"detail": "Traitement en cours"})
+        return JSONResponse(status_code=202, content={
+            "detail": "Traitement en cours",
+            "timings": status.get("timings"),
+            "durations": stage_durations(status.get("timings")),
+        })
 
     if status["status"] == "failed":
         logger.error(f"Traitement échoué pour l'ID: {request_id}")
@@ -186,4 +454,125 @@ async def get_character_result(request_id: str):
         validated_model=result.get("validated_model", True),
         request_id=request_id,
         status="completed",
-    )
\ No newline at end of file
+        timings=status.get("timings"),
+        durations=stage_durations(status.get("timings")),
+    )
+
+
+# Nombre de résultats encodés par fragment du flux NDJSON
+RESULTS_CHUNK_SIZE = 100
+
+
+@router.post("/results")
+async def get_character_results(
+    query: ResultsQuery,
+    authorization: str = Header(None, alias="Authorization"),
+    token: str = Header(None, alias="token"),
+    db: Session = Depends(get_db),
+) -> StreamingResponse:
+    """
+    Récupère en un appel les résultats de plusieurs extractions, au format NDJSON.
+
+    Le corps précise soit une liste d'identifiants (une ligne par identifiant,
+    y compris les requêtes encore en file et les identifiants inconnus), soit
+    une plage de dates paginée : le header X-Next-Cursor fournit alors le
+    curseur de la page suivante. Seuls les résultats de l'utilisateur du
+    token sont renvoyés, à partir d'une seule requête en base.
+
+    Args:
+        query: Identifiants ou plage de dates recherchés
+        authorization: Header Authorization avec le token API
+        token: Header spécifique 'token' avec le token API
+        db: Session de base de données
+    """
+    user, _ = await run_in_threadpool(authenticate_api_token, token or authorization, db)
+    results, next_cursor = await run_in_threadpool(
+        RequestQueue().get_results,
+        user.id,
+        request_ids=query.request_ids,
+        since=query.since,
+        until=query.until,
+        cursor=query.cursor,
+        limit=query.limit,
+    )
+    logger.info(f"Récupération groupée : {len(results)} résultat(s) pour {user.email}")
+
+    def lines():
+        for start in range(0, len(results), RESULTS_CHUNK_SIZE):
+            yield "".join(
+                json.dumps(result, ensure_ascii=False) + "\n"
+                for result in results[start:start + RESULTS_CHUNK_SIZE]
+            )
+
+    headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else {}
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers=headers)
+
+
+@router.get("/stream/{request_id}")
+async def stream_character_traits(request: Request, request_id: str):
+    """
+    Diffuse en Server-Sent Events la progression d'une extraction.
+
+    Les traits déjà reçus sont envoyés à la connexion, puis chaque nouveau
+    trait dès sa génération (événements 'partial', pour les requêtes soumises
+    avec "stream": true). Le flux se termine par un événement 'completed'
+    (avec le résultat) ou 'failed' (avec l'erreur).
+
+    Args:
+        request: Requête HTTP FastApi
+        request_id: Identifiant unique de la demande
+
+    Raises:
+        HTTPException: Si l'ID n'est pas connu
+    """
+    # S'abonner avant de lire le statut : aucun événement ne peut être manqué entre les deux
+    subscription = event_broker.subscribe(request_id=request_id)
+    try:
+        status = await run_in_threadpool(RequestQueue().get_request_status, request_id)
+    except Exception:
+        event_broker.unsubscribe(subscription)
+        raise
+    if not status:
+        event_broker.unsubscribe(subscription)
+        logger.warning(f"Flux demandé pour un ID de requête inconnu: {request_id}")
+        raise HTTPException(status_code=404, detail="inconnu")
+
+    async def events():
+        try:
+            if status["status"] in ("completed", "failed"):
+                final = {"event": status["status"], "request_id": request_id}
+                if status["status"] == "completed":
+                    final["result"] = status.get("result")
+                else:
+                    final["error"] = status.get("error")
+                yield format_sse(final)
+                return
+
+            sent = 0
+            for trait in status.get("partial_traits", []):
+                yield format_sse({"event": "partial", "request_id": request_id, "index": sent, "trait": trait})
+                sent += 1
+
+            while True:
+                event = await subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+                if event is None:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                if event["event"] == "partial":
+                    # Déjà envoyé avec l'état initial
+                    if event["index"] < sent:
+                        continue
+                    sent = event["index"] + 1
+                yield format_sse(event)
+                if event["event"] in ("completed", "failed"):
+                    return
+        finally:
+            event_broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
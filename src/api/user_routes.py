@@ -8,15 +8,18 @@ import logging
 import os
 
 from fastapi import APIRouter, Request, Form, Depends, HTTPException, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
 from src.database import get_db
 from src.models.user import User, ApiToken
 from src.services.auth_service import (
-    hash_password, verify_password, create_access_token,
-    get_current_user, get_remaining_requests
+    AuthenticatedUser, hash_password_async, verify_password_async, create_access_token,
+    get_current_user, get_rate_limit, get_remaining_requests, token_cache
 )
+from src.services.queue_events import SSE_KEEPALIVE_SECONDS, event_broker, format_sse
+from src.services.rate_limiter import rate_limiter
 from src.services.request_queue import RequestQueue
 from src.services.discord_service import send_discord_notification
 from src.config import get_available_models
@@ -29,6 +32,17 @@ router = APIRouter(tags=["Utilisateur"])
 
 
 
+def _get_user_by_email(db: Session, email: str):
+    """Recherche un utilisateur par email (exécuté hors de la boucle d'événements)."""
+    return db.query(User).filter(User.email == email).first()
+
+
+def _add_and_commit(db: Session, instance):
+    """Ajoute un objet et valide la transaction (exécuté hors de la boucle d'événements)."""
+    db.add(instance)
+    db.commit()
+
+
 @router.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
     """Affiche le formulaire de connexion."""
@@ -51,9 +65,9 @@ async def login_submit(
     db: Session = Depends(get_db),
 ):
     """Traite la tentative de connexion."""
-    user = db.query(User).filter(User.email == email).first()
+    user = await run_in_threadpool(_get_user_by_email, db, email)
 
-    if not user or not verify_password(password, user.hashed_password):
+    if not user or not await verify_password_async(password, user.hashed_password):
         return templates.TemplateResponse("login.html", {
             "request": request,
             "error": "Email ou mot de passe incorrect",
@@ -120,7 +134,7 @@ async def register_submit(
         errors.append("Les mots de passe ne correspondent pas")
 
     # Vérifier si l'email existe déjà
-    existing = db.query(User).filter(User.email == email).first()
+    existing = await run_in_threadpool(_get_user_by_email, db, email)
     if existing:
         errors.append("Cette adresse email est déjà utilisée")
 
@@ -134,12 +148,11 @@ async def register_submit(
     # Créer l'utilisateur en statut pending
     new_user = User(
         email=email,
-        hashed_password=hash_password(password),
+        hashed_password=await hash_password_async(password),
         status="pending",
         role="user",
     )
-    db.add(new_user)
-    db.commit()
+    await run_in_threadpool(_add_and_commit, db, new_user)
 
     logger.info(f"Nouvel utilisateur inscrit (en attente de validation) : {email}")
     
@@ -151,7 +164,7 @@ async def register_submit(
 
 
 @router.get("/dashboard", response_class=HTMLResponse)
-async def dashboard_page(
+def dashboard_page(
     request: Request,
     db: Session = Depends(get_db),
 ):
@@ -184,7 +197,7 @@ async def dashboard_page(
 
 
 @router.post("/dashboard/model")
-async def update_preferred_model(
+def update_preferred_model(
     request: Request,
     model: str = Form(...),
     db: Session = Depends(get_db),
@@ -198,6 +211,7 @@ async def update_preferred_model(
     if model in models:
         user.preferred_model = model
         db.commit()
+        token_cache.invalidate_user(user.id)
         logger.info(f"Modèle préféré mis à jour pour {user.email} -> {model}")
         
     return RedirectResponse(url=f"{request.scope.get('root_path', '')}/dashboard", status_code=302)
@@ -211,24 +225,103 @@ async def logout(request: Request):
     return response
 
 
+def _queue_status(user: User, db: Session) -> dict:
+    """État de la file d'attente affiché dans le tableau de bord d'un utilisateur."""
+    queue = RequestQueue()
+
+    status = queue.get_queue_status(user.id)
+    remaining = get_remaining_requests(user, db)
+    status["remaining_requests"] = remaining
+    status["items"] = queue.get_user_recent_items(user.id)
+    return status
+
+
 @router.get("/api/v1/queue/status")
-async def queue_status_endpoint(
+def queue_status_endpoint(
     request: Request,
     db: Session = Depends(get_db),
 ):
     """
     Endpoint JSON pour récupérer l'état de la file d'attente.
-    Pendant par le frontend via requêtes régulières (polling).
+    Utilisé par le frontend si le flux /api/v1/queue/events n'est pas disponible.
     """
     user = get_current_user(request, db)
     if not user:
         raise HTTPException(status_code=401, detail="Non authentifié")
 
-    queue = RequestQueue()
+    return _queue_status(user, db)
 
-    status = queue.get_queue_status(user.id)
-    remaining = get_remaining_requests(user, db)
-    status["remaining_requests"] = remaining
-    status["items"] = queue.get_user_recent_items(user.id)
 
-    return status
+def _load_dashboard_user(request: Request, db: Session):
+    """Authentifie l'utilisateur du tableau de bord et libère la connexion (exécuté hors de la boucle d'événements)."""
+    try:
+        user = get_current_user(request, db)
+        if not user:
+            return None
+        return AuthenticatedUser.from_user(user)
+    finally:
+        db.close()
+
+
+def _load_queue_snapshot(user: AuthenticatedUser, db: Session) -> dict:
+    """État initial du flux de la file, puis libération de la connexion (exécuté hors de la boucle d'événements)."""
+    try:
+        return _queue_status(user, db)
+    finally:
+        # Le flux reste ouvert longtemps : ne pas garder de connexion du pool
+        db.close()
+
+
+@router.get("/api/v1/queue/events")
+async def queue_events_endpoint(
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    """
+    Flux Server-Sent Events de la file d'attente de l'utilisateur connecté.
+
+    Le flux commence par un événement 'snapshot' (même contenu que
+    /api/v1/queue/status), puis n'envoie un événement 'queue' que lorsque des
+    éléments de l'utilisateur changent d'état ou de position : seuls les
+    éléments modifiés sont transmis (les éléments retirés ont le statut
+    'removed'), avec la longueur de la file et le nombre de requêtes
+    restantes. Un changement de la longueur de la file sans effet sur ses
+    éléments est signalé par un événement 'queue_length'.
+    """
+    user = await run_in_threadpool(_load_dashboard_user, request, db)
+    if not user:
+        raise HTTPException(status_code=401, detail="Non authentifié")
+
+    # S'abonner avant de lire l'état : aucun changement ne peut être manqué entre les deux
+    subscription = event_broker.subscribe(user_id=user.id)
+    try:
+        snapshot = await run_in_threadpool(_load_queue_snapshot, user, db)
+    except Exception:
+        event_broker.unsubscribe(subscription)
+        raise
+    rate_limit = get_rate_limit(user)
+
+    async def events():
+        try:
+            yield format_sse({"event": "snapshot", **snapshot})
+            while True:
+                event = await subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+                if event is None:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                if event["event"] == "queue":
+                    # Compteur en mémoire : pas de requête en base par événement
+                    event["remaining_requests"] = (
+                        9999 if rate_limit is None else rate_limiter.remaining(user.id, rate_limit)
+                    )
+                yield format_sse(event)
+        finally:
+            event_broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
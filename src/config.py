@@ -2,23 +2,94 @@
 
 Ce module lit le fichier config/deploy.conf pour charger les
 modèles disponibles pour l'interface utilisateur.
+
+Le fichier n'est plus relu à chaque appel : le registre des modèles le
+charge une fois, puis le recharge lorsque sa date de modification change
+(vérifiée au plus toutes les MODEL_REGISTRY_CHECK_SECONDS) ou à la
+réception de SIGHUP.
 """
 
 import os
+import signal
+import threading
+import time
 import yaml
 import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
-def load_deploy_config():
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEPLOY_CONFIG_PATH = os.path.join(BASE_DIR, "config", "deploy.conf")
+
+# Modèles utilisés si deploy.conf n'en déclare aucun (fallback de sécurité)
+FALLBACK_MODELS = [
+    "Qwen/Qwen2.5-72B-Instruct",
+    "meta-llama/Llama-3.2-3B-Instruct",
+]
+
+# Valeurs par défaut des paramètres d'un modèle
+DEFAULT_MAX_TOKENS = 500
+# Intervalle minimal entre deux vérifications de la date de modification
+DEFAULT_CHECK_INTERVAL_SECONDS = 2.0
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """
+    Paramètres d'un modèle déclaré dans deploy.conf.
+
+    Attributes:
+        name: Identifiant Hugging Face du modèle
+        max_concurrency: Nombre maximal de traitements simultanés (None : illimité)
+        timeout: Délai maximal d'un appel d'inférence en secondes (None : aucun)
+        max_tokens: Nombre maximal de tokens générés
+    """
+
+    name: str
+    max_concurrency: Optional[int] = None
+    timeout: Optional[float] = None
+    max_tokens: int = DEFAULT_MAX_TOKENS
+
+
+def _parse_model_entry(entry) -> Optional[ModelSpec]:
+    """
+    Construit un ModelSpec à partir d'une entrée de la liste models.
+
+    Une entrée est soit le nom du modèle, soit un dictionnaire :
+        - name: Qwen/Qwen2.5-72B-Instruct
+          max_concurrency: 2
+          timeout: 60
+          max_tokens: 800
+    """
+    if isinstance(entry, str):
+        return ModelSpec(name=entry)
+    if not isinstance(entry, dict) or not entry.get("name"):
+        logger.warning(f"Entrée de modèle ignorée dans deploy.conf : {entry!r}")
+        return None
+    try:
+        max_concurrency = entry.get("max_concurrency")
+        timeout = entry.get("timeout")
+        return ModelSpec(
+            name=str(entry["name"]),
+            max_concurrency=max(1, int(max_concurrency)) if max_concurrency is not None else None,
+            timeout=float(timeout) if timeout is not None else None,
+            max_tokens=int(entry.get("max_tokens", DEFAULT_MAX_TOKENS)),
+        )
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Entrée de modèle ignorée dans deploy.conf ({entry.get('name')}) : {e}")
+        return None
+
+
+def load_deploy_config(config_path: Optional[str] = None):
     """Charge la configuration depuis config/deploy.conf."""
-    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-    config_path = os.path.join(base_dir, "config", "deploy.conf")
-    
+    config_path = config_path or DEPLOY_CONFIG_PATH
+
     if not os.path.exists(config_path):
         logger.warning(f"Fichier de configuration {config_path} introuvable.")
         return {}
-        
+
     try:
         with open(config_path, 'r', encoding='utf-8') as f:
             return yaml.safe_load(f) or {}
@@ -26,19 +97,149 @@ def load_deploy_config():
         logger.error(f"Erreur lors de la lecture de deploy.conf: {e}")
         return {}
 
+
+class ModelRegistry:
+    """Registre des modèles de deploy.conf, rechargé à chaud."""
+
+    def __init__(self, config_path: Optional[str] = None, check_interval: Optional[float] = None):
+        """
+        Initialise le registre (le fichier est chargé au premier accès).
+
+        Args:
+            config_path: Chemin du fichier de configuration (sinon config/deploy.conf)
+            check_interval: Intervalle minimal entre deux vérifications de la date de
+                            modification (sinon MODEL_REGISTRY_CHECK_SECONDS)
+        """
+        if check_interval is None:
+            check_interval = float(os.environ.get("MODEL_REGISTRY_CHECK_SECONDS", DEFAULT_CHECK_INTERVAL_SECONDS))
+        self.config_path = config_path or DEPLOY_CONFIG_PATH
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        # Modèles dans l'ordre de deploy.conf (remplacé en bloc à chaque rechargement)
+        self._specs: Dict[str, ModelSpec] = {}
+        self._mtime_ns: Optional[int] = None
+        self._next_check = 0.0
+        self._loaded = False
+        self._listeners: List[Callable[["ModelRegistry"], None]] = []
+
+    # --- Consultation ---
+
+    def names(self) -> List[str]:
+        """Retourne les noms des modèles, dans l'ordre de deploy.conf."""
+        self._refresh()
+        return list(self._specs)
+
+    def specs(self) -> List[ModelSpec]:
+        """Retourne les paramètres de tous les modèles, dans l'ordre de deploy.conf."""
+        self._refresh()
+        return list(self._specs.values())
+
+    def get(self, model_name: str) -> ModelSpec:
+        """
+        Retourne les paramètres d'un modèle.
+
+        Args:
+            model_name: Identifiant Hugging Face du modèle
+
+        Returns:
+            ModelSpec déclaré, ou paramètres par défaut pour un modèle non déclaré
+        """
+        self._refresh()
+        return self._specs.get(model_name) or ModelSpec(name=model_name)
+
+    def default_model(self) -> str:
+        """Retourne le premier modèle déclaré."""
+        names = self.names()
+        return names[0] if names else FALLBACK_MODELS[0]
+
+    def model_limits(self) -> Dict[str, int]:
+        """Retourne le nombre maximal de traitements simultanés des modèles qui en déclarent un."""
+        return {spec.name: spec.max_concurrency for spec in self.specs() if spec.max_concurrency is not None}
+
+    # --- Rechargement ---
+
+    def add_listener(self, callback: Callable[["ModelRegistry"], None]):
+        """Enregistre une fonction appelée après chaque rechargement (ex: limites de la file)."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[["ModelRegistry"], None]):
+        """Retire une fonction enregistrée avec add_listener."""
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def reload(self):
+        """Relit deploy.conf et notifie les abonnés."""
+        try:
+            mtime_ns = os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        config = load_deploy_config(self.config_path)
+
+        specs: Dict[str, ModelSpec] = {}
+        for entry in config.get("models") or []:
+            spec = _parse_model_entry(entry)
+            if spec is not None:
+                specs[spec.name] = spec
+        if not specs:
+            specs = {name: ModelSpec(name=name) for name in FALLBACK_MODELS}
+
+        with self._lock:
+            self._specs = specs
+            self._mtime_ns = mtime_ns
+            self._loaded = True
+            listeners = list(self._listeners)
+        logger.info(f"Registre des modèles chargé : {len(specs)} modèle(s)")
+
+        for callback in listeners:
+            try:
+                callback(self)
+            except Exception as e:
+                logger.error(f"Erreur lors de la notification du rechargement des modèles : {str(e)}")
+
+    def _refresh(self):
+        """Charge le fichier au premier accès, puis le recharge si sa date de modification a changé."""
+        if not self._loaded:
+            self.reload()
+            return
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self._check_interval
+        try:
+            mtime_ns = os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        if mtime_ns != self._mtime_ns:
+            self.reload()
+
+    def install_sighup_handler(self) -> bool:
+        """
+        Recharge le registre à la réception de SIGHUP (thread principal uniquement).
+
+        Returns:
+            True si le gestionnaire a été installé
+        """
+        if not hasattr(signal, "SIGHUP") or threading.current_thread() is not threading.main_thread():
+            return False
+
+        def handle_sighup(signum, frame):
+            # Hors du gestionnaire de signal : le rechargement prend des verrous
+            threading.Thread(target=self.reload, name="model-registry-reload", daemon=True).start()
+
+        signal.signal(signal.SIGHUP, handle_sighup)
+        return True
+
+
+# Registre partagé par l'application
+model_registry = ModelRegistry()
+
+
 def get_available_models():
     """Retourne la liste des modèles définis dans deploy.conf."""
-    config = load_deploy_config()
-    models = config.get("models", [])
-    if not models:
-        # Fallback de sécurité
-        models = [
-            "Qwen/Qwen2.5-72B-Instruct",
-            "meta-llama/Llama-3.2-3B-Instruct",
-        ]
-    return models
+    return model_registry.names()
 
 def get_default_model():
     """Retourne le premier modèle de la liste comme modèle par défaut."""
-    models = get_available_models()
-    return models[0] if models else "Qwen/Qwen2.5-72B-Instruct"
+    return model_registry.default_model()
@@ -2,13 +2,23 @@
 
 Ce module fournit la connexion SQLite, la factory de session,
 et la base déclarative pour les modèles SQLAlchemy.
+
+Deux modes de connexion sont disponibles (variable DATABASE_MODE) :
+- "simple" (défaut) : une connexion par session (NullPool), journal DELETE ;
+- "production" : connexions conservées dans un pool, journal WAL et pragmas
+  réglés à l'ouverture, pour que les lectures de l'API et des workers ne
+  soient pas bloquées par les écritures des résultats.
 """
 
 import os
 import logging
+import time
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool, QueuePool
+
+from src.services import metrics
 
 # Configuration du logging
 logger = logging.getLogger(__name__)
@@ -19,6 +29,14 @@ DB_DIR = os.path.join(BASE_DIR, "data", "db")
 DB_PATH = os.path.join(DB_DIR, "character.db")
 DATABASE_URL = f"sqlite:///{DB_PATH}"
 
+# Réglages du mode "production" (surchargeables via l'environnement)
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_OVERFLOW = 20
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+# Taille du cache de pages en Kio (valeur négative pour PRAGMA cache_size)
+DEFAULT_CACHE_SIZE_KB = 64 * 1024
+
 # Base déclarative pour les modèles
 Base = declarative_base()
 
@@ -27,6 +45,66 @@ engine = None
 SessionLocal = None
 
 
+def _sqlite_pragmas() -> dict:
+    """Pragmas appliqués à chaque nouvelle connexion en mode production."""
+    return {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": int(os.environ.get("DATABASE_BUSY_TIMEOUT_MS", DEFAULT_BUSY_TIMEOUT_MS)),
+        "mmap_size": int(os.environ.get("DATABASE_MMAP_SIZE", DEFAULT_MMAP_SIZE)),
+        "cache_size": -int(os.environ.get("DATABASE_CACHE_SIZE_KB", DEFAULT_CACHE_SIZE_KB)),
+    }
+
+
+def create_db_engine(url: str = None, mode: str = None):
+    """
+    Crée le moteur SQLAlchemy selon le mode de connexion.
+
+    Args:
+        url: URL de la base (sinon DATABASE_URL du module)
+        mode: "simple" ou "production" (sinon DATABASE_MODE, "simple" par défaut)
+
+    Returns:
+        Moteur SQLAlchemy
+    """
+    url = url or DATABASE_URL
+    mode = (mode or os.environ.get("DATABASE_MODE", "simple")).lower()
+
+    if mode != "production":
+        return create_engine(
+            url,
+            connect_args={"check_same_thread": False},
+            poolclass=NullPool,
+            echo=False,
+        )
+
+    pragmas = _sqlite_pragmas()
+    db_engine = create_engine(
+        url,
+        # timeout : attente du verrou par le pilote sqlite3, en secondes
+        connect_args={"check_same_thread": False, "timeout": pragmas["busy_timeout"] / 1000},
+        poolclass=QueuePool,
+        pool_size=int(os.environ.get("DATABASE_POOL_SIZE", DEFAULT_POOL_SIZE)),
+        max_overflow=int(os.environ.get("DATABASE_MAX_OVERFLOW", DEFAULT_MAX_OVERFLOW)),
+        echo=False,
+    )
+
+    @event.listens_for(db_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """Applique les pragmas à l'ouverture de chaque connexion du pool."""
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    logger.info(
+        f"Base de données en mode production (WAL, pool de {db_engine.pool.size()} connexions)"
+    )
+    return db_engine
+
+
 def init_db():
     """
     Initialise la base de données : crée le répertoire, le moteur
@@ -36,6 +114,9 @@ def init_db():
 
     import src.models.user  # Importer les modèles pour qu'ils soient enregistrés
     import src.models.extraction_result  # Modèle des résultats
+    import src.models.queued_request  # Journal de la file d'attente
+    import src.models.cached_result  # Cache des résultats
+    import src.models.rate_limit_bucket  # Compteurs du limiteur de requêtes
 
     # Créer le répertoire de la base de données s'il n'existe pas
     db_dir = os.path.dirname(DATABASE_URL.replace("sqlite:///", ""))
@@ -43,25 +124,56 @@ def init_db():
         os.makedirs(db_dir, exist_ok=True)
         logger.info(f"Répertoire de la base de données : {db_dir}")
 
-    from sqlalchemy.pool import NullPool
-
-    engine = create_engine(
-        DATABASE_URL,
-        connect_args={"check_same_thread": False},
-        poolclass=NullPool,
-        echo=False,
-    )
+    engine = create_db_engine()
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
     # Créer toutes les tables
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns(engine)
+    _create_missing_indexes(engine)
     logger.info("Base de données initialisée avec succès")
 
 
+def _add_missing_columns(db_engine):
+    """
+    Ajoute les colonnes déclarées absentes des tables déjà existantes.
+
+    create_all ne modifie pas une table existante : une colonne ajoutée à un
+    modèle (nullable, sans valeur par défaut côté serveur) est créée ici par
+    ALTER TABLE sur les bases déjà déployées.
+    """
+    inspector = inspect(db_engine)
+    with db_engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=db_engine.dialect)
+                conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}')
+                logger.info(f"Colonne {table.name}.{column.name} ajoutée")
+
+
+def _create_missing_indexes(db_engine):
+    """
+    Crée les index déclarés sur des tables déjà existantes.
+
+    create_all ne crée les index qu'avec leur table : un index ajouté à un
+    modèle existant doit être créé séparément sur les bases déjà déployées.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db_engine, checkfirst=True)
+
+
 def get_db():
     """
     Générateur de session pour l'injection de dépendance FastAPI.
 
+    Le nombre de sessions, celles en cours et leur durée sont exposés par /metrics.
+
     Yields:
         Session SQLAlchemy
     """
@@ -69,7 +181,12 @@ def get_db():
         init_db()
 
     db = SessionLocal()
+    started = time.perf_counter()
+    metrics.DB_SESSIONS.inc()
+    metrics.DB_SESSIONS_OPEN.inc()
     try:
         yield db
     finally:
         db.close()
+        metrics.DB_SESSIONS_OPEN.dec()
+        metrics.DB_SESSION_SECONDS.observe(time.perf_counter() - started)
@@ -0,0 +1,24 @@
+"""Modèle SQLAlchemy du cache persistant des résultats d'extraction.
+
+Ce module définit la table qui associe une empreinte du contenu soumis
+(texte, directive, modèle) au résultat d'extraction déjà calculé.
+"""
+
+from sqlalchemy import Column, Integer, String, Float, JSON
+from src.database import Base
+
+
+class CachedResult(Base):
+    """Modèle représentant un résultat d'extraction mis en cache."""
+
+    __tablename__ = "cached_result"
+
+    cache_key = Column(String(64), primary_key=True)  # SHA-256 du contenu normalisé
+    model_name = Column(String(255), nullable=False)
+    result_json = Column(JSON, nullable=False)
+    created_at = Column(Float, nullable=False, index=True)  # epoch, sert au TTL
+    last_hit_at = Column(Float, nullable=False, index=True)  # epoch, sert à l'éviction
+    hit_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CachedResult(cache_key='{self.cache_key[:12]}...', model='{self.model_name}')>"
@@ -4,7 +4,8 @@ Ce module définit les modèles de données utilisés pour la validation des ent
 dans l'API d'extraction de traits de caractère.
 """
 
-from typing import List, Optional
+import datetime
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -18,6 +19,10 @@ class CharacterDescription(BaseModel):
         None,
         description="Modèle Hugging Face à utiliser pour l'extraction de traits"
     )
+    stream: bool = Field(
+        False,
+        description="Publier les traits au fil de la génération (GET /api/v1/traits/stream/{request_id})"
+    )
 
 
 class CharacterTrait(BaseModel):
@@ -37,6 +42,8 @@ class CharacterTraitsResponse(BaseModel):
     request_id: str = Field(..., max_length=100, pattern="^[a-zA-Z0-9_-]+$", description="Identifiant unique de la demande")
     directive: Optional[str] = Field(None, description="Directive utilisée pour l'analyse")
     status: str = Field("completed", description="État du traitement (pending/completed)")
+    timings: Optional[Dict[str, float]] = Field(None, description="Horodatages (epoch) des étapes du traitement")
+    durations: Optional[Dict[str, float]] = Field(None, description="Durée de chaque étape en secondes (attente, inférence, analyse, écriture)")
 
 class CharacterProcessingStatus(BaseModel):
     """Modèle pour indiquer l'état du traitement d'une demande d'extraction."""
@@ -45,6 +52,33 @@ class CharacterProcessingStatus(BaseModel):
     status: str = Field("pending", description="État du traitement (pending/completed)")
     message: str = Field("Traitement en cours", description="Message sur l'état du traitement")
 
+class BulkItemStatus(BaseModel):
+    """État d'une demande soumise via l'extraction en masse."""
+
+    request_id: str = Field(..., max_length=100, pattern="^[a-zA-Z0-9_-]+$", description="Identifiant unique de la demande")
+    status: str = Field("pending", description="État du traitement (pending/completed)")
+    position: int = Field(..., description="Position dans la file d'attente (-1 si le résultat est déjà disponible)")
+
+
+class BulkProcessingStatus(BaseModel):
+    """Réponse de l'extraction en masse : une entrée par demande, dans l'ordre de soumission."""
+
+    accepted: int = Field(..., description="Nombre de demandes acceptées")
+    items: List[BulkItemStatus] = Field(..., description="État de chaque demande")
+
+
+class ResultsQuery(BaseModel):
+    """Critères de récupération groupée des résultats : liste d'identifiants, ou plage de dates paginée."""
+
+    request_ids: Optional[List[str]] = Field(
+        None, max_length=5000, description="Identifiants recherchés (5000 au maximum, une seule page)"
+    )
+    since: Optional[datetime.datetime] = Field(None, description="Résultats enregistrés à partir de cette date")
+    until: Optional[datetime.datetime] = Field(None, description="Résultats enregistrés avant cette date")
+    cursor: Optional[int] = Field(None, description="Curseur de la page suivante (header X-Next-Cursor)")
+    limit: int = Field(1000, ge=1, le=5000, description="Nombre maximal de résultats par page")
+
+
 class CharacterRequestId(BaseModel):
     """Modèle pour demander l'état d'un traitement via son ID."""
     
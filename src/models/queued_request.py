@@ -0,0 +1,30 @@
+"""Modèle SQLAlchemy du journal persistant de la file d'attente.
+
+Ce module définit la table qui conserve les requêtes en attente ou en cours
+de traitement, afin de les rejouer après un redémarrage du service.
+"""
+
+from sqlalchemy import Boolean, Column, Integer, String, Text, Float
+from src.database import Base
+
+
+class QueuedRequest(Base):
+    """Modèle représentant une requête en attente ou en cours dans la file."""
+
+    __tablename__ = "queued_request"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    request_id = Column(String(100), unique=True, nullable=False, index=True)
+    user_id = Column(Integer, nullable=False)
+    user_email = Column(String(255), nullable=False)
+    text = Column(Text, nullable=False)
+    directive = Column(Text, nullable=True)
+    model_name = Column(String(255), nullable=False)
+    webhook = Column(Text, nullable=True)
+    result_url = Column(Text, nullable=True)
+    stream = Column(Boolean, nullable=True, default=False)  # QueueItem.stream (traits publiés en flux)
+    status = Column(String(20), nullable=False, default="waiting")  # waiting, processing
+    enqueued_at = Column(Float, nullable=False, index=True)  # QueueItem.created_at (epoch)
+
+    def __repr__(self):
+        return f"<QueuedRequest(request_id='{self.request_id}', status='{self.status}')>"
@@ -0,0 +1,22 @@
+"""Modèle SQLAlchemy des compteurs persistés du limiteur de requêtes.
+
+Ce module définit la table qui conserve, par utilisateur, le nombre de
+requêtes de chaque tranche de la fenêtre glissante, afin de retrouver
+les quotas après un redémarrage du service.
+"""
+
+from sqlalchemy import Column, Integer
+from src.database import Base
+
+
+class RateLimitBucket(Base):
+    """Modèle représentant le compteur d'une tranche de temps pour un utilisateur."""
+
+    __tablename__ = "rate_limit_bucket"
+
+    user_id = Column(Integer, primary_key=True)
+    bucket_start = Column(Integer, primary_key=True)  # Début de la tranche (epoch, en secondes)
+    count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<RateLimitBucket(user_id={self.user_id}, bucket_start={self.bucket_start}, count={self.count})>"
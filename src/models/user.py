@@ -7,7 +7,7 @@ des utilisateurs, des tokens d'API et du suivi des requêtes.
 import datetime
 
 from sqlalchemy import (
-    Column, Integer, String, DateTime, Boolean, ForeignKey, Text
+    Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Index
 )
 from sqlalchemy.orm import relationship
 
@@ -60,9 +60,12 @@ class ApiToken(Base):
 
 
 class RequestLog(Base):
-    """Modèle pour le suivi des requêtes API (rate limiting)."""
+    """Modèle pour le suivi des requêtes API (journal d'audit, amorçage du limiteur)."""
 
     __tablename__ = "request_log"
+    __table_args__ = (
+        Index("ix_request_log_user_created", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
@@ -0,0 +1,255 @@
+"""Moteur d'extraction asynchrone (AsyncInferenceClient sur une boucle dédiée).
+
+Les appels d'inférence sont des coroutines exécutées sur une boucle asyncio
+propre au moteur, dans un thread dédié : des centaines d'appels peuvent être
+en cours simultanément sans mobiliser un thread système par appel. Un
+sémaphore borne la concurrence ; la file d'attente soumet les éléments via
+submit() et récupère des concurrent.futures.Future.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
+from huggingface_hub import AsyncInferenceClient, set_async_client_factory
+
+from src.config import model_registry
+from src.models.character_traits import CharacterTrait
+from src.services.traits_extractor import (
+    DEFAULT_HTTP_KEEPALIVE_SECONDS,
+    StreamingTraitParser,
+    build_messages,
+    build_result,
+    is_unsupported_model_error,
+    parse_llm_response,
+    record_inference_stages,
+    record_llm_call,
+)
+
+# Configuration du logging
+logger = logging.getLogger(__name__)
+
+# Nombre maximal d'appels d'inférence simultanés (surchargeable via EXTRACTION_MAX_CONCURRENCY)
+DEFAULT_MAX_CONCURRENCY = 64
+
+
+class _SharedAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    Transport partagé par les clients d'inférence.
+
+    Chaque appel utilise son propre AsyncInferenceClient, fermé à la fin de
+    l'appel pour libérer les réponses en flux qu'il conserve ; la fermeture
+    de ce transport est ignorée afin que le pool de connexions survive.
+    """
+
+    def __init__(self, transport: httpx.AsyncHTTPTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        # Le pool est fermé par AsyncExtractionEngine.close()
+        pass
+
+
+class AsyncExtractionEngine:
+    """Exécute les extractions de traits en asyncio, sur une boucle dédiée."""
+
+    def __init__(self, max_concurrency: Optional[int] = None, keepalive_seconds: Optional[float] = None):
+        """
+        Initialise le moteur et démarre sa boucle d'événements.
+
+        Args:
+            max_concurrency: Appels simultanés maximum (sinon EXTRACTION_MAX_CONCURRENCY)
+            keepalive_seconds: Durée de conservation d'une connexion inactive (sinon HF_HTTP_KEEPALIVE_SECONDS)
+        """
+        if max_concurrency is None:
+            max_concurrency = int(os.environ.get("EXTRACTION_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+        if keepalive_seconds is None:
+            keepalive_seconds = float(os.environ.get("HF_HTTP_KEEPALIVE_SECONDS", DEFAULT_HTTP_KEEPALIVE_SECONDS))
+
+        self.max_concurrency = max(1, max_concurrency)
+        # Une connexion par appel en cours (HTTP/1.1), conservées entre les appels
+        self._transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(
+            max_connections=self.max_concurrency,
+            max_keepalive_connections=self.max_concurrency,
+            keepalive_expiry=keepalive_seconds,
+        ))
+        shared = _SharedAsyncTransport(self._transport)
+        set_async_client_factory(lambda: httpx.AsyncClient(transport=shared, follow_redirects=True))
+
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        # Compteurs modifiés uniquement depuis la boucle du moteur
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._thread = threading.Thread(target=self._run_loop, name="extraction-loop", daemon=True)
+        self._thread.start()
+        logger.info(f"Moteur d'extraction asynchrone démarré ({self.max_concurrency} appels simultanés)")
+
+    def _run_loop(self):
+        """Boucle d'événements du moteur (thread dédié)."""
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def submit(
+        self,
+        text: str,
+        directive: Optional[str],
+        model_name: str,
+        on_partial: Optional[Callable[[dict], None]] = None,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> concurrent.futures.Future:
+        """
+        Soumet une extraction (appelable depuis n'importe quel thread).
+
+        Args:
+            text: Texte de description du personnage
+            directive: Instructions supplémentaires
+            model_name: Modèle Hugging Face à utiliser
+            on_partial: Fonction appelée (depuis la boucle du moteur) pour chaque trait reçu en flux
+            timings: Horodatages de l'élément de la file, complétés avec les étapes de l'inférence
+
+        Returns:
+            Future résolue avec le résultat d'extraction (voir build_result)
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self._process(text, directive, model_name, on_partial, timings), self._loop
+        )
+
+    async def _process(self, text, directive, model_name, on_partial, stages=None) -> dict:
+        """Extrait les traits et construit le résultat stocké par la file."""
+        timings = {}
+        publish = None
+        if on_partial is not None:
+            def publish(trait):
+                on_partial(trait.model_dump())
+        started = time.time()
+        traits, validated_model = await self.extract_traits(
+            text, directive, model_name, timings=timings, on_partial=publish
+        )
+        if stages is not None:
+            record_inference_stages(stages, started, timings)
+        logger.debug(f"Inférence asynchrone {model_name} : {timings.get('inference_seconds', 0.0):.3f}s")
+        return build_result(traits, model_name, validated_model)
+
+    async def extract_traits(
+        self,
+        text: str,
+        directive: Optional[str],
+        model_name: str,
+        timings: Optional[Dict[str, float]] = None,
+        on_partial: Optional[Callable[[CharacterTrait], None]] = None,
+    ) -> tuple[List[CharacterTrait], bool]:
+        """
+        Extrait les traits de caractère (équivalent asynchrone de TraitsExtractor.extract_traits).
+
+        Args:
+            text: Texte de description du personnage
+            directive: Instructions supplémentaires
+            model_name: Modèle Hugging Face à utiliser
+            timings: Dictionnaire optionnel complété avec inference_seconds
+                     (et first_token_seconds en mode flux)
+            on_partial: Si fourni, la réponse est reçue en flux et cette fonction
+                        est appelée pour chaque trait dès qu'il est complet
+
+        Returns:
+            Tuple: Liste d'objets CharacterTrait, et un booléen (validated_model)
+        """
+        messages = build_messages(text, directive)
+        spec = model_registry.get(model_name)
+        async with self._semaphore:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            start = time.perf_counter()
+            try:
+                client = AsyncInferenceClient(model=model_name, token=os.environ.get("HF_TOKEN"), timeout=spec.timeout)
+                try:
+                    if on_partial is not None:
+                        raw_result = await self._stream_completion(
+                            client, messages, spec.max_tokens, on_partial, start, timings
+                        )
+                    else:
+                        response = await client.chat_completion(
+                            messages=messages,
+                            max_tokens=spec.max_tokens,
+                            temperature=0.1,
+                        )
+                        raw_result = response.choices[0].message.content
+                finally:
+                    await client.close()
+                    seconds = time.perf_counter() - start
+                    if timings is not None:
+                        timings["inference_seconds"] = seconds
+
+                logger.debug(f"Réponse brute du modèle : {raw_result}")
+                record_llm_call(model_name, seconds)
+                return parse_llm_response(raw_result), True
+
+            except Exception as e:
+                logger.error(f"Erreur lors de l'appel asynchrone à l'API Hugging Face : {str(e)}")
+                record_llm_call(model_name, time.perf_counter() - start, e)
+                return [], not is_unsupported_model_error(e)
+            finally:
+                self.in_flight -= 1
+
+    @staticmethod
+    async def _stream_completion(client, messages, max_tokens, on_partial, start, timings) -> str:
+        """Interroge le modèle en flux et émet les traits au fil de la génération."""
+        parser = StreamingTraitParser()
+        stream = await client.chat_completion(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=0.1,
+            stream=True,
+        )
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if not content:
+                continue
+            if timings is not None and "first_token_seconds" not in timings:
+                timings["first_token_seconds"] = time.perf_counter() - start
+            for trait in parser.feed(content):
+                try:
+                    on_partial(trait)
+                except Exception as e:
+                    logger.error(f"Erreur lors de la diffusion d'un trait partiel : {str(e)}")
+        return parser.text
+
+    def stats(self) -> dict:
+        """Retourne l'occupation du moteur."""
+        return {
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "max_concurrency": self.max_concurrency,
+        }
+
+    def close(self, timeout: float = 5.0):
+        """Annule les appels en cours, ferme le pool de connexions et arrête la boucle."""
+        if self._loop.is_closed():
+            return
+
+        async def shutdown():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._transport.aclose()
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout)
+        except Exception as e:
+            logger.error(f"Arrêt incomplet du moteur d'extraction asynchrone : {str(e)}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self._loop.close()
+        logger.info("Moteur d'extraction asynchrone arrêté")
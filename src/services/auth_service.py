@@ -4,19 +4,27 @@ Ce module fournit les fonctions de hachage de mots de passe,
 création/vérification de JWT, et validation des tokens API.
 """
 
+import asyncio
 import datetime
 import hashlib
 import logging
+import os
 import secrets
 import base64
+import threading
 import bcrypt
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional, Set
 
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 from fastapi import Request, HTTPException
 
-from src.models.user import User, ApiToken, RequestLog
+from src.models.user import User, ApiToken
+from src.services import metrics
+from src.services.rate_limiter import rate_limiter
+from src.utils.lru_cache import LRUCache
 
 # Configuration du logging
 logger = logging.getLogger(__name__)
@@ -32,6 +40,154 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 heures
 RATE_LIMIT_NORMAL = 20
 RATE_LIMIT_VIP = 100
 
+# Coût bcrypt (2^rounds itérations) et nombre de hachages simultanés (surchargeables via l'environnement)
+DEFAULT_BCRYPT_ROUNDS = 12
+DEFAULT_BCRYPT_MAX_WORKERS = 2
+
+# Cache des tokens API (surchargeable via l'environnement)
+DEFAULT_TOKEN_CACHE_SIZE = 10000
+DEFAULT_TOKEN_CACHE_TTL_SECONDS = 60
+
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """Instantané des champs de l'utilisateur nécessaires aux requêtes API."""
+    id: int
+    email: str
+    status: str
+    role: str
+    preferred_model: Optional[str] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "AuthenticatedUser":
+        """Construit l'instantané à partir d'un utilisateur chargé en base."""
+        return cls(
+            id=user.id,
+            email=user.email,
+            status=user.status,
+            role=user.role,
+            preferred_model=user.preferred_model,
+        )
+
+
+@dataclass(frozen=True)
+class AuthenticatedToken:
+    """Instantané d'un token API actif."""
+    id: int
+    user_id: int
+
+
+class ApiTokenCache:
+    """
+    Cache borné (LRU + TTL) des tokens API validés.
+
+    Les routes qui modifient un utilisateur ou ses tokens invalident
+    explicitement ses entrées ; le TTL borne la durée de vie d'une entrée
+    modifiée par un autre moyen (autre processus, édition directe en base).
+    Une mise en cache commencée avant une invalidation (lecture en base
+    concurrente) est ignorée, voir generation().
+    """
+
+    def __init__(self, maxsize: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        Initialise le cache.
+
+        Args:
+            maxsize: Nombre maximal de tokens (sinon API_TOKEN_CACHE_SIZE)
+            ttl: Durée de vie d'une entrée en secondes (sinon API_TOKEN_CACHE_TTL_SECONDS)
+        """
+        if maxsize is None:
+            maxsize = int(os.environ.get("API_TOKEN_CACHE_SIZE", DEFAULT_TOKEN_CACHE_SIZE))
+        if ttl is None:
+            ttl = float(os.environ.get("API_TOKEN_CACHE_TTL_SECONDS", DEFAULT_TOKEN_CACHE_TTL_SECONDS))
+        self._cache = LRUCache(maxsize, ttl=ttl, on_evict=self._forget)
+        # Tokens mis en cache par utilisateur (pour l'invalidation), élagués à l'éviction
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        # Numéro d'invalidation global, et dernier numéro attribué à chaque utilisateur
+        self._generation = 0
+        self._invalidated_at: Dict[int, int] = {}
+        self._cleared_at = 0
+        # Réentrant : une éviction pendant put() élague l'index sous le même verrou
+        self._lock = threading.RLock()
+
+    def get(self, token_string: str) -> Optional[tuple]:
+        """Retourne (AuthenticatedUser, AuthenticatedToken) pour un token en cache, ou None."""
+        return self._cache.get(token_string)
+
+    def generation(self) -> int:
+        """Numéro d'invalidation courant, à relever avant de lire un token en base."""
+        return self._generation
+
+    def put(self, token_string: str, user: AuthenticatedUser, api_token: AuthenticatedToken,
+            generation: Optional[int] = None):
+        """
+        Met en cache un token validé.
+
+        Args:
+            token_string: Token API
+            user: Utilisateur authentifié
+            api_token: Token authentifié
+            generation: Numéro relevé par generation() avant la lecture en base ; si
+                        l'utilisateur a été invalidé depuis, la lecture est peut-être
+                        périmée et n'est pas mise en cache
+        """
+        with self._lock:
+            if generation is not None:
+                invalidated_at = max(self._cleared_at, self._invalidated_at.get(user.id, 0))
+                if invalidated_at > generation:
+                    return
+            self._tokens_by_user.setdefault(user.id, set()).add(token_string)
+            self._cache.put(token_string, (user, api_token))
+
+    def invalidate_user(self, user_id: int):
+        """Retire du cache tous les tokens d'un utilisateur (statut, modèle ou tokens modifiés)."""
+        with self._lock:
+            self._generation += 1
+            self._invalidated_at[user_id] = self._generation
+            for token_string in self._tokens_by_user.pop(user_id, ()):
+                self._cache.pop(token_string)
+
+    def clear(self):
+        """Vide le cache."""
+        with self._lock:
+            self._generation += 1
+            self._cleared_at = self._generation
+            self._invalidated_at.clear()
+            self._tokens_by_user.clear()
+            self._cache.clear()
+
+    def _forget(self, token_string: str, entry: tuple):
+        """Retire de l'index un token évincé par la taille ou expiré."""
+        user = entry[0]
+        with self._lock:
+            if token_string in self._cache:
+                # Remis en cache entre l'éviction et cet appel
+                return
+            tokens = self._tokens_by_user.get(user.id)
+            if tokens is not None:
+                tokens.discard(token_string)
+                if not tokens:
+                    del self._tokens_by_user[user.id]
+
+
+# Cache partagé par les points de terminaison de l'API
+token_cache = ApiTokenCache()
+
+
+def get_rate_limit(user: User) -> Optional[int]:
+    """
+    Retourne le quota de requêtes par 24h d'un utilisateur.
+
+    Args:
+        user: Utilisateur
+
+    Returns:
+        Nombre maximal de requêtes, ou None pour les administrateurs (sans quota)
+    """
+    if user.role == "admin":
+        return None
+    return RATE_LIMIT_VIP if user.status == "vip" else RATE_LIMIT_NORMAL
+
 
 def get_secret_key() -> str:
     """
@@ -64,7 +220,7 @@ def hash_password(password: str) -> str:
     pre_hashed_b64 = base64.b64encode(pre_hashed).decode("utf-8")
     
     # Hachage bcrypt direct
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=int(os.environ.get("BCRYPT_ROUNDS", DEFAULT_BCRYPT_ROUNDS)))
     hashed = bcrypt.hashpw(pre_hashed_b64.encode("utf-8"), salt)
     return hashed.decode("utf-8")
 
@@ -95,6 +251,40 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         return False
 
 
+# Pool dédié aux hachages bcrypt (créé au premier usage)
+_password_executor: Optional[ThreadPoolExecutor] = None
+_password_executor_lock = threading.Lock()
+
+
+def _get_password_executor() -> ThreadPoolExecutor:
+    """
+    Retourne le pool de threads des hachages bcrypt.
+
+    bcrypt libère le GIL pendant le calcul : les hachages s'exécutent en
+    parallèle de la boucle asyncio, et leur nombre simultané est borné par
+    BCRYPT_MAX_WORKERS pour qu'une rafale de connexions ne monopolise pas
+    les processeurs au détriment du trafic de l'API.
+    """
+    global _password_executor
+    with _password_executor_lock:
+        if _password_executor is None:
+            max_workers = int(os.environ.get("BCRYPT_MAX_WORKERS", DEFAULT_BCRYPT_MAX_WORKERS))
+            _password_executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="bcrypt")
+        return _password_executor
+
+
+async def hash_password_async(password: str) -> str:
+    """Version non bloquante de hash_password, exécutée dans le pool bcrypt."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_password_executor(), hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Version non bloquante de verify_password, exécutée dans le pool bcrypt."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_password_executor(), verify_password, plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[int] = None) -> str:
     """
     Crée un token JWT pour l'authentification de session.
@@ -187,19 +377,22 @@ def get_current_user(request: Request, db: Session) -> Optional[User]:
     return user
 
 
-def validate_api_token(authorization: str, db: Session) -> tuple:
+def authenticate_api_token(authorization: str, db: Session) -> tuple:
     """
-    Valide un token API et vérifie le rate limit.
+    Authentifie un token API (sans vérifier le rate limit).
+
+    Les tokens validés sont servis depuis token_cache : en régime établi,
+    l'authentification ne fait aucun aller-retour en base.
 
     Args:
         authorization: Valeur du header Authorization (Bearer <token>) ou token brut
         db: Session de base de données
 
     Returns:
-        Tuple (user, api_token) si valide
+        Tuple (AuthenticatedUser, AuthenticatedToken) si valide
 
     Raises:
-        HTTPException: Si le token est invalide, l'utilisateur bloqué, ou le rate limit dépassé
+        HTTPException: Si le token est invalide ou l'utilisateur bloqué
     """
     if not authorization:
         raise HTTPException(status_code=401, detail="Token d'autorisation manquant")
@@ -210,34 +403,56 @@ def validate_api_token(authorization: str, db: Session) -> tuple:
     else:
         token_string = authorization
 
-    # Chercher le token en base
-    api_token = db.query(ApiToken).filter(
-        ApiToken.token == token_string,
-        ApiToken.is_active.is_(True)
-    ).first()
+    cached = token_cache.get(token_string)
+    if cached is not None:
+        user, api_token = cached
+    else:
+        generation = token_cache.generation()
+        # Chercher le token et son utilisateur en base (une seule requête)
+        row = db.query(ApiToken, User).join(User, ApiToken.user_id == User.id).filter(
+            ApiToken.token == token_string,
+            ApiToken.is_active.is_(True)
+        ).first()
+
+        if not row:
+            raise HTTPException(status_code=401, detail="Token API invalide ou désactivé")
 
-    if not api_token:
-        raise HTTPException(status_code=401, detail="Token API invalide ou désactivé")
+        db_token, db_user = row
+        user = AuthenticatedUser.from_user(db_user)
+        api_token = AuthenticatedToken(id=db_token.id, user_id=db_token.user_id)
+        token_cache.put(token_string, user, api_token, generation)
 
     # Vérifier le statut de l'utilisateur
-    user = api_token.user
     if user.status in ("rejected", "suspended", "pending"):
         raise HTTPException(
             status_code=403,
             detail=f"Accès refusé : votre compte est en statut '{user.status}'"
         )
 
-    # Vérifier le rate limit
-    since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=24)
-    request_count = db.query(RequestLog).filter(
-        RequestLog.user_id == user.id,
-        RequestLog.created_at >= since
-    ).count()
+    return user, api_token
+
 
-    # Les administrateurs n'ont pas de quota de requêtes
-    if user.role != "admin":
-        rate_limit = RATE_LIMIT_VIP if user.status == "vip" else RATE_LIMIT_NORMAL
-        if request_count >= rate_limit:
+def validate_api_token(authorization: str, db: Session) -> tuple:
+    """
+    Valide un token API et vérifie le rate limit.
+
+    Args:
+        authorization: Valeur du header Authorization (Bearer <token>) ou token brut
+        db: Session de base de données
+
+    Returns:
+        Tuple (AuthenticatedUser, AuthenticatedToken) si valide
+
+    Raises:
+        HTTPException: Si le token est invalide, l'utilisateur bloqué, ou le rate limit dépassé
+    """
+    user, api_token = authenticate_api_token(authorization, db)
+
+    # Vérifier le rate limit (compteurs en mémoire, O(1)) ; les administrateurs n'ont pas de quota
+    rate_limit = get_rate_limit(user)
+    if rate_limit is not None:
+        if rate_limiter.count(user.id) >= rate_limit:
+            metrics.RATE_LIMIT_REJECTIONS.labels(endpoint="extract").inc()
             raise HTTPException(
                 status_code=429,
                 detail=f"Limite de requêtes atteinte ({rate_limit}/24h). "
@@ -258,15 +473,9 @@ def get_remaining_requests(user: User, db: Session) -> int:
     Returns:
         Nombre de requêtes restantes dans les prochaines 24h
     """
-    since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=24)
-    request_count = db.query(RequestLog).filter(
-        RequestLog.user_id == user.id,
-        RequestLog.created_at >= since
-    ).count()
-
     # Les administrateurs n'ont pas de quota de requêtes
-    if user.role == "admin":
+    rate_limit = get_rate_limit(user)
+    if rate_limit is None:
         return 9999
 
-    rate_limit = RATE_LIMIT_VIP if user.status == "vip" else RATE_LIMIT_NORMAL
-    return max(0, rate_limit - request_count)
+    return rate_limiter.remaining(user.id, rate_limit)
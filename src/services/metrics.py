@@ -0,0 +1,340 @@
+"""Métriques de l'application au format d'exposition texte de Prometheus.
+
+Compteurs, jauges et histogrammes sont tenus en mémoire et rendus par le
+point de terminaison /metrics, sans service externe. L'enregistrement est
+peu coûteux sur les chemins critiques : une série (combinaison de labels)
+déjà créée est retrouvée sans verrou, et chaque série a son propre verrou,
+pris le temps d'une addition. Les jauges décrivant un état (longueur de la
+file...) sont calculées à la lecture, par une fonction.
+"""
+
+import bisect
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Bornes par défaut des histogrammes, en secondes
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Attente en file : de quelques millisecondes à plusieurs dizaines de minutes
+QUEUE_WAIT_BUCKETS = (0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+# Sessions de base de données
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+# Type MIME du format d'exposition texte
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    """Formate une valeur selon le format d'exposition (entiers sans décimale, infinis)."""
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Formate les labels d'une série ({nom="valeur",...}), chaînes échappées."""
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class _CounterSeries:
+    """Valeur d'un compteur pour une combinaison de labels."""
+
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        """Incrémente le compteur (amount positif)."""
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeSeries:
+    """Valeur d'une jauge pour une combinaison de labels (fixée ou calculée à la lecture)."""
+
+    __slots__ = ("_lock", "_value", "_function")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = 0
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        """Fixe la valeur de la jauge."""
+        self._value = value
+
+    def inc(self, amount: float = 1):
+        """Augmente la jauge."""
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1):
+        """Diminue la jauge."""
+        with self._lock:
+            self._value -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        """Calcule la valeur à chaque lecture (état consulté au moment du rendu)."""
+        self._function = function
+
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._value
+
+
+class _HistogramSeries:
+    """Répartition des observations d'un histogramme pour une combinaison de labels."""
+
+    __slots__ = ("_lock", "_bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self._bounds = bounds
+        # Une case par borne, plus la case +Inf (non cumulées)
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """Enregistre une observation."""
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """Retourne une copie cohérente des cases, de la somme et du nombre d'observations."""
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class _Metric:
+    """Métrique nommée, déclinée en séries par combinaison de labels."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        """
+        Retourne la série d'une combinaison de labels (créée au premier usage).
+
+        Args:
+            **labels: Valeur de chaque label déclaré
+
+        Returns:
+            Série sur laquelle enregistrer les valeurs
+        """
+        key = tuple([str(labels[name]) for name in self.labelnames])
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.get(key)
+                if series is None:
+                    series = self._series[key] = self._new_series()
+        return series
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def _items(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return sorted(self._series.items())
+
+    def render(self) -> List[str]:
+        """Retourne les lignes de la métrique au format d'exposition texte."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, series in self._items():
+            lines.extend(self._render_series(key, series))
+        return lines
+
+    def _render_series(self, key, series) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(series.value)}"]
+
+
+class Counter(_Metric):
+    """Compteur monotone (nombre d'événements)."""
+
+    kind = "counter"
+
+    def _new_series(self):
+        return _CounterSeries()
+
+    def inc(self, amount: float = 1):
+        """Incrémente le compteur sans labels."""
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    """Jauge (valeur instantanée, pouvant monter et descendre)."""
+
+    kind = "gauge"
+
+    def _new_series(self):
+        return _GaugeSeries()
+
+    def set(self, value: float):
+        """Fixe la valeur de la jauge sans labels."""
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1):
+        """Augmente la jauge sans labels."""
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1):
+        """Diminue la jauge sans labels."""
+        self.labels().dec(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        """Calcule la valeur de la jauge sans labels à chaque lecture."""
+        self.labels().set_function(function)
+
+
+class Histogram(_Metric):
+    """Histogramme à bornes fixes (durées)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value: float):
+        """Enregistre une observation sans labels."""
+        self.labels().observe(value)
+
+    def _render_series(self, key, series) -> List[str]:
+        counts, total, count = series.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Ensemble des métriques exposées par /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrique déjà déclarée : {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Déclare un compteur."""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Déclare une jauge."""
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Déclare un histogramme."""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Retourne toutes les métriques au format d'exposition texte."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Registre partagé par l'application
+registry = MetricsRegistry()
+
+# --- File d'attente ---
+QUEUE_LENGTH = registry.gauge("character_queue_length", "Nombre de requêtes en attente dans la file.")
+QUEUE_PROCESSING = registry.gauge("character_queue_processing", "Nombre de requêtes en cours de traitement.")
+QUEUE_WAIT_SECONDS = registry.histogram(
+    "character_queue_wait_seconds", "Attente en file avant le début du traitement, par modèle.",
+    ["model"], buckets=QUEUE_WAIT_BUCKETS,
+)
+REQUEST_SECONDS = registry.histogram(
+    "character_request_seconds", "Durée entre l'ajout en file et la fin du traitement, par modèle et statut.",
+    ["model", "status"], buckets=QUEUE_WAIT_BUCKETS,
+)
+
+# --- Inférence ---
+LLM_REQUEST_SECONDS = registry.histogram(
+    "character_llm_request_seconds", "Durée des appels d'inférence, par modèle.", ["model"],
+)
+LLM_ERRORS = registry.counter(
+    "character_llm_errors_total", "Appels d'inférence en erreur, par modèle et motif.", ["model", "reason"],
+)
+
+# --- Cache des résultats ---
+RESULT_CACHE_LOOKUPS = registry.counter(
+    "character_result_cache_lookups_total", "Consultations du cache des résultats, par issue.", ["result"],
+)
+RESULT_CACHE_HIT_RATIO = registry.gauge(
+    "character_result_cache_hit_ratio", "Part des consultations du cache des résultats servies (mémoire ou SQLite).",
+)
+
+# --- Base de données ---
+DB_SESSIONS = registry.counter("character_db_sessions_total", "Sessions de base de données ouvertes par get_db.")
+DB_SESSIONS_OPEN = registry.gauge("character_db_sessions_open", "Sessions de base de données ouvertes par get_db en cours.")
+DB_SESSION_SECONDS = registry.histogram(
+    "character_db_session_seconds", "Durée des sessions de base de données ouvertes par get_db.", buckets=DB_BUCKETS,
+)
+
+# --- Webhooks et limitation ---
+WEBHOOK_DELIVERIES = registry.counter(
+    "character_webhook_deliveries_total", "Notifications webhook, par issue (success, failure).", ["outcome"],
+)
+RATE_LIMIT_REJECTIONS = registry.counter(
+    "character_rate_limit_rejections_total", "Requêtes refusées par le limiteur (HTTP 429), par point de terminaison.",
+    ["endpoint"],
+)
+
+
+def _result_cache_hit_ratio() -> float:
+    """Part des consultations du cache servies, calculée à la lecture."""
+    hits = misses = 0
+    for (result,), series in RESULT_CACHE_LOOKUPS._items():
+        if result == "miss":
+            misses += series.value
+        else:
+            hits += series.value
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+RESULT_CACHE_HIT_RATIO.set_function(_result_cache_hit_ratio)
@@ -0,0 +1,133 @@
+"""Diffusion des événements de la file d'attente vers les clients connectés.
+
+Les workers de la file publient depuis leurs threads ; les abonnés sont des
+générateurs asynchrones (flux Server-Sent Events) exécutés dans la boucle
+asyncio du serveur. Le courtier fait le pont entre les deux de manière
+thread-safe, sans bloquer les workers.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from typing import Dict, List, Optional, Set
+
+# Configuration du logging
+logger = logging.getLogger(__name__)
+
+# Nombre maximal d'événements en attente par abonné (les plus anciens sont abandonnés)
+DEFAULT_MAX_PENDING_EVENTS = 256
+
+# Intervalle des commentaires keep-alive des flux SSE (en secondes)
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def format_sse(event: dict) -> str:
+    """Formate un événement au format Server-Sent Events."""
+    return f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+class Subscription:
+    """Abonnement d'un client aux événements d'une requête ou d'un utilisateur."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, request_id: Optional[str],
+                 user_id: Optional[int], max_pending: int):
+        self.loop = loop
+        self.request_id = request_id
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+
+    def _deliver(self, event: dict):
+        """Dépose un événement (exécuté dans la boucle de l'abonné)."""
+        if self.queue.full():
+            # Client trop lent : abandonner l'événement le plus ancien
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        Attend le prochain événement.
+
+        Args:
+            timeout: Délai maximal d'attente en secondes
+
+        Returns:
+            Événement reçu, ou None si le délai a expiré
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class QueueEventBroker:
+    """Courtier d'événements thread-safe, filtré par request_id ou par utilisateur."""
+
+    def __init__(self, max_pending: int = DEFAULT_MAX_PENDING_EVENTS):
+        self._max_pending = max_pending
+        self._lock = threading.Lock()
+        self._by_request: Dict[str, Set[Subscription]] = {}
+        self._by_user: Dict[int, Set[Subscription]] = {}
+
+    def subscribe(self, request_id: Optional[str] = None, user_id: Optional[int] = None) -> Subscription:
+        """
+        Abonne la boucle asyncio courante aux événements d'une requête ou d'un utilisateur.
+
+        Args:
+            request_id: Requête suivie
+            user_id: Utilisateur suivi (toutes ses requêtes)
+
+        Returns:
+            Abonnement à libérer avec unsubscribe()
+        """
+        subscription = Subscription(asyncio.get_running_loop(), request_id, user_id, self._max_pending)
+        with self._lock:
+            if request_id is not None:
+                self._by_request.setdefault(request_id, set()).add(subscription)
+            if user_id is not None:
+                self._by_user.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Retire un abonnement (fin du flux ou déconnexion du client)."""
+        with self._lock:
+            for index, key in ((self._by_request, subscription.request_id),
+                               (self._by_user, subscription.user_id)):
+                subscribers = index.get(key)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del index[key]
+
+    def has_subscribers(self, request_id: Optional[str] = None, user_id: Optional[int] = None) -> bool:
+        """Indique si au moins un client suit cette requête ou cet utilisateur."""
+        with self._lock:
+            return bool(self._by_request.get(request_id)) or bool(self._by_user.get(user_id))
+
+    def subscribed_users(self) -> List[int]:
+        """Retourne les utilisateurs suivis par au moins un client (tableaux de bord connectés)."""
+        with self._lock:
+            return list(self._by_user)
+
+    def publish(self, event: dict, request_id: Optional[str] = None, user_id: Optional[int] = None):
+        """
+        Publie un événement (appelable depuis n'importe quel thread, non bloquant).
+
+        Args:
+            event: Données de l'événement (sérialisables en JSON)
+            request_id: Requête concernée
+            user_id: Utilisateur concerné
+        """
+        with self._lock:
+            targets = set(self._by_request.get(request_id, ()))
+            targets.update(self._by_user.get(user_id, ()))
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._deliver, event)
+            except RuntimeError:
+                # Boucle fermée (arrêt du serveur) : l'abonné ne lira plus rien
+                logger.debug("Événement ignoré : boucle de l'abonné fermée")
+
+
+# Courtier partagé par la file d'attente et les points de terminaison SSE
+event_broker = QueueEventBroker()
@@ -0,0 +1,226 @@
+"""Journal persistant de la file d'attente des requêtes.
+
+Ce module enregistre en base SQLite les requêtes en attente ou en cours de
+traitement, afin qu'un redémarrage (crash, déploiement) ne les perde pas.
+Les écritures sont regroupées par un thread dédié : plusieurs ajouts
+concurrents partagent une seule transaction (et donc un seul fsync).
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+from sqlalchemy.dialects.sqlite import insert
+
+from src.models.queued_request import QueuedRequest
+
+# Configuration du logging
+logger = logging.getLogger(__name__)
+
+# Délai supplémentaire de regroupement des écritures (surchargeable via QUEUE_JOURNAL_FLUSH_MS).
+# À 0, le lot contient les opérations arrivées pendant la validation précédente.
+DEFAULT_FLUSH_INTERVAL_MS = 0
+# Nombre maximal d'opérations par transaction
+MAX_BATCH_SIZE = 500
+
+
+class _JournalOp:
+    """Opération en attente d'écriture dans le journal."""
+
+    __slots__ = ("kind", "payload", "done")
+
+    def __init__(self, kind: str, payload, wait: bool = False):
+        self.kind = kind
+        self.payload = payload
+        self.done = threading.Event() if wait else None
+
+
+class QueueJournal:
+    """Journal SQLite des éléments de la file, écrit par lots (group commit)."""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = None,
+        flush_interval_ms: Optional[float] = None,
+    ):
+        """
+        Initialise le journal et démarre le thread d'écriture.
+
+        Args:
+            session_factory: Fabrique de sessions SQLAlchemy (sinon SessionLocal)
+            flush_interval_ms: Délai de regroupement des écritures en millisecondes
+                               (sinon QUEUE_JOURNAL_FLUSH_MS ou DEFAULT_FLUSH_INTERVAL_MS)
+        """
+        if session_factory is None:
+            from src.database import SessionLocal
+            session_factory = SessionLocal
+        if flush_interval_ms is None:
+            flush_interval_ms = float(os.environ.get("QUEUE_JOURNAL_FLUSH_MS", DEFAULT_FLUSH_INTERVAL_MS))
+
+        self._session_factory = session_factory
+        self._flush_interval = max(0.0, flush_interval_ms) / 1000
+        self._ops: "queue.Queue[Optional[_JournalOp]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._writer_loop, name="queue-journal", daemon=True)
+        self._writer.start()
+
+    def record_enqueue(self, item, wait: bool = True):
+        """
+        Enregistre (ou remplace, par request_id) un élément en attente.
+
+        Args:
+            item: QueueItem ajouté à la file
+            wait: Si True, attend que la transaction du lot soit validée sur disque
+        """
+        op = _JournalOp("upsert", {
+            "request_id": item.request_id,
+            "user_id": item.user_id,
+            "user_email": item.user_email,
+            "text": item.text,
+            "directive": item.directive,
+            "model_name": item.model_name,
+            "webhook": item.webhook,
+            "result_url": item.result_url,
+            "stream": item.stream,
+            "status": "waiting",
+            "enqueued_at": item.created_at,
+        }, wait=wait)
+        self._ops.put(op)
+        if op.done is not None:
+            op.done.wait()
+
+    def record_enqueue_many(self, items):
+        """
+        Enregistre plusieurs éléments en attente et attend la validation du dernier.
+
+        Les opérations sont appliquées dans l'ordre : une fois la dernière
+        validée sur disque, toutes les précédentes le sont aussi.
+
+        Args:
+            items: QueueItem ajoutés à la file
+        """
+        for index, item in enumerate(items):
+            self.record_enqueue(item, wait=index == len(items) - 1)
+
+    def record_processing(self, item):
+        """Marque un élément comme en cours de traitement (sans attendre l'écriture)."""
+        self._ops.put(_JournalOp("processing", (item.request_id, item.created_at)))
+
+    def record_removed(self, item):
+        """Retire un élément du journal (requête annulée ou surchargée)."""
+        self._ops.put(_JournalOp("delete", (item.request_id, item.created_at)))
+
+    @staticmethod
+    def delete_in_session(db, item):
+        """
+        Retire un élément du journal dans une session existante.
+
+        Utilisé lors de la sauvegarde du résultat pour que l'écriture du résultat
+        et la sortie du journal soient validées dans la même transaction.
+        La condition sur enqueued_at évite d'effacer une surcharge plus récente.
+        """
+        db.query(QueuedRequest).filter(
+            QueuedRequest.request_id == item.request_id,
+            QueuedRequest.enqueued_at == item.created_at,
+        ).delete(synchronize_session=False)
+
+    def load_pending(self) -> List[dict]:
+        """
+        Charge les éléments à rejouer au démarrage (en attente ou interrompus en cours).
+
+        Returns:
+            Liste de dictionnaires des champs de QueueItem, par ordre d'arrivée
+        """
+        db = self._session_factory()
+        try:
+            rows = db.query(QueuedRequest).order_by(QueuedRequest.enqueued_at, QueuedRequest.id).all()
+            return [{
+                "request_id": row.request_id,
+                "user_id": row.user_id,
+                "user_email": row.user_email,
+                "text": row.text,
+                "directive": row.directive,
+                "model_name": row.model_name,
+                "webhook": row.webhook,
+                "result_url": row.result_url,
+                # Ligne écrite avant l'ajout de la colonne : pas de flux
+                "stream": bool(row.stream),
+                "created_at": row.enqueued_at,
+                "was_processing": row.status == "processing",
+            } for row in rows]
+        finally:
+            db.close()
+
+    def close(self):
+        """Vide les écritures en attente puis arrête le thread d'écriture."""
+        self._ops.put(None)
+        self._writer.join(timeout=5)
+
+    def _writer_loop(self):
+        """Boucle du thread d'écriture : regroupe les opérations en transactions."""
+        stopping = False
+        while not stopping:
+            op = self._ops.get()
+            if op is None:
+                break
+            batch = [op]
+            # Laisser les ajouts concurrents rejoindre le lot avant la validation
+            deadline = time.monotonic() + self._flush_interval
+            while len(batch) < MAX_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                try:
+                    next_op = self._ops.get(timeout=remaining) if remaining > 0 else self._ops.get_nowait()
+                except queue.Empty:
+                    break
+                if next_op is None:
+                    stopping = True
+                    break
+                batch.append(next_op)
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[_JournalOp]):
+        """Applique un lot d'opérations dans une seule transaction."""
+        db = self._session_factory()
+        try:
+            upserts = []
+            for op in batch:
+                if op.kind == "upsert":
+                    upserts.append(op.payload)
+                    continue
+                # Conserver l'ordre des opérations : appliquer les ajouts accumulés d'abord
+                self._flush_upserts(db, upserts)
+                upserts = []
+                request_id, enqueued_at = op.payload
+                query = db.query(QueuedRequest).filter(
+                    QueuedRequest.request_id == request_id,
+                    QueuedRequest.enqueued_at == enqueued_at,
+                )
+                if op.kind == "processing":
+                    query.update({"status": "processing"}, synchronize_session=False)
+                else:
+                    query.delete(synchronize_session=False)
+            self._flush_upserts(db, upserts)
+            db.commit()
+            logger.debug(f"Journal de file : {len(batch)} opération(s) validée(s)")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Échec de l'écriture du journal de file : {str(e)}")
+        finally:
+            db.close()
+            for op in batch:
+                if op.done is not None:
+                    op.done.set()
+
+    @staticmethod
+    def _flush_upserts(db, rows: List[dict]):
+        """Insère ou remplace (par request_id) plusieurs lignes en un seul executemany."""
+        if not rows:
+            return
+        stmt = insert(QueuedRequest)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[QueuedRequest.request_id],
+            set_={k: stmt.excluded[k] for k in rows[0] if k != "request_id"},
+        )
+        db.execute(stmt, rows)
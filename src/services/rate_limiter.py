@@ -0,0 +1,317 @@
+"""Limiteur de requêtes par utilisateur (fenêtre glissante par tranches).
+
+Les compteurs sont tenus en mémoire : chaque utilisateur dispose d'un
+tampon circulaire de tranches couvrant la fenêtre (24 h par défaut) et du
+total courant, si bien qu'une vérification coûte O(1) quel que soit
+l'historique. Les tranches modifiées sont écrites périodiquement dans la
+table rate_limit_bucket ; la table request_log reste le journal d'audit et
+ne sert qu'à l'amorçage initial des compteurs.
+"""
+
+import datetime
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from sqlalchemy.dialects.sqlite import insert
+
+from src.models.rate_limit_bucket import RateLimitBucket
+
+# Configuration du logging
+logger = logging.getLogger(__name__)
+
+# Valeurs par défaut (surchargeables via l'environnement)
+DEFAULT_WINDOW_SECONDS = 24 * 3600
+DEFAULT_BUCKET_SECONDS = 300
+DEFAULT_FLUSH_INTERVAL_SECONDS = 30
+
+
+class _UserWindow:
+    """Compteurs d'un utilisateur : une case par tranche de la fenêtre."""
+
+    __slots__ = ("counts", "last_bucket", "total")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.last_bucket: Optional[int] = None
+        self.total = 0
+
+
+class RateLimiter:
+    """
+    Limiteur à fenêtre glissante par tranches, en mémoire et persisté périodiquement.
+
+    Une requête est décomptée jusqu'à la fin de la tranche qui suit l'expiration
+    de la fenêtre : l'approximation est conservatrice (jamais plus de requêtes
+    que la limite sur une fenêtre réelle).
+    """
+
+    def __init__(
+        self,
+        window_seconds: Optional[int] = None,
+        bucket_seconds: Optional[int] = None,
+        session_factory: Optional[Callable] = None,
+        flush_interval: Optional[float] = None,
+    ):
+        """
+        Initialise le limiteur (les compteurs sont chargés au premier usage).
+
+        Args:
+            window_seconds: Durée de la fenêtre (sinon RATE_LIMIT_WINDOW_SECONDS)
+            bucket_seconds: Durée d'une tranche (sinon RATE_LIMIT_BUCKET_SECONDS)
+            session_factory: Fabrique de sessions SQLAlchemy (sinon SessionLocal)
+            flush_interval: Intervalle d'écriture des compteurs en secondes
+                            (sinon RATE_LIMIT_FLUSH_SECONDS)
+        """
+        if window_seconds is None:
+            window_seconds = int(os.environ.get("RATE_LIMIT_WINDOW_SECONDS", DEFAULT_WINDOW_SECONDS))
+        if bucket_seconds is None:
+            bucket_seconds = int(os.environ.get("RATE_LIMIT_BUCKET_SECONDS", DEFAULT_BUCKET_SECONDS))
+        if flush_interval is None:
+            flush_interval = float(os.environ.get("RATE_LIMIT_FLUSH_SECONDS", DEFAULT_FLUSH_INTERVAL_SECONDS))
+
+        self.bucket_seconds = max(1, bucket_seconds)
+        self.size = max(1, -(-window_seconds // self.bucket_seconds))
+        self._session_factory = session_factory
+        self._flush_interval = flush_interval
+        self._windows: Dict[int, _UserWindow] = {}
+        # Tranches modifiées depuis la dernière écriture : (user_id, numéro de tranche)
+        self._dirty: Set[Tuple[int, int]] = set()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loaded = False
+        self._stop_event = threading.Event()
+        self._flush_thread: Optional[threading.Thread] = None
+
+    # --- Vérifications et décompte (O(1)) ---
+
+    def count(self, user_id: int, now: Optional[float] = None) -> int:
+        """Retourne le nombre de requêtes de l'utilisateur sur la fenêtre."""
+        self._ensure_loaded()
+        bucket = self._bucket_of(now)
+        with self._lock:
+            window = self._windows.get(user_id)
+            if window is None:
+                return 0
+            self._advance(window, bucket)
+            return window.total
+
+    def remaining(self, user_id: int, limit: int, now: Optional[float] = None) -> int:
+        """Retourne le nombre de requêtes encore autorisées sur la fenêtre."""
+        return max(0, limit - self.count(user_id, now))
+
+    def record(self, user_id: int, amount: int = 1, now: Optional[float] = None):
+        """Décompte des requêtes sans vérifier la limite."""
+        self._ensure_loaded()
+        bucket = self._bucket_of(now)
+        with self._lock:
+            self._add(user_id, bucket, amount)
+
+    def try_consume(self, user_id: int, limit: Optional[int], amount: int = 1,
+                    now: Optional[float] = None) -> bool:
+        """
+        Décompte atomiquement des requêtes si la limite le permet.
+
+        Args:
+            user_id: Identifiant de l'utilisateur
+            limit: Nombre maximal de requêtes sur la fenêtre (None : illimité)
+            amount: Nombre de requêtes à décompter (tout ou rien)
+            now: Horodatage (epoch) à utiliser à la place de l'heure courante
+
+        Returns:
+            True si les requêtes ont été décomptées, False si la limite serait dépassée
+        """
+        self._ensure_loaded()
+        bucket = self._bucket_of(now)
+        with self._lock:
+            window = self._windows.get(user_id)
+            current = 0
+            if window is not None:
+                self._advance(window, bucket)
+                current = window.total
+            if limit is not None and current + amount > limit:
+                return False
+            self._add(user_id, bucket, amount)
+            return True
+
+    def _bucket_of(self, now: Optional[float]) -> int:
+        """Numéro de la tranche contenant l'instant donné."""
+        return int((time.time() if now is None else now) // self.bucket_seconds)
+
+    def _add(self, user_id: int, bucket: int, amount: int):
+        """Ajoute des requêtes dans la tranche courante (verrou requis)."""
+        window = self._windows.get(user_id)
+        if window is None:
+            window = self._windows[user_id] = _UserWindow(self.size)
+        self._advance(window, bucket)
+        window.counts[bucket % self.size] += amount
+        window.total += amount
+        self._dirty.add((user_id, bucket))
+
+    def _advance(self, window: _UserWindow, bucket: int):
+        """
+        Fait glisser la fenêtre jusqu'à la tranche donnée (verrou requis).
+
+        Les tranches sorties de la fenêtre sont vidées ; leur nombre est borné
+        par la taille du tampon, donc indépendant de l'historique.
+        """
+        last = window.last_bucket
+        if last is not None and bucket <= last:
+            return
+        if last is None or bucket - last >= self.size:
+            window.counts = [0] * self.size
+            window.total = 0
+        else:
+            for expired in range(last + 1, bucket + 1):
+                slot = expired % self.size
+                window.total -= window.counts[slot]
+                window.counts[slot] = 0
+        window.last_bucket = bucket
+
+    # --- Persistance ---
+
+    def _get_session_factory(self) -> Callable:
+        """Retourne la fabrique de sessions (SessionLocal par défaut)."""
+        if self._session_factory is not None:
+            return self._session_factory
+        import src.database
+        if src.database.SessionLocal is None:
+            src.database.init_db()
+        return src.database.SessionLocal
+
+    def _ensure_loaded(self) -> bool:
+        """
+        Charge les compteurs persistés au premier usage.
+
+        Un chargement en échec est retenté à l'appel suivant ; entre-temps les
+        requêtes sont décomptées en mémoire et s'ajouteront aux compteurs chargés.
+
+        Returns:
+            True si les compteurs persistés ont été chargés
+        """
+        if self._loaded:
+            return True
+        with self._load_lock:
+            if not self._loaded and self._load():
+                self._loaded = True
+            return self._loaded
+
+    def _load(self) -> bool:
+        """
+        Charge les tranches persistées de la fenêtre courante.
+
+        Si aucune tranche n'a encore été persistée (première mise en service),
+        les compteurs sont amorcés depuis request_log, en une seule requête.
+
+        Returns:
+            True si le chargement a réussi, False en cas d'erreur de la base
+        """
+        current = self._bucket_of(None)
+        oldest = current - self.size + 1
+        db = None
+        try:
+            db = self._get_session_factory()()
+            rows = db.query(RateLimitBucket).filter(
+                RateLimitBucket.bucket_start >= oldest * self.bucket_seconds
+            ).all()
+            entries = [(row.user_id, row.bucket_start // self.bucket_seconds, row.count) for row in rows]
+            if not entries and db.query(RateLimitBucket.user_id).first() is None:
+                entries = self._bootstrap_from_request_log(db, oldest)
+        except Exception as e:
+            logger.error(f"Impossible de charger les compteurs du limiteur (nouvel essai au prochain appel) : {str(e)}")
+            return False
+        finally:
+            if db is not None:
+                db.close()
+
+        with self._lock:
+            for user_id, bucket, count in entries:
+                if oldest <= bucket <= current:
+                    self._add(user_id, bucket, count)
+        logger.info(f"Limiteur de requêtes : {len(entries)} tranche(s) chargée(s)")
+        return True
+
+    def _bootstrap_from_request_log(self, db, oldest: int) -> list:
+        """Regroupe par tranche les requêtes de request_log de la fenêtre courante."""
+        from src.models.user import RequestLog
+
+        since = datetime.datetime.fromtimestamp(oldest * self.bucket_seconds, datetime.timezone.utc)
+        counts: Dict[Tuple[int, int], int] = {}
+        for user_id, created_at in db.query(RequestLog.user_id, RequestLog.created_at).filter(
+            RequestLog.created_at >= since
+        ):
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=datetime.timezone.utc)
+            key = (user_id, self._bucket_of(created_at.timestamp()))
+            counts[key] = counts.get(key, 0) + 1
+        return [(user_id, bucket, count) for (user_id, bucket), count in counts.items()]
+
+    def flush(self):
+        """Écrit les tranches modifiées et supprime les tranches expirées."""
+        if not self._ensure_loaded():
+            # Écrire les seuls compteurs en mémoire écraserait les tranches persistées
+            return
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            rows = []
+            for user_id, bucket in dirty:
+                window = self._windows.get(user_id)
+                # Une tranche déjà sortie de la fenêtre n'a plus besoin d'être écrite
+                if window is None or window.last_bucket - bucket >= self.size:
+                    continue
+                rows.append({
+                    "user_id": user_id,
+                    "bucket_start": bucket * self.bucket_seconds,
+                    "count": window.counts[bucket % self.size],
+                })
+
+        oldest = self._bucket_of(None) - self.size + 1
+        db = self._get_session_factory()()
+        try:
+            if rows:
+                stmt = insert(RateLimitBucket)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[RateLimitBucket.user_id, RateLimitBucket.bucket_start],
+                    set_={"count": stmt.excluded.count},
+                )
+                db.execute(stmt, rows)
+            db.query(RateLimitBucket).filter(
+                RateLimitBucket.bucket_start < oldest * self.bucket_seconds
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Échec de l'écriture des compteurs du limiteur : {str(e)}")
+            with self._lock:
+                self._dirty.update(dirty)
+        finally:
+            db.close()
+
+    def start(self):
+        """Démarre l'écriture périodique des compteurs."""
+        if self._flush_thread is not None:
+            return
+        self._stop_event.clear()
+        self._flush_thread = threading.Thread(target=self._flush_loop, name="rate-limiter-flush", daemon=True)
+        self._flush_thread.start()
+
+    def close(self):
+        """Arrête l'écriture périodique et écrit les derniers compteurs."""
+        self._stop_event.set()
+        if self._flush_thread is not None:
+            self._flush_thread.join(timeout=5)
+            self._flush_thread = None
+        if self._loaded:
+            self.flush()
+
+    def _flush_loop(self):
+        """Boucle d'écriture périodique."""
+        while not self._stop_event.wait(self._flush_interval):
+            if self._dirty:
+                self.flush()
+
+
+# Limiteur partagé par les points de terminaison de l'API
+rate_limiter = RateLimiter()
@@ -1,23 +1,85 @@
 """Service de file d'attente globale FIFO pour le traitement des requêtes.
 
-Ce module gère une file d'attente unique qui traite les requêtes
-d'extraction de traits une par une, dans l'ordre d'arrivée.
+Ce module gère une file d'attente unique dont les requêtes d'extraction
+de traits sont prises dans l'ordre d'arrivée par un pool de workers,
+avec une limite optionnelle de traitements simultanés par modèle.
+Les requêtes de contenu identique (texte, directive, modèle) soumises
+pendant qu'une première est en attente ou en cours sont regroupées sur
+celle-ci et reçoivent une copie de son résultat.
+En mode asynchrone, un thread de répartition soumet les éléments à un
+moteur d'extraction asyncio (un nombre borné d'appels en cours) et un
+thread de finalisation sauvegarde leurs résultats.
+Les traits partiels et la fin de chaque traitement sont publiés sur le
+courtier d'événements (flux Server-Sent Events).
+Le statut d'une requête se lit sans prendre le verrou de la file : les
+modifications des structures en mémoire incrémentent un numéro de version
+(seqlock) et une lecture concurrente d'une modification est recommencée.
 """
 
+import concurrent.futures
+import copy
+import datetime
+import inspect
 import json
 import logging
 import os
 import threading
 import time
+from collections import deque
+from contextlib import contextmanager
 from dataclasses import dataclass, field
-from typing import Optional, Dict, List, Any, Callable
+from itertools import islice
+from typing import Optional, Dict, List, Any, Callable, Deque
 from enum import Enum
+from queue import SimpleQueue
 
+from src.services import metrics
+from src.services.queue_events import event_broker
+from src.services.result_cache import make_cache_key, is_cacheable
+from src.services.result_store import build_result_row, record_result_stage, upsert_result_rows
 from src.utils.path_utils import sanitize_email
 
 # Configuration du logging
 logger = logging.getLogger(__name__)
 
+# Nombre de workers par défaut (surchargeable via QUEUE_WORKERS)
+DEFAULT_NUM_WORKERS = 4
+
+# Tentatives de lecture sans verrou avant de prendre le verrou de la file
+LOCK_FREE_READ_ATTEMPTS = 3
+
+# Éléments affichés par le tableau de bord (MAX_DISPLAYED_ITEMS de dashboard.js)
+DASHBOARD_MAX_ITEMS = 20
+
+
+def _parse_model_limits(raw: str) -> Dict[str, int]:
+    """
+    Parse la variable QUEUE_MODEL_LIMITS au format "modele=2,autre/modele=1".
+
+    Args:
+        raw: Chaîne brute issue de l'environnement
+
+    Returns:
+        Dictionnaire modèle -> nombre maximal de traitements simultanés
+    """
+    limits = {}
+    for entry in raw.split(","):
+        if "=" not in entry:
+            continue
+        model, value = entry.rsplit("=", 1)
+        try:
+            limits[model.strip()] = max(1, int(value))
+        except ValueError:
+            logger.warning(f"Limite de modèle ignorée (valeur invalide) : {entry.strip()}")
+    return limits
+
+
+def _as_naive_utc(value: datetime.datetime) -> datetime.datetime:
+    """Convertit une date en UTC sans fuseau (format de stockage des dates en base)."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
 
 class QueueItemStatus(str, Enum):
     """États possibles d'un élément dans la file d'attente."""
@@ -43,10 +105,128 @@ class QueueItem:
     webhook: Optional[str] = None
     result_url: Optional[str] = None
     created_at: float = field(default_factory=time.time)
+    # Numéro d'ordre monotone attribué à l'ajout (sert au calcul des positions)
+    seq: int = 0
+    # Empreinte du contenu (texte, directive, modèle), calculée à la création
+    content_key: Optional[str] = None
+    # request_id de la requête dont le traitement est partagé (requête regroupée)
+    coalesced_with: Optional[str] = None
+    # Extraction en flux : les traits sont publiés au fil de la génération
+    stream: bool = False
+    # Traits déjà reçus pendant un traitement en flux
+    partial_traits: List[dict] = field(default_factory=list)
+    # Horodatages (epoch) des étapes du traitement, voir stage_durations
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def __post_init__(self):
+        if self.content_key is None:
+            self.content_key = make_cache_key(self.text, self.directive, self.model_name)
+
+
+def stage_durations(timings: Optional[Dict[str, float]]) -> Dict[str, float]:
+    """
+    Décompose la latence d'une requête à partir des horodatages de ses étapes.
+
+    Étapes enregistrées : enqueued, dequeued, inference_started, first_token
+    (mode flux), inference_finished, parsed, persisted et webhook_delivered.
+    Seules les durées dont les deux bornes sont connues sont retournées
+    (un résultat servi par le cache n'a ni attente ni inférence).
+
+    Args:
+        timings: Horodatages de QueueItem.timings (ou de la colonne timings_json)
+
+    Returns:
+        Durées en secondes : queue_wait, inference, first_token, parse,
+        persist, webhook et total
+    """
+    timings = timings or {}
+    # Fin du traitement : analyse, inférence, retrait de la file, ou ajout si servi par le cache
+    processed = next((timings[stage] for stage in ("parsed", "inference_finished", "dequeued", "enqueued")
+                      if stage in timings), None)
+    bounds = {
+        "queue_wait": ("enqueued", timings.get("dequeued")),
+        "inference": ("inference_started", timings.get("inference_finished")),
+        "first_token": ("inference_started", timings.get("first_token")),
+        "parse": ("inference_finished", timings.get("parsed")),
+        "persist": (None, timings.get("persisted")),
+        "webhook": (None, timings.get("webhook_delivered")),
+        "total": ("enqueued", timings.get("persisted")),
+    }
+    durations = {}
+    for name, (start_stage, end) in bounds.items():
+        # Écriture et webhook sont mesurés depuis la fin du traitement
+        start = timings.get(start_stage) if start_stage else processed
+        if start is not None and end is not None:
+            durations[f"{name}_seconds"] = max(0.0, end - start)
+    return durations
+
+
+def _accepts_timings(func: Callable) -> bool:
+    """Indique si une fonction de traitement accepte le paramètre timings."""
+    try:
+        parameters = inspect.signature(func).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(p.name == "timings" or p.kind == p.VAR_KEYWORD for p in parameters)
+
+
+class _FenwickTree:
+    """
+    Arbre de Fenwick (Binary Indexed Tree) sur les numéros d'ordre de la file.
+
+    Chaque élément en attente compte pour 1 à l'indice de son numéro d'ordre :
+    le nombre d'éléments qui le précèdent s'obtient en O(log n), retraits
+    compris, sans renuméroter toute la file.
+    """
+
+    def __init__(self):
+        self._tree: List[int] = [0]
+
+    def add(self, index: int, delta: int):
+        """Ajoute delta à l'indice donné (indices à partir de 1)."""
+        size = len(self._tree)
+        if index >= size:
+            self._grow(index)
+            size = len(self._tree)
+        while index < size:
+            self._tree[index] += delta
+            index += index & -index
+
+    def prefix_sum(self, index: int) -> int:
+        """Somme des valeurs des indices 1..index."""
+        # Référence locale : l'arbre peut être remplacé (_grow, clear) pendant une lecture sans verrou
+        tree = self._tree
+        index = min(index, len(tree) - 1)
+        total = 0
+        while index > 0:
+            total += tree[index]
+            index -= index & -index
+        return total
+
+    def _grow(self, index: int):
+        """Double la capacité de l'arbre en reconstruisant les sommes partielles."""
+        old_size = len(self._tree)
+        new_size = old_size
+        while new_size <= index:
+            new_size *= 2
+        values = [0] * new_size
+        # Récupérer les valeurs individuelles puis reconstruire en O(n)
+        for i in range(1, old_size):
+            values[i] = self.prefix_sum(i) - self.prefix_sum(i - 1)
+        tree = values
+        for i in range(1, new_size):
+            parent = i + (i & -i)
+            if parent < new_size:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def clear(self):
+        """Réinitialise l'arbre."""
+        self._tree = [0]
 
 
 class RequestQueue:
-    """File d'attente FIFO globale pour le traitement séquentiel des requêtes."""
+    """File d'attente FIFO globale drainée par un pool de workers."""
 
     _instance = None
     _lock = threading.Lock()
@@ -63,80 +243,511 @@ class RequestQueue:
         """Initialisation des attributs du singleton."""
         if self._initialized:
             return
-        self._queue: List[QueueItem] = []
-        self._processing: Optional[QueueItem] = None
+        # Éléments en attente, indexés par request_id (ordre d'ajout)
+        self._waiting: Dict[str, QueueItem] = {}
+        # Files FIFO par modèle ; les éléments retirés y restent jusqu'à leur passage en tête
+        self._waiting_by_model: Dict[str, Deque[QueueItem]] = {}
+        # Index par utilisateur des éléments en attente
+        self._waiting_by_user: Dict[int, Dict[str, QueueItem]] = {}
+        self._positions = _FenwickTree()
+        self._next_seq = 1
+        # Éléments en cours de traitement, par request_id (ordre de démarrage)
+        self._processing: Dict[str, QueueItem] = {}
+        self._running_by_model: Dict[str, int] = {}
+        # Regroupement (single-flight) : requête de référence et requêtes regroupées
+        # sur elle, par empreinte de contenu, et index de ces dernières
+        self._leaders: Dict[str, QueueItem] = {}
+        self._followers: Dict[str, List[QueueItem]] = {}
+        self._follower_items: Dict[str, QueueItem] = {}
+        self._followers_by_user: Dict[int, Dict[str, QueueItem]] = {}
         self._process_func: Optional[Callable] = None
-        self._worker_thread: Optional[threading.Thread] = None
+        # La fonction de traitement complète-t-elle les horodatages de l'inférence ?
+        self._process_timings = False
+        self._worker_threads: List[threading.Thread] = []
+        self._model_limits: Dict[str, int] = {}
+        # Mode asynchrone : fonction de soumission, nombre maximal d'éléments en cours
+        # et éléments dont l'extraction est terminée, en attente de finalisation
+        self._submit_func: Optional[Callable] = None
+        self._max_processing: Optional[int] = None
+        self._completions: Optional[SimpleQueue] = None
+        # Journal persistant optionnel (QueueJournal), rejoué au démarrage
+        self._journal = None
+        # Cache optionnel des résultats (ResultCache), consulté à l'ajout
+        self._result_cache = None
+        # Magasin optionnel des résultats récents (ResultStore), écrits en base en différé
+        self._result_store = None
         self._stop_event = threading.Event()
         self._queue_lock = threading.Lock()
+        # Réveille les workers à chaque ajout, libération de capacité ou arrêt
+        self._queue_cond = threading.Condition(self._queue_lock)
+        # Version des structures en mémoire, impaire pendant une modification (seqlock)
+        self._version = 0
+        # Ordonne les publications aux tableaux de bord ; dernière longueur de file publiée
+        self._publish_lock = threading.Lock()
+        self._published_length = 0
         self._initialized = True
         logger.info("File d'attente des requêtes initialisée")
 
-    def start_worker(self, process_func: Callable):
+    def start_worker(
+        self,
+        process_func: Callable,
+        num_workers: Optional[int] = None,
+        model_limits: Optional[Dict[str, int]] = None,
+    ):
         """
-        Démarre le worker qui traite la file d'attente.
+        Démarre le pool de workers qui traite la file d'attente.
 
         Args:
             process_func: Fonction de traitement (text, directive, model_name) -> result
+            num_workers: Nombre de workers (sinon QUEUE_WORKERS ou DEFAULT_NUM_WORKERS)
+            model_limits: Nombre maximal de traitements simultanés par modèle
+                          (sinon QUEUE_MODEL_LIMITS, ex: "Qwen/Qwen2.5-72B-Instruct=2")
         """
         self._initialize()
+        if num_workers is None:
+            num_workers = int(os.environ.get("QUEUE_WORKERS", DEFAULT_NUM_WORKERS))
+        if model_limits is None:
+            model_limits = _parse_model_limits(os.environ.get("QUEUE_MODEL_LIMITS", ""))
+
         self._process_func = process_func
+        self._process_timings = _accepts_timings(process_func)
+        self._model_limits = dict(model_limits)
         self._stop_event.clear()
-        self._worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
-        self._worker_thread.start()
-        logger.info("Worker de traitement démarré")
+        self._worker_threads = []
+        for i in range(max(1, num_workers)):
+            thread = threading.Thread(target=self._worker_loop, name=f"queue-worker-{i}", daemon=True)
+            thread.start()
+            self._worker_threads.append(thread)
+        logger.info(f"Pool de {len(self._worker_threads)} worker(s) de traitement démarré")
+
+    def start_async_worker(
+        self,
+        submit_func: Callable,
+        max_in_flight: int,
+        model_limits: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Démarre le traitement asynchrone de la file (AsyncExtractionEngine).
+
+        Un thread de répartition retire les éléments dans l'ordre de la file et
+        les soumet sans attendre leur résultat, dans la limite de max_in_flight
+        éléments en cours : les suivants gardent leur place (et restent
+        annulables). Un thread de finalisation sauvegarde les résultats et
+        notifie les webhooks, hors de la boucle asyncio du moteur.
+
+        Args:
+            submit_func: Fonction (text, directive, model_name) -> concurrent.futures.Future
+            max_in_flight: Nombre maximal d'éléments en cours de traitement
+            model_limits: Nombre maximal de traitements simultanés par modèle
+                          (sinon QUEUE_MODEL_LIMITS)
+        """
+        self._initialize()
+        if model_limits is None:
+            model_limits = _parse_model_limits(os.environ.get("QUEUE_MODEL_LIMITS", ""))
+
+        self._submit_func = submit_func
+        self._process_timings = _accepts_timings(submit_func)
+        self._model_limits = dict(model_limits)
+        self._max_processing = max(1, max_in_flight)
+        self._completions = SimpleQueue()
+        self._stop_event.clear()
+        self._worker_threads = [
+            threading.Thread(target=self._dispatch_loop, name="queue-dispatcher", daemon=True),
+            threading.Thread(target=self._finalize_loop, name="queue-finalizer", daemon=True),
+        ]
+        for thread in self._worker_threads:
+            thread.start()
+        logger.info(f"Traitement asynchrone de la file démarré ({self._max_processing} éléments en cours maximum)")
+
+    def set_model_limits(self, model_limits: Dict[str, int]):
+        """
+        Remplace les limites de traitements simultanés par modèle (ex: rechargement de deploy.conf).
+
+        Les limites de QUEUE_MODEL_LIMITS priment sur celles fournies. Les
+        workers sont réveillés pour tenir compte d'une limite relevée.
+
+        Args:
+            model_limits: Nombre maximal de traitements simultanés par modèle
+        """
+        self._initialize()
+        limits = dict(model_limits)
+        limits.update(_parse_model_limits(os.environ.get("QUEUE_MODEL_LIMITS", "")))
+        with self._queue_cond:
+            self._model_limits = limits
+            self._queue_cond.notify_all()
+        logger.info(f"Limites par modèle de la file mises à jour : {limits}")
+
+    def attach_journal(self, journal) -> int:
+        """
+        Associe un journal persistant à la file et rejoue son contenu.
+
+        Les éléments en attente ou interrompus en cours de traitement lors de
+        l'arrêt précédent sont remis en file dans leur ordre d'arrivée. Le
+        rejeu est idempotent par request_id : un élément déjà présent en file
+        ou en cours de traitement n'est pas ajouté une seconde fois.
+
+        Args:
+            journal: Instance de QueueJournal
+
+        Returns:
+            Nombre d'éléments remis en file
+        """
+        self._initialize()
+        self._journal = journal
+        replayed = 0
+        for fields in journal.load_pending():
+            was_processing = fields.pop("was_processing")
+            item = QueueItem(**fields)
+            with self._queue_lock:
+                if item.request_id in self._waiting or item.request_id in self._processing:
+                    continue
+            # Remettre le statut "waiting" dans le journal (l'élément interrompu repart de zéro)
+            if was_processing:
+                journal.record_enqueue(item, wait=False)
+            self._push(item)
+            replayed += 1
+        if replayed:
+            logger.info(f"{replayed} requête(s) rejouée(s) depuis le journal de la file")
+        return replayed
+
+    def attach_result_cache(self, cache):
+        """
+        Associe un cache de résultats à la file.
+
+        Un élément dont le contenu est déjà en cache est terminé dès son ajout,
+        sans passer par les workers ; les résultats calculés y sont enregistrés.
+
+        Args:
+            cache: Instance de ResultCache
+        """
+        self._initialize()
+        self._result_cache = cache
+
+    def attach_result_store(self, store):
+        """
+        Associe un magasin de résultats récents à la file.
+
+        Les résultats terminés y sont enregistrés et servis en priorité ; leur
+        écriture en base (et la sortie du journal) est faite par lots par le
+        thread du magasin, sans bloquer les workers.
+
+        Args:
+            store: Instance de ResultStore
+        """
+        self._initialize()
+        self._result_store = store
 
     def stop_worker(self):
-        """Arrête le worker de traitement."""
+        """
+        Arrête les workers de traitement (les workers inactifs sont réveillés immédiatement).
+
+        En mode asynchrone, les éléments encore en cours ne sont pas finalisés :
+        le journal les remet en file au prochain démarrage.
+        """
         self._stop_event.set()
-        if self._worker_thread:
-            self._worker_thread.join(timeout=5)
-            logger.info("Worker de traitement arrêté")
+        if self._initialized:
+            with self._queue_cond:
+                self._queue_cond.notify_all()
+            if self._completions is not None:
+                self._completions.put(None)
+        for thread in self._worker_threads:
+            thread.join(timeout=5)
+        if self._worker_threads:
+            logger.info("Workers de traitement arrêtés")
+        self._worker_threads = []
+        if self._initialized:
+            self._completions = None
+            self._max_processing = None
+
+    @contextmanager
+    def _writing(self):
+        """
+        Délimite une modification des structures lues sans verrou (verrou requis).
+
+        Le numéro de version est impair pendant la modification : une lecture
+        sans verrou qui la chevauche est recommencée (voir _read_live_status).
+        """
+        self._version += 1
+        try:
+            yield
+        finally:
+            self._version += 1
 
     def _worker_loop(self):
-        """Boucle principale du worker : traite un élément à la fois."""
+        """Boucle principale d'un worker : traite un élément à la fois."""
         while not self._stop_event.is_set():
-            item = self._dequeue()
+            item = self._dequeue(block=True)
             if item is None:
-                time.sleep(0.5)  # Attendre avant de vérifier à nouveau
                 continue
+            self._process_item(item)
 
-            # Marquer comme en cours de traitement
-            with self._queue_lock:
-                item.status = QueueItemStatus.PROCESSING
-                self._processing = item
-
-            logger.info(f"Traitement de la requête {item.request_id} (utilisateur: {item.user_email})")
-
+    def _dispatch_loop(self):
+        """Boucle de répartition (mode asynchrone) : soumet les éléments sans attendre leur fin."""
+        while not self._stop_event.is_set():
+            item = self._dequeue(block=True)
+            if item is None:
+                continue
+            logger.info(f"Soumission de la requête {item.request_id} (utilisateur: {item.user_email})")
+            kwargs = {}
+            if item.stream:
+                kwargs["on_partial"] = lambda trait, item=item: self._publish_partial(item, trait)
+            if self._process_timings:
+                kwargs["timings"] = item.timings
+            completions = self._completions
+            item.timings["inference_started"] = time.time()
             try:
-                if self._process_func:
-                    result = self._process_func(item.text, item.directive, item.model_name)
-                    item.result = result
-                    item.status = QueueItemStatus.COMPLETED
-                    logger.info(f"Requête {item.request_id} traitée avec succès")
-                    
-                    
-                    # Sauvegarder le résultat OU l'erreur en base de données
-                    self._persist_to_db(item)
-                else:
-                    item.status = QueueItemStatus.FAILED
-                    item.error = "Aucune fonction de traitement configurée"
-                    logger.error("Pas de fonction de traitement configurée")
-                    self._persist_to_db(item)
+                future = self._submit_func(item.text, item.directive, item.model_name, **kwargs)
             except Exception as e:
+                future = concurrent.futures.Future()
+                future.set_exception(e)
+            future.add_done_callback(lambda f, item=item: completions.put((item, f)))
+
+    def _finalize_loop(self):
+        """Boucle de finalisation (mode asynchrone) : sauvegarde les extractions terminées."""
+        completions = self._completions
+        while True:
+            entry = completions.get()
+            if entry is None:
+                return
+            item, future = entry
+            item.timings.setdefault("inference_finished", time.time())
+            try:
+                item.result = future.result()
+                item.status = QueueItemStatus.COMPLETED
+                logger.info(f"Requête {item.request_id} traitée avec succès")
+            except BaseException as e:
                 item.status = QueueItemStatus.FAILED
-                item.error = str(e)
-                logger.error(f"Erreur lors du traitement de {item.request_id} : {str(e)}")
-                self._persist_to_db(item)
+                item.error = str(e) or type(e).__name__
+                logger.error(f"Erreur lors du traitement de {item.request_id} : {item.error}")
             finally:
-                with self._queue_lock:
-                    self._processing = None
-                    # Mettre à jour les positions (l'élément est libéré de la mémoire RAM de la file)
-                    self._update_positions()
+                self._finish_item(item)
+
+    def _process_item(self, item: QueueItem):
+        """Exécute le traitement d'un élément puis le termine (succès ou échec)."""
+        logger.info(f"Traitement de la requête {item.request_id} (utilisateur: {item.user_email})")
+
+        try:
+            if self._process_func:
+                kwargs = {}
+                if item.stream:
+                    kwargs["on_partial"] = lambda trait: self._publish_partial(item, trait)
+                if self._process_timings:
+                    # La fonction précise le début et la fin de l'inférence, et la fin de l'analyse
+                    kwargs["timings"] = item.timings
+                item.timings["inference_started"] = time.time()
+                result = self._process_func(item.text, item.directive, item.model_name, **kwargs)
+                item.timings.setdefault("inference_finished", time.time())
+                item.result = result
+                item.status = QueueItemStatus.COMPLETED
+                logger.info(f"Requête {item.request_id} traitée avec succès")
+            else:
+                item.status = QueueItemStatus.FAILED
+                item.error = "Aucune fonction de traitement configurée"
+                logger.error("Pas de fonction de traitement configurée")
+        except Exception as e:
+            item.status = QueueItemStatus.FAILED
+            item.error = str(e)
+            logger.error(f"Erreur lors du traitement de {item.request_id} : {str(e)}")
+        finally:
+            self._finish_item(item)
 
-                # Notifier le webhook si configuré
-                if item.webhook:
-                    self._notify_webhook(item)
+    def _finish_item(self, item: QueueItem):
+        """
+        Termine un élément traité et les requêtes regroupées sur lui.
+
+        Chaque requête regroupée reçoit une copie du résultat, sa propre ligne
+        ExtractionResult et sa propre notification webhook. Les éléments ne
+        quittent la file qu'une fois sauvegardés, pour que leur statut reste
+        consultable sans interruption.
+        """
+        with self._queue_lock, self._writing():
+            # Plus aucune nouvelle requête ne peut se regrouper sur cet élément
+            followers = self._release_leader(item)
+
+        for follower in followers:
+            follower.result = copy.deepcopy(item.result)
+            follower.status = item.status
+            follower.error = item.error
+            # Étapes partagées avec la référence ; chaque requête garde son heure d'ajout
+            for stage, timestamp in item.timings.items():
+                follower.timings.setdefault(stage, timestamp)
+
+        # Sauvegarder le résultat OU l'erreur en base de données
+        finished = time.time()
+        for done in [item] + followers:
+            self._persist_to_db(done)
+            if "enqueued" in done.timings:
+                metrics.REQUEST_SECONDS.labels(model=done.model_name, status=done.status.value).observe(
+                    finished - done.timings["enqueued"])
+        if (self._result_cache is not None and item.status == QueueItemStatus.COMPLETED
+                and is_cacheable(item.result)):
+            self._result_cache.put(item.content_key, item.model_name, item.result)
+
+        with self._queue_cond, self._writing():
+            # Les éléments sont libérés de la mémoire RAM de la file
+            # Une resoumission du même request_id ne démarre qu'après cet élément (voir _next_eligible)
+            if self._processing.get(item.request_id) is item:
+                del self._processing[item.request_id]
+                self._running_by_model[item.model_name] -= 1
+            for follower in followers:
+                self._discard_follower(follower)
+            # La capacité du modèle est libérée : un élément bloqué peut démarrer
+            self._queue_cond.notify()
+
+        # Notifier les tableaux de bord, les flux SSE et les webhooks configurés
+        self._publish_user_updates([item] + followers, positions_changed=True)
+        for done in [item] + followers:
+            self._publish_final(done)
+            if done.webhook:
+                self._notify_webhook(done)
+
+    def _user_item_view(self, item: QueueItem) -> dict:
+        """Décrit un élément tel qu'affiché dans le tableau de bord de son utilisateur (verrou requis)."""
+        view = {
+            "request_id": item.request_id,
+            "status": item.status.value,
+            "position": 0,
+            "created_at": item.created_at,
+        }
+        if item.status in (QueueItemStatus.COMPLETED, QueueItemStatus.FAILED):
+            view["position"] = -1
+            view["error"] = item.error
+        elif item.status == QueueItemStatus.WAITING:
+            view["position"] = self._position_of(item)
+        else:
+            # Requête regroupée : en cours tant qu'elle n'est pas sauvegardée
+            view["status"] = QueueItemStatus.PROCESSING.value
+        return view
+
+    def _recent_waiting(self, user_id: int) -> List[QueueItem]:
+        """Éléments en attente les plus récents d'un utilisateur, ceux affichés par son tableau de bord (verrou requis)."""
+        recent = list(islice(reversed(self._waiting_by_user.get(user_id, {}).values()), DASHBOARD_MAX_ITEMS))
+        recent.extend(
+            item for item in islice(reversed(self._followers_by_user.get(user_id, {}).values()), DASHBOARD_MAX_ITEMS)
+            if item.status == QueueItemStatus.WAITING
+        )
+        if len(recent) > DASHBOARD_MAX_ITEMS:
+            recent = sorted(recent, key=lambda item: item.created_at, reverse=True)[:DASHBOARD_MAX_ITEMS]
+        return recent
+
+    def _publish_user_updates(self, items: List[QueueItem], positions_changed: bool = False,
+                              removed: Optional[List[QueueItem]] = None):
+        """
+        Publie aux tableaux de bord connectés les éléments dont l'état a changé.
+
+        Un utilisateur suivi ne reçoit un événement "queue" que si l'un de ses
+        éléments a changé : statut, retrait, ou position (ajout, démarrage,
+        fin ou retrait d'un élément qui le précède). Seuls ses
+        DASHBOARD_MAX_ITEMS éléments en attente les plus récents, ceux
+        affichés, sont examinés, et les positions sont calculées hors du
+        verrou de la file (lecture validée par le numéro de version). Les
+        autres tableaux de bord reçoivent seulement la nouvelle longueur de la
+        file (événement "queue_length"), si elle a changé. Rien n'est calculé
+        si aucun tableau de bord n'est connecté.
+
+        Args:
+            items: Éléments dont le statut a changé
+            positions_changed: True si la longueur de la file ou les positions ont changé
+            removed: Éléments retirés de la file (surcharge)
+        """
+        users = set(event_broker.subscribed_users())
+        if not users:
+            # Longueur vue par un tableau de bord qui se connecterait maintenant
+            self._published_length = len(self._waiting)
+            return
+
+        changed: Dict[int, Dict[str, Optional[QueueItem]]] = {}
+        watched: Dict[int, List[QueueItem]] = {}
+        with self._queue_lock:
+            queue_length = len(self._waiting)
+            for item in items:
+                if item.user_id in users:
+                    changed.setdefault(item.user_id, {})[item.request_id] = item
+            for item in removed or ():
+                if item.user_id in users:
+                    # Une requête surchargée garde la vue de sa nouvelle soumission
+                    changed.setdefault(item.user_id, {}).setdefault(item.request_id, None)
+            if positions_changed:
+                for user_id in users:
+                    recent = self._recent_waiting(user_id)
+                    if recent:
+                        watched[user_id] = recent
+
+        def read_views():
+            views = {
+                user_id: {
+                    request_id: self._user_item_view(item) if item is not None else None
+                    for request_id, item in user_items.items()
+                }
+                for user_id, user_items in changed.items()
+            }
+            # Éléments démarrés ou retirés depuis leur relevé sous verrou : ignorés
+            positions = {
+                user_id: [(item, self._position_of(item)) for item in recent if self._still_waiting(item)]
+                for user_id, recent in watched.items()
+            }
+            return views, positions
+
+        # Publications dans l'ordre des lectures : un tableau de bord ne reçoit pas une position périmée
+        with self._publish_lock:
+            views, positions = self._read_unlocked(read_views)
+            updates: Dict[int, Dict[str, dict]] = {}
+            for user_id, user_views in views.items():
+                user_updates = updates.setdefault(user_id, {})
+                for request_id, view in user_views.items():
+                    if view is None:
+                        view = {"request_id": request_id, "status": "removed"}
+                    else:
+                        changed[user_id][request_id].position = view["position"]
+                    user_updates[request_id] = view
+            for user_id, user_positions in positions.items():
+                for item, position in user_positions:
+                    # Dernière position connue du tableau de bord : seuls les déplacements sont publiés
+                    if position == item.position or item.request_id in updates.get(user_id, ()):
+                        continue
+                    item.position = position
+                    updates.setdefault(user_id, {})[item.request_id] = {
+                        "request_id": item.request_id,
+                        "status": QueueItemStatus.WAITING.value,
+                        "position": position,
+                    }
+
+            for user_id, user_updates in updates.items():
+                event_broker.publish({
+                    "event": "queue",
+                    "queue_length": queue_length,
+                    "items": list(user_updates.values()),
+                }, user_id=user_id)
+            if queue_length != self._published_length:
+                self._published_length = queue_length
+                for user_id in users.difference(updates):
+                    event_broker.publish({"event": "queue_length", "queue_length": queue_length}, user_id=user_id)
+
+    def _publish_partial(self, item: QueueItem, trait: dict):
+        """Publie un trait reçu en flux pour l'élément et les requêtes regroupées sur lui."""
+        with self._queue_lock:
+            targets = [item] + self._followers_of(item)
+            for target in targets:
+                target.partial_traits.append(trait)
+            index = len(item.partial_traits) - 1
+        for target in targets:
+            event_broker.publish({
+                "event": "partial",
+                "request_id": target.request_id,
+                "index": index,
+                "trait": trait,
+            }, request_id=target.request_id)
+
+    def _publish_final(self, item: QueueItem):
+        """Publie la fin du traitement d'un élément (résultat ou erreur)."""
+        if not event_broker.has_subscribers(request_id=item.request_id):
+            return
+        event = {"event": item.status.value, "request_id": item.request_id}
+        if item.status == QueueItemStatus.COMPLETED:
+            event["result"] = item.result
+        else:
+            event["error"] = item.error
+        event_broker.publish(event, request_id=item.request_id)
 
     def _notify_webhook(self, item: QueueItem):
         """Envoie une requête POST au webhook configuré avec le résultat du traitement."""
@@ -186,6 +797,10 @@ class RequestQueue:
                     logger.info(f"Webhook notifié avec succès pour {item.request_id} ({response.status_code})")
             except Exception as e:
                 logger.error(f"Échec de la notification webhook pour {item.request_id} : {str(e)}")
+                metrics.WEBHOOK_DELIVERIES.labels(outcome="failure").inc()
+                return
+            metrics.WEBHOOK_DELIVERIES.labels(outcome="success").inc()
+            self._record_stage(item, "webhook_delivered")
 
         # Exécuter dans un thread séparé pour ne pas bloquer la boucle principale
         threading.Thread(target=perform_request, daemon=True).start()
@@ -193,37 +808,53 @@ class RequestQueue:
     def _persist_to_db(self, item: QueueItem):
         """
         Sauvegarde le résultat de la requête (succès ou échec) en base de données.
+
+        Avec un magasin de résultats associé, l'écriture est différée et faite
+        par lots ; sinon elle est validée immédiatement.
         """
         from src.database import SessionLocal
-        from src.models.extraction_result import ExtractionResult
-        
+
+        self._initialize()
+        if self._result_store is not None:
+            self._result_store.put(item)
+            return
+
         db = SessionLocal()
         try:
-            # Sérialisation du résultat si c'est un dict ou une liste
-            result_data = None
-            if item.result is not None:
-                # Si c'est un objet (ex: CharacterTraitsResponse Pydantic), on le cast en dict
-                if hasattr(item.result, "model_dump"):
-                    result_data = item.result.model_dump()
-                elif hasattr(item.result, "dict"):
-                    result_data = item.result.dict()
-                else:
-                    result_data = item.result
-
-            db_result = ExtractionResult(
-                request_id=item.request_id,
-                user_id=item.user_id,
-                user_email=item.user_email,
-                status=item.status.value,
-                result_json=result_data,
-                error_message=item.error,
-            )
-            db.add(db_result)
+            # Une requête resoumise (surcharge) remplace son ancien résultat
+            inserted, _ = upsert_result_rows(db, [build_result_row(item)])
+            if self._journal is not None:
+                # Sortie du journal dans la même transaction que le résultat
+                self._journal.delete_in_session(db, item)
             db.commit()
-            logger.info(f"Résultat pour {item.request_id} ({item.status.value}) sauvegardé en BDD")
+            action = "sauvegardé" if inserted else "remplacé"
+            logger.info(f"Résultat pour {item.request_id} ({item.status.value}) {action} en BDD")
         except Exception as e:
             db.rollback()
             logger.error(f"Échec de la sauvegarde DB pour {item.request_id} : {str(e)}")
+            if self._journal is not None:
+                # L'élément a été traité : ne pas le rejouer au prochain démarrage
+                self._journal.record_removed(item)
+        finally:
+            db.close()
+
+    def _record_stage(self, item: QueueItem, stage: str):
+        """Horodate une étape postérieure à la sauvegarde du résultat (ex: livraison du webhook)."""
+        from src.database import SessionLocal
+
+        timestamp = time.time()
+        item.timings[stage] = timestamp
+        if self._result_store is not None:
+            self._result_store.record_stage(item, stage, timestamp)
+            return
+
+        db = SessionLocal()
+        try:
+            record_result_stage(db, item, stage, timestamp)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Échec de l'horodatage {stage} pour {item.request_id} : {str(e)}")
         finally:
             db.close()
 
@@ -231,31 +862,320 @@ class RequestQueue:
         """
         Ajoute un élément à la file d'attente.
 
+        Une requête encore en attente avec le même request_id est remplacée
+        (surcharge) sous le verrou de la file, dans la même opération que
+        l'ajout : deux soumissions concurrentes du même request_id n'en
+        laissent qu'une en attente. Si un journal est associé, l'élément y est
+        écrit (et validé sur disque) avant d'être visible par les workers. Si
+        le cache contient déjà le résultat de ce contenu, l'élément est terminé
+        immédiatement.
+
         Args:
             item: Élément à ajouter
 
         Returns:
-            Position dans la file d'attente
+            Position dans la file d'attente (-1 si le résultat provient du cache)
         """
         self._initialize()
-        with self._queue_lock:
-            item.position = len(self._queue) + (1 if self._processing else 0)
-            self._queue.append(item)
-            logger.info(f"Requête {item.request_id} ajoutée en position {item.position}")
-            return item.position
+        if self._result_cache is not None:
+            cached = self._result_cache.get(item.content_key)
+            if cached is not None:
+                with self._queue_lock, self._writing():
+                    replaced = self._detach_waiting(item.request_id)
+                if replaced is not None:
+                    self._publish_user_updates([], positions_changed=True, removed=[replaced])
+                self._complete_from_cache(item, cached)
+                return item.position
 
-    def _dequeue(self) -> Optional[QueueItem]:
-        """Retire et retourne le prochain élément de la file."""
-        with self._queue_lock:
-            if self._queue:
-                return self._queue.pop(0)
-            return None
+        if self._journal is not None:
+            self._journal.record_enqueue(item)
+        return self._push(item)
+
+    def _complete_from_cache(self, item: QueueItem, result: Any):
+        """Termine un élément avec un résultat du cache, sans passer par les workers."""
+        item.timings["enqueued"] = time.time()
+        item.result = result
+        item.status = QueueItemStatus.COMPLETED
+        item.position = -1
+        logger.info(f"Requête {item.request_id} servie depuis le cache de résultats")
+        self._persist_to_db(item)
+        self._publish_user_updates([item])
+        self._publish_final(item)
+        if item.webhook:
+            self._notify_webhook(item)
+
+    def enqueue_many(self, items: List[QueueItem]) -> List[int]:
+        """
+        Ajoute plusieurs éléments à la file en une seule opération.
+
+        Les éléments encore en attente avec le même request_id sont remplacés,
+        sous la même prise du verrou que l'insertion. Le journal est écrit en
+        un seul lot (validé sur disque avant que les éléments ne soient
+        visibles par les workers), puis tous les éléments sont insérés sous
+        une seule prise du verrou.
+
+        Args:
+            items: Éléments à ajouter, dans l'ordre de la file
+
+        Returns:
+            Positions dans la file, dans l'ordre des éléments (-1 si le résultat provient du cache)
+        """
+        self._initialize()
+        replaced = []
+        pending = []
+        for item in items:
+            cached = self._result_cache.get(item.content_key) if self._result_cache is not None else None
+            if cached is not None:
+                with self._queue_lock, self._writing():
+                    previous = self._detach_waiting(item.request_id)
+                if previous is not None:
+                    replaced.append(previous)
+                self._complete_from_cache(item, cached)
+            else:
+                pending.append(item)
+        if not pending:
+            if replaced:
+                self._publish_user_updates([], positions_changed=True, removed=replaced)
+            return [item.position for item in items]
+
+        if self._journal is not None:
+            self._journal.record_enqueue_many(pending)
+        with self._queue_cond, self._writing():
+            # Retirer d'abord les éléments surchargés : les positions attribuées restent exactes
+            for item in pending:
+                previous = self._detach_waiting(item.request_id)
+                if previous is not None:
+                    replaced.append(previous)
+                    if self._journal is not None:
+                        self._journal.record_enqueue(item, wait=False)
+            for item in pending:
+                self._insert(item, replaced)
+            self._queue_cond.notify_all()
+        logger.info(f"{len(pending)} requête(s) ajoutée(s) en file d'attente en une fois")
+        self._publish_user_updates(pending, positions_changed=True, removed=replaced)
+        return [item.position for item in items]
+
+    def _push(self, item: QueueItem) -> int:
+        """Ajoute un élément aux structures en mémoire, réveille un worker et notifie les tableaux de bord."""
+        replaced = []
+        with self._queue_cond, self._writing():
+            position = self._insert(item, replaced)
+            self._queue_cond.notify()
+        if item.coalesced_with is None:
+            logger.info(f"Requête {item.request_id} ajoutée en position {position}")
+        self._publish_user_updates([item], positions_changed=item.coalesced_with is None or bool(replaced),
+                                   removed=replaced)
+        return position
+
+    def _insert(self, item: QueueItem, replaced: Optional[List[QueueItem]] = None) -> int:
+        """
+        Ajoute un élément aux structures en mémoire, ou le regroupe sur une requête de même contenu.
+
+        Verrou requis, dans une modification (_writing). Une requête encore en
+        attente avec le même request_id est d'abord retirée (surcharge), comme
+        par remove_waiting_request, et ajoutée à replaced si fourni.
+        """
+        previous = self._detach_waiting(item.request_id)
+        if previous is not None:
+            if replaced is not None:
+                replaced.append(previous)
+            if self._journal is not None:
+                # Le retrait de l'ancienne entrée suit l'écriture de la nouvelle : la réécrire
+                self._journal.record_enqueue(item, wait=False)
+        item.timings["enqueued"] = time.time()
+        leader = self._leaders.get(item.content_key)
+        if leader is not None:
+            return self._attach_follower(item, leader)
+
+        self._leaders[item.content_key] = item
+        item.seq = self._next_seq
+        self._next_seq += 1
+        self._waiting[item.request_id] = item
+        self._waiting_by_model.setdefault(item.model_name, deque()).append(item)
+        self._waiting_by_user.setdefault(item.user_id, {})[item.request_id] = item
+        self._positions.add(item.seq, 1)
+        item.position = self._position_of(item)
+        logger.debug(f"Requête {item.request_id} ajoutée en position {item.position}")
+        return item.position
+
+    def _attach_follower(self, item: QueueItem, leader: QueueItem) -> int:
+        """Regroupe un élément sur une requête de même contenu (verrou requis)."""
+        item.coalesced_with = leader.request_id
+        item.status = leader.status
+        item.partial_traits = list(leader.partial_traits)
+        self._followers.setdefault(leader.content_key, []).append(item)
+        self._follower_items[item.request_id] = item
+        self._followers_by_user.setdefault(item.user_id, {})[item.request_id] = item
+        item.position = self._position_of(item)
+        logger.info(
+            f"Requête {item.request_id} regroupée sur {leader.request_id} "
+            f"(contenu identique, position {item.position})"
+        )
+        return item.position
+
+    def _discard_follower(self, item: QueueItem):
+        """
+        Retire une requête regroupée des index (verrou requis).
+
+        Une soumission plus récente du même request_id peut occuper les index :
+        elle n'est pas retirée.
+        """
+        if self._follower_items.get(item.request_id) is item:
+            del self._follower_items[item.request_id]
+        user_items = self._followers_by_user.get(item.user_id)
+        if user_items is not None and user_items.get(item.request_id) is item:
+            del user_items[item.request_id]
+            if not user_items:
+                del self._followers_by_user[item.user_id]
+
+    def _followers_of(self, leader: QueueItem) -> List[QueueItem]:
+        """Retourne les requêtes regroupées sur une requête de référence (verrou requis)."""
+        if self._leaders.get(leader.content_key) is not leader:
+            return []
+        return list(self._followers.get(leader.content_key, ()))
 
-    def _update_positions(self):
-        """Met à jour les positions de tous les éléments dans la file."""
+    def _release_leader(self, leader: QueueItem) -> List[QueueItem]:
+        """Retire une requête de référence du regroupement et retourne ses requêtes regroupées (verrou requis)."""
+        if self._leaders.get(leader.content_key) is not leader:
+            return []
+        del self._leaders[leader.content_key]
+        return self._followers.pop(leader.content_key, [])
+
+    def _promote_follower(self, leader: QueueItem, followers: List[QueueItem]):
+        """
+        Remplace une requête de référence retirée par sa première requête regroupée (verrou requis).
+
+        La nouvelle référence reprend la place de l'ancienne dans la file.
+        """
+        new_leader = followers[0]
+        self._discard_follower(new_leader)
+        new_leader.coalesced_with = None
+        new_leader.seq = leader.seq
+        self._waiting[new_leader.request_id] = new_leader
+        self._waiting_by_user.setdefault(new_leader.user_id, {})[new_leader.request_id] = new_leader
+        self._leaders[new_leader.content_key] = new_leader
+        model_queue = self._waiting_by_model[leader.model_name]
+        for i, queued in enumerate(model_queue):
+            if queued is leader:
+                model_queue[i] = new_leader
+                break
+        if len(followers) > 1:
+            self._followers[new_leader.content_key] = followers[1:]
+            for follower in followers[1:]:
+                follower.coalesced_with = new_leader.request_id
+        logger.info(f"Requête {new_leader.request_id} devient la référence de son contenu")
+
+    def _position_of(self, item: QueueItem) -> int:
+        """Calcule la position d'un élément en attente en O(log n) (verrou requis)."""
+        if item.coalesced_with is not None:
+            # Une requête regroupée partage la position de sa référence
+            leader = self._waiting.get(item.coalesced_with)
+            if leader is None:
+                return 0
+            item = leader
         offset = 1 if self._processing else 0
-        for i, item in enumerate(self._queue):
-            item.position = i + offset
+        return self._positions.prefix_sum(item.seq - 1) + offset
+
+    def _is_waiting(self, item: QueueItem) -> bool:
+        """Indique si l'élément est toujours en attente (et non retiré ou remplacé)."""
+        return self._waiting.get(item.request_id) is item
+
+    def _still_waiting(self, item: QueueItem) -> bool:
+        """Indique si l'élément, référence ou requête regroupée, attend toujours son traitement."""
+        if self._is_waiting(item):
+            return True
+        return self._follower_items.get(item.request_id) is item and item.status == QueueItemStatus.WAITING
+
+    def _discard_waiting(self, item: QueueItem):
+        """Retire un élément des index d'attente (verrou requis)."""
+        del self._waiting[item.request_id]
+        user_items = self._waiting_by_user.get(item.user_id)
+        if user_items is not None:
+            user_items.pop(item.request_id, None)
+            if not user_items:
+                del self._waiting_by_user[item.user_id]
+        self._positions.add(item.seq, -1)
+        if not self._waiting:
+            # File vide : repartir de zéro pour borner la taille de l'arbre et des files par modèle
+            self._waiting_by_model.clear()
+            self._positions.clear()
+            self._next_seq = 1
+
+    def _dequeue(self, block: bool = False) -> Optional[QueueItem]:
+        """
+        Retire le prochain élément éligible de la file et le marque en cours.
+
+        Un élément est éligible si son modèle n'a pas atteint sa limite de
+        traitements simultanés ; les éléments d'un modèle saturé gardent leur
+        place et laissent passer ceux des autres modèles.
+
+        Args:
+            block: Si True, attend (sans polling) qu'un élément soit disponible
+                   ou que l'arrêt soit demandé
+
+        Returns:
+            Élément à traiter, ou None (file vide ou arrêt demandé)
+        """
+        with self._queue_cond:
+            while True:
+                item = self._next_eligible() if self._has_capacity() else None
+                if item is not None:
+                    with self._writing():
+                        self._discard_waiting(item)
+                        item.status = QueueItemStatus.PROCESSING
+                        item.position = 0
+                        item.timings["dequeued"] = time.time()
+                        metrics.QUEUE_WAIT_SECONDS.labels(model=item.model_name).observe(
+                            item.timings["dequeued"] - item.timings.get("enqueued", item.timings["dequeued"]))
+                        self._processing[item.request_id] = item
+                        self._running_by_model[item.model_name] = self._running_by_model.get(item.model_name, 0) + 1
+                        followers = self._followers_of(item)
+                        for follower in followers:
+                            follower.status = QueueItemStatus.PROCESSING
+                    if self._journal is not None:
+                        self._journal.record_processing(item)
+                    break
+                if not block or self._stop_event.is_set():
+                    return None
+                self._queue_cond.wait()
+
+        self._publish_user_updates([item] + followers, positions_changed=True)
+        return item
+
+    def _next_eligible(self) -> Optional[QueueItem]:
+        """
+        Retourne l'élément éligible le plus ancien, en O(nombre de modèles) (verrou requis).
+
+        Seules les têtes des files par modèle sont examinées : l'élément le plus
+        ancien parmi les modèles ayant encore de la capacité est retenu.
+        """
+        best = None
+        for model_name, model_queue in self._waiting_by_model.items():
+            # Purger les éléments retirés (surcharge) arrivés en tête
+            while model_queue and not self._is_waiting(model_queue[0]):
+                model_queue.popleft()
+            if not model_queue or not self._has_model_capacity(model_name):
+                continue
+            if model_queue[0].request_id in self._processing:
+                # Resoumission d'une requête encore en cours : elle démarre à la fin de
+                # la précédente (les index de traitement sont par request_id)
+                continue
+            if best is None or model_queue[0].seq < best.seq:
+                best = model_queue[0]
+        if best is not None:
+            self._waiting_by_model[best.model_name].popleft()
+        return best
+
+    def _has_capacity(self) -> bool:
+        """Indique si un nouvel élément peut passer en cours de traitement (verrou requis)."""
+        return self._max_processing is None or len(self._processing) < self._max_processing
+
+    def _has_model_capacity(self, model_name: str) -> bool:
+        """Indique si un nouveau traitement peut démarrer pour ce modèle (verrou requis)."""
+        limit = self._model_limits.get(model_name)
+        if limit is None:
+            return True
+        return self._running_by_model.get(model_name, 0) < limit
 
     def remove_waiting_request(self, request_id: str) -> bool:
         """
@@ -269,15 +1189,51 @@ class RequestQueue:
             True si l'élément a été trouvé et retiré, False sinon.
         """
         self._initialize()
-        with self._queue_lock:
-            for i, item in enumerate(self._queue):
-                if item.request_id == request_id:
-                    self._queue.pop(i)
-                    self._update_positions()
-                    logger.info(f"Requête {request_id} retirée de la file d'attente (surcharge)")
-                    return True
+        with self._queue_lock, self._writing():
+            item = self._detach_waiting(request_id)
+        if item is None:
             return False
 
+        self._publish_user_updates([], positions_changed=True, removed=[item])
+        return True
+
+    def _detach_waiting(self, request_id: str) -> Optional[QueueItem]:
+        """
+        Retire des index la requête en attente (ou regroupée en attente) de ce request_id.
+
+        Verrou requis, dans une modification (_writing). Une requête de
+        référence retirée est remplacée par sa première requête regroupée.
+
+        Returns:
+            Élément retiré, ou None si aucune requête de ce request_id n'attend
+        """
+        item = self._waiting.get(request_id)
+        if item is None:
+            item = self._follower_items.get(request_id)
+            if item is None or item.status != QueueItemStatus.WAITING:
+                return None
+            # Détacher la requête regroupée de sa référence
+            self._followers[item.content_key].remove(item)
+            if not self._followers[item.content_key]:
+                del self._followers[item.content_key]
+            self._discard_follower(item)
+        else:
+            followers = self._release_leader(item)
+            if followers:
+                self._promote_follower(item, followers)
+                del self._waiting[item.request_id]
+                user_items = self._waiting_by_user[item.user_id]
+                del user_items[item.request_id]
+                if not user_items:
+                    del self._waiting_by_user[item.user_id]
+            else:
+                # L'entrée de la file par modèle est purgée paresseusement au dequeue
+                self._discard_waiting(item)
+        if self._journal is not None:
+            self._journal.record_removed(item)
+        logger.info(f"Requête {request_id} retirée de la file d'attente (surcharge)")
+        return item
+
     def get_queue_status(self, user_id: Optional[int] = None) -> dict:
         """
         Récupère l'état actuel de la file d'attente.
@@ -290,31 +1246,144 @@ class RequestQueue:
         """
         self._initialize()
         with self._queue_lock:
+            if user_id is None:
+                waiting_items = self._waiting.values()
+                follower_items = self._follower_items.values()
+            else:
+                waiting_items = self._waiting_by_user.get(user_id, {}).values()
+                follower_items = self._followers_by_user.get(user_id, {}).values()
+
             queue_items = []
-            for item in self._queue:
-                if user_id is None or item.user_id == user_id:
+            processing_items = []
+            for item in waiting_items:
+                queue_items.append({
+                    "request_id": item.request_id,
+                    "user_email": item.user_email,
+                    "status": item.status.value,
+                    "position": self._position_of(item),
+                })
+
+            # Requêtes regroupées : même statut et même position que leur référence
+            for item in follower_items:
+                if item.status == QueueItemStatus.WAITING:
                     queue_items.append({
                         "request_id": item.request_id,
                         "user_email": item.user_email,
                         "status": item.status.value,
-                        "position": item.position,
+                        "position": self._position_of(item),
+                    })
+                else:
+                    processing_items.append({
+                        "request_id": item.request_id,
+                        "user_email": item.user_email,
+                        "status": QueueItemStatus.PROCESSING.value,
                     })
 
-            processing = None
-            if self._processing and self._processing.status == QueueItemStatus.PROCESSING:
-                if user_id is None or self._processing.user_id == user_id:
-                    processing = {
-                        "request_id": self._processing.request_id,
-                        "user_email": self._processing.user_email,
-                        "status": self._processing.status.value,
-                    }
+            for item in self._processing.values():
+                if item.status == QueueItemStatus.PROCESSING:
+                    if user_id is None or item.user_id == user_id:
+                        processing_items.append({
+                            "request_id": item.request_id,
+                            "user_email": item.user_email,
+                            "status": item.status.value,
+                        })
 
             return {
-                "queue_length": len(self._queue),
-                "processing": processing,
+                "queue_length": len(self._waiting),
+                # Premier élément en cours (compatibilité), la liste complète suit
+                "processing": processing_items[0] if processing_items else None,
+                "processing_items": processing_items,
                 "items": queue_items,
             }
 
+    def _live_status(self, request_id: str) -> Optional[dict]:
+        """
+        Statut d'une requête encore présente en mémoire (en attente ou en cours), sinon None.
+
+        Verrou requis, sauf lecture validée par le numéro de version (_read_live_status).
+        Une resoumission peut attendre pendant que la soumission précédente est en
+        cours : la plus récente fait foi.
+        """
+        candidates = [
+            candidate for candidate in (
+                self._processing.get(request_id),
+                self._waiting.get(request_id),
+                self._follower_items.get(request_id),
+            )
+            if candidate is not None
+        ]
+        if not candidates:
+            return None
+        latest = max(candidates, key=lambda candidate: candidate.created_at)
+
+        # Vérifier si c'est en cours de traitement
+        item = self._processing.get(request_id)
+        if item is latest:
+            return {
+                "request_id": request_id,
+                "status": QueueItemStatus.PROCESSING.value,
+                "position": 0,
+                "partial_traits": list(item.partial_traits),
+                "timings": dict(item.timings),
+            }
+
+        # Vérifier dans la file d'attente
+        item = self._waiting.get(request_id)
+        if item is latest:
+            return {
+                "request_id": request_id,
+                "status": item.status.value,
+                "position": self._position_of(item),
+                "timings": dict(item.timings),
+            }
+
+        # Vérifier parmi les requêtes regroupées (en cours tant qu'elles ne sont pas sauvegardées)
+        item = latest
+        waiting = item.status == QueueItemStatus.WAITING
+        return {
+            "request_id": request_id,
+            "status": item.status.value if waiting else QueueItemStatus.PROCESSING.value,
+            "position": self._position_of(item) if waiting else 0,
+            "coalesced_with": item.coalesced_with,
+            "partial_traits": list(item.partial_traits),
+            "timings": dict(item.timings),
+        }
+
+    def _read_live_status(self, request_id: str) -> Optional[dict]:
+        """
+        Lit le statut en mémoire d'une requête sans prendre le verrou de la file.
+
+        La lecture est validée par le numéro de version : si une modification
+        l'a chevauchée, elle est recommencée, puis faite sous verrou après
+        LOCK_FREE_READ_ATTEMPTS tentatives. Les sondages de statut ne
+        ralentissent donc ni les ajouts ni les workers.
+        """
+        return self._read_unlocked(lambda: self._live_status(request_id))
+
+    def _read_unlocked(self, read: Callable[[], Any]) -> Any:
+        """
+        Exécute une lecture des structures en mémoire sans prendre le verrou de la file.
+
+        La lecture est recommencée si une modification l'a chevauchée (numéro
+        de version), puis faite sous verrou après LOCK_FREE_READ_ATTEMPTS
+        tentatives.
+        """
+        for _ in range(LOCK_FREE_READ_ATTEMPTS):
+            version = self._version
+            if not version & 1:
+                try:
+                    result = read()
+                except (KeyError, IndexError, RuntimeError):
+                    # Structures modifiées pendant la lecture
+                    result = None
+                    version = -1
+                if self._version == version:
+                    return result
+            # Laisser la modification en cours se terminer
+            time.sleep(0)
+        with self._queue_lock:
+            return read()
+
     def get_request_status(self, request_id: str) -> Optional[dict]:
         """
         Récupère le statut d'une requête spécifique.
@@ -326,42 +1395,150 @@ class RequestQueue:
             Dictionnaire avec le statut ou None
         """
         self._initialize()
-        with self._queue_lock:
-            # Vérifier si c'est en cours de traitement
-            if self._processing and self._processing.request_id == request_id:
+        status = self._read_live_status(request_id)
+        if status is not None:
+            return status
+
+        # Résultat récent : servi depuis la mémoire, sans relire result_json
+        if self._result_store is not None:
+            status = self._result_store.get(request_id)
+            if status is not None:
+                return status
+
+        # Si pas trouvé en file, vérifier en base de données (hors verrou :
+        # la lecture ne doit pas bloquer les workers ni les autres requêtes)
+        from src.database import SessionLocal
+        from src.models.extraction_result import ExtractionResult
+
+        db = SessionLocal()
+        try:
+            result_item = db.query(ExtractionResult).filter(ExtractionResult.request_id == request_id).first()
+            if result_item:
                 return {
                     "request_id": request_id,
-                    "status": QueueItemStatus.PROCESSING.value,
-                    "position": 0,
+                    "status": result_item.status,
+                    "result": result_item.result_json,
+                    "error": result_item.error_message,
+                    "timings": result_item.timings_json,
                 }
+        finally:
+            db.close()
 
-            # Vérifier dans la file d'attente
-            for item in self._queue:
-                if item.request_id == request_id:
-                    return {
-                        "request_id": request_id,
-                        "status": item.status.value,
-                        "position": item.position,
-                    }
+        return None
 
-            # Si pas trouvé en file, vérifier en base de données
-            from src.database import SessionLocal
-            from src.models.extraction_result import ExtractionResult
-            
-            db = SessionLocal()
-            try:
-                result_item = db.query(ExtractionResult).filter(ExtractionResult.request_id == request_id).first()
-                if result_item:
-                    return {
-                        "request_id": request_id,
-                        "status": result_item.status,
-                        "result": result_item.result_json,
-                        "error": result_item.error_message,
-                    }
-            finally:
-                db.close()
+    def get_results(
+        self,
+        user_id: int,
+        request_ids: Optional[List[str]] = None,
+        since: Optional[datetime.datetime] = None,
+        until: Optional[datetime.datetime] = None,
+        cursor: Optional[int] = None,
+        limit: int = 1000,
+    ) -> tuple[List[dict], Optional[int]]:
+        """
+        Récupère en une seule requête SQL des résultats d'un utilisateur.
 
-        return None
+        Sans liste d'identifiants, les résultats sont paginés par ordre
+        d'enregistrement : le curseur est l'identifiant du dernier résultat de
+        la page précédente (pagination par clé, sans OFFSET). Avec une liste
+        d'identifiants (une seule page), les requêtes encore en file sont
+        décrites par leur statut en mémoire (une seule prise du verrou) et les
+        identifiants introuvables ont le statut "unknown".
+
+        Args:
+            user_id: Utilisateur propriétaire des résultats
+            request_ids: Identifiants recherchés (sinon tous les résultats de l'utilisateur)
+            since: Résultats enregistrés à partir de cette date
+            until: Résultats enregistrés avant cette date
+            cursor: Curseur renvoyé par la page précédente (sans liste d'identifiants)
+            limit: Nombre maximal de résultats de la page (sans liste d'identifiants)
+
+        Returns:
+            Tuple: résultats, et curseur de la page suivante (None s'il n'y en a pas)
+        """
+        from sqlalchemy import select
+        from src.database import SessionLocal
+        from src.models.extraction_result import ExtractionResult
+
+        self._initialize()
+        # Résultats en attente d'écriture, relevés avant la requête SQL
+        pending = self._pending_results(user_id)
+        query = (select(ExtractionResult.id, ExtractionResult.request_id, ExtractionResult.status,
+                        ExtractionResult.result_json, ExtractionResult.error_message,
+                        ExtractionResult.timings_json, ExtractionResult.created_at)
+                 .where(ExtractionResult.user_id == user_id)
+                 .order_by(ExtractionResult.id))
+        live = {}
+        if request_ids is not None:
+            with self._queue_lock:
+                for request_id in request_ids:
+                    status = self._live_status(request_id)
+                    if status is not None:
+                        live[request_id] = status
+            query = query.where(ExtractionResult.request_id.in_([r for r in request_ids if r not in live]))
+        else:
+            query = query.limit(limit + 1)
+            if cursor is not None:
+                query = query.where(ExtractionResult.id > cursor)
+        # Les dates sont stockées en UTC sans fuseau
+        if since is not None:
+            query = query.where(ExtractionResult.created_at >= _as_naive_utc(since))
+        if until is not None:
+            query = query.where(ExtractionResult.created_at < _as_naive_utc(until))
+
+        if request_ids is not None:
+            requested = set(request_ids)
+            pending = {request_id: row for request_id, row in pending.items()
+                       if request_id in requested and request_id not in live}
+        # Un résultat en attente remplace sa ligne en base ; hors de la période, il la masque
+        in_period = {
+            request_id: row for request_id, row in pending.items()
+            if (since is None or row["created_at"] >= _as_naive_utc(since))
+            and (until is None or row["created_at"] < _as_naive_utc(until))
+        }
+
+        db = SessionLocal()
+        try:
+            rows = db.execute(query).all()
+            next_cursor = None
+            if request_ids is None and len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = rows[-1].id
+            stored = {row.request_id for row in rows}
+            if in_period and request_ids is None and next_cursor is None:
+                # Un résultat jamais écrit prendra place après le dernier : il est ajouté en fin
+                # de dernière page, sauf s'il remplace une ligne existante (d'une autre page)
+                stored.update(db.scalars(select(ExtractionResult.request_id)
+                                         .where(ExtractionResult.request_id.in_(list(in_period)))))
+            elif request_ids is None:
+                stored.update(in_period)
+        finally:
+            db.close()
+
+        results = [
+            _result_view(in_period.get(row.request_id) or row._asdict())
+            for row in rows
+            if row.request_id not in pending or row.request_id in in_period
+        ]
+        results.extend(_result_view(row) for request_id, row in in_period.items() if request_id not in stored)
+
+        if request_ids is not None:
+            # Compléter avec les requêtes en file et les identifiants introuvables
+            found = {result["request_id"] for result in results}
+            for request_id in request_ids:
+                if request_id in live:
+                    status = live[request_id]
+                    results.append({"request_id": request_id, "status": status["status"],
+                                    "position": status["position"]})
+                elif request_id not in found:
+                    results.append({"request_id": request_id, "status": "unknown"})
+        return results, next_cursor
+
+    def _pending_results(self, user_id: int) -> Dict[str, dict]:
+        """Résultats de l'utilisateur pas encore écrits en base par le magasin, par request_id."""
+        if self._result_store is None:
+            return {}
+        return {row["request_id"]: row for row in self._result_store.pending_rows(user_id)}
 
     def get_result(self, request_id: str) -> Optional[Any]:
         """
@@ -392,6 +1569,8 @@ class RequestQueue:
             Liste de dictionnaires décrivant les éléments
         """
         self._initialize()
+        # Résultats en attente d'écriture, relevés avant la lecture en base
+        pending = self._pending_results(user_id)
         # Utiliser un dictionnaire pour éviter les doublons par request_id
         items_dict = {}
 
@@ -419,27 +1598,63 @@ class RequestQueue:
         finally:
             db.close()
 
+        # Résultats pas encore écrits (plus récents que leur éventuelle ligne en base)
+        for request_id, row in pending.items():
+            items_dict[request_id] = {
+                "request_id": request_id,
+                "status": row["status"],
+                "position": -1,
+                "created_at": row["created_at"].timestamp(),
+                "error": row["error_message"],
+            }
+
         with self._queue_lock:
             # 2. Éléments en file d'attente (écrase la vue BDD s'il y a relance)
-            for item in self._queue:
-                if item.user_id == user_id:
-                    items_dict[item.request_id] = {
-                        "request_id": item.request_id,
-                        "status": item.status.value,
-                        "position": item.position,
-                        "created_at": item.created_at,
-                    }
+            # Requêtes regroupées sur une autre requête de même contenu
+            for item in [*self._waiting_by_user.get(user_id, {}).values(),
+                         *self._followers_by_user.get(user_id, {}).values()]:
+                view = items_dict[item.request_id] = self._user_item_view(item)
+                # Position connue du tableau de bord (les événements "queue" n'en publient que les déplacements)
+                item.position = view["position"]
 
-            # 3. Élément en cours de traitement (prioritaire pour l'affichage en cours)
-            if self._processing and self._processing.user_id == user_id and self._processing.status == QueueItemStatus.PROCESSING:
-                items_dict[self._processing.request_id] = {
-                    "request_id": self._processing.request_id,
-                    "status": self._processing.status.value,
-                    "position": 0,
-                    "created_at": self._processing.created_at,
-                }
+            # 3. Éléments en cours de traitement (prioritaires pour l'affichage en cours)
+            for item in self._processing.values():
+                if item.user_id == user_id and item.status == QueueItemStatus.PROCESSING:
+                    items_dict[item.request_id] = self._user_item_view(item)
 
         # Convertir en liste, trier par date et limiter
         items = list(items_dict.values())
         items.sort(key=lambda x: x["created_at"], reverse=True)
         return items[:limit]
+
+
+def _result_view(row: dict) -> dict:
+    """Décrit un résultat enregistré (ligne en base ou en attente d'écriture) pour get_results."""
+    return {
+        "request_id": row["request_id"],
+        "status": row["status"],
+        "result": row["result_json"],
+        "error": row["error_message"],
+        "timings": row["timings_json"],
+        "created_at": row["created_at"].isoformat() if row["created_at"] else None,
+    }
+
+
+def _queue_length() -> int:
+    """Nombre de requêtes en attente dans la file (lu sans verrou, au moment du rendu)."""
+    queue = RequestQueue._instance
+    if queue is None or not getattr(queue, "_initialized", False):
+        return 0
+    return len(queue._waiting)
+
+
+def _queue_processing() -> int:
+    """Nombre de requêtes en cours de traitement (lu sans verrou, au moment du rendu)."""
+    queue = RequestQueue._instance
+    if queue is None or not getattr(queue, "_initialized", False):
+        return 0
+    return len(queue._processing)
+
+
+metrics.QUEUE_LENGTH.set_function(_queue_length)
+metrics.QUEUE_PROCESSING.set_function(_queue_processing)
@@ -0,0 +1,244 @@
+"""Cache des résultats d'extraction adressé par le contenu.
+
+Ce module évite de relancer une inférence Hugging Face lorsqu'un même
+texte est soumis à nouveau (sous un autre request_id) avec la même
+directive et le même modèle. Le cache comporte deux niveaux : un LRU en
+mémoire et une table SQLite persistante, avec expiration (TTL) et
+éviction par taille.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Callable, Optional
+
+from src.models.cached_result import CachedResult
+from src.services import metrics
+from src.utils.lru_cache import LRUCache
+
+# Configuration du logging
+logger = logging.getLogger(__name__)
+
+# Valeurs par défaut (surchargeables via l'environnement)
+DEFAULT_MEMORY_ENTRIES = 1000
+DEFAULT_MAX_ENTRIES = 50000
+DEFAULT_TTL_HOURS = 24 * 7
+# Issue exposée dans /metrics pour chaque compteur de statistiques
+_LOOKUP_RESULTS = {"memory_hits": "memory_hit", "persistent_hits": "persistent_hit", "misses": "miss"}
+# Fréquence (en nombre d'écritures) de la purge de la table persistante
+PRUNE_EVERY = 100
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Normalise un texte (Unicode NFC, espaces compactés) pour le calcul d'empreinte."""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def make_cache_key(text: str, directive: Optional[str], model_name: str) -> str:
+    """
+    Calcule l'empreinte du contenu d'une requête.
+
+    Args:
+        text: Texte de description du personnage
+        directive: Directive optionnelle
+        model_name: Modèle utilisé pour l'extraction
+
+    Returns:
+        Empreinte SHA-256 hexadécimale
+    """
+    payload = json.dumps(
+        [normalize_text(text), normalize_text(directive), str(model_name or "")],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(result: Any) -> bool:
+    """
+    Indique si un résultat peut être mis en cache.
+
+    Une liste de traits vide peut provenir d'une erreur transitoire de l'API
+    (timeout, surcharge) : ces résultats ne sont pas conservés.
+    """
+    return (
+        isinstance(result, dict)
+        and bool(result.get("traits"))
+        and result.get("validated_model", True)
+    )
+
+
+class ResultCache:
+    """Cache à deux niveaux (mémoire LRU + SQLite) des résultats d'extraction."""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = None,
+        memory_entries: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        ttl_hours: Optional[float] = None,
+    ):
+        """
+        Initialise le cache.
+
+        Args:
+            session_factory: Fabrique de sessions SQLAlchemy (sinon SessionLocal)
+            memory_entries: Taille du niveau mémoire (sinon RESULT_CACHE_MEMORY_ENTRIES)
+            max_entries: Taille maximale de la table persistante (sinon RESULT_CACHE_MAX_ENTRIES)
+            ttl_hours: Durée de vie d'une entrée en heures (sinon RESULT_CACHE_TTL_HOURS)
+        """
+        if session_factory is None:
+            from src.database import SessionLocal
+            session_factory = SessionLocal
+        if memory_entries is None:
+            memory_entries = int(os.environ.get("RESULT_CACHE_MEMORY_ENTRIES", DEFAULT_MEMORY_ENTRIES))
+        if max_entries is None:
+            max_entries = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        if ttl_hours is None:
+            ttl_hours = float(os.environ.get("RESULT_CACHE_TTL_HOURS", DEFAULT_TTL_HOURS))
+
+        self._session_factory = session_factory
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_entries = max_entries
+        self._memory = LRUCache(memory_entries, ttl=self.ttl_seconds)
+        self._stats_lock = threading.Lock()
+        self._writes_since_prune = 0
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Recherche un résultat dans le cache (mémoire puis SQLite).
+
+        Args:
+            key: Empreinte calculée par make_cache_key
+
+        Returns:
+            Copie du résultat mis en cache (modifiable par l'appelant), ou None
+        """
+        result = self._memory.get(key)
+        if result is not None:
+            self._count("memory_hits")
+            return copy.deepcopy(result)
+
+        now = time.time()
+        db = self._session_factory()
+        try:
+            entry = db.query(CachedResult).filter(CachedResult.cache_key == key).first()
+            if entry is None or entry.created_at + self.ttl_seconds <= now:
+                self._count("misses")
+                return None
+            entry.last_hit_at = now
+            entry.hit_count = (entry.hit_count or 0) + 1
+            result = entry.result_json
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Erreur de lecture du cache de résultats : {str(e)}")
+            self._count("misses")
+            return None
+        finally:
+            db.close()
+
+        self._memory.put(key, result)
+        self._count("persistent_hits")
+        return copy.deepcopy(result)
+
+    def put(self, key: str, model_name: str, result: dict):
+        """
+        Enregistre un résultat dans les deux niveaux du cache.
+
+        Args:
+            key: Empreinte calculée par make_cache_key
+            model_name: Modèle ayant produit le résultat
+            result: Résultat sérialisable en JSON
+        """
+        # Copie conservée : l'appelant peut continuer à modifier son résultat
+        self._memory.put(key, copy.deepcopy(result))
+        now = time.time()
+        db = self._session_factory()
+        try:
+            db.merge(CachedResult(
+                cache_key=key,
+                model_name=model_name,
+                result_json=result,
+                created_at=now,
+                last_hit_at=now,
+                hit_count=0,
+            ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Erreur d'écriture du cache de résultats : {str(e)}")
+            return
+        finally:
+            db.close()
+
+        with self._stats_lock:
+            self._writes_since_prune += 1
+            should_prune = self._writes_since_prune >= PRUNE_EVERY
+            if should_prune:
+                self._writes_since_prune = 0
+        if should_prune:
+            self.prune()
+
+    def prune(self) -> int:
+        """
+        Supprime les entrées expirées puis les moins récemment utilisées au-delà de max_entries.
+
+        Returns:
+            Nombre d'entrées supprimées
+        """
+        db = self._session_factory()
+        try:
+            removed = db.query(CachedResult).filter(
+                CachedResult.created_at <= time.time() - self.ttl_seconds
+            ).delete(synchronize_session=False)
+
+            excess = db.query(CachedResult).count() - self.max_entries
+            if excess > 0:
+                oldest = (db.query(CachedResult.cache_key)
+                          .order_by(CachedResult.last_hit_at)
+                          .limit(excess)
+                          .subquery())
+                removed += db.query(CachedResult).filter(
+                    CachedResult.cache_key.in_(oldest.select())
+                ).delete(synchronize_session=False)
+            db.commit()
+            if removed:
+                logger.info(f"Cache de résultats : {removed} entrée(s) évincée(s)")
+            return removed
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Erreur lors de la purge du cache de résultats : {str(e)}")
+            return 0
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        """Retourne les compteurs de succès/échecs du cache."""
+        with self._stats_lock:
+            hits = self.memory_hits + self.persistent_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    def _count(self, counter: str):
+        """Incrémente un compteur de statistiques."""
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+        metrics.RESULT_CACHE_LOOKUPS.labels(result=_LOOKUP_RESULTS[counter]).inc()
@@ -0,0 +1,411 @@
+"""Magasin en mémoire des résultats récents, écrits en base en différé.
+
+Ce module conserve en mémoire les résultats terminés (succès ou échec) les
+plus récents : les consultations qui suivent la fin d'un traitement sont
+servies sans relire ni décoder la colonne result_json. L'écriture en base
+est différée (write-behind) : un thread dédié regroupe les lignes
+ExtractionResult de plusieurs traitements dans une seule transaction, si
+bien que les workers n'attendent jamais la validation sur disque. Chaque lot
+est écrit en une seule instruction INSERT ... ON CONFLICT(request_id) DO
+UPDATE : une requête resoumise (surcharge) remplace son ancien résultat.
+
+Un résultat non encore écrit reste consultable (il n'est jamais évincé
+avant sa validation). En cas d'arrêt brutal avant l'écriture, le journal de
+la file, dont la sortie est validée dans la même transaction que le
+résultat, remet la requête en file au redémarrage.
+"""
+
+import datetime
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+
+from src.models.extraction_result import ExtractionResult
+from src.utils.lru_cache import LRUCache
+
+# Configuration du logging
+logger = logging.getLogger(__name__)
+
+# Valeurs par défaut (surchargeables via l'environnement)
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 3600
+# Délai supplémentaire de regroupement des écritures (surchargeable via RESULT_STORE_FLUSH_MS).
+# À 0, le lot contient les résultats arrivés pendant la validation précédente.
+DEFAULT_FLUSH_INTERVAL_MS = 0
+# Nombre maximal de résultats par transaction
+MAX_BATCH_SIZE = 500
+
+
+def serialize_result(result):
+    """Convertit un résultat (dict ou modèle Pydantic) en données sérialisables en JSON."""
+    if result is None:
+        return None
+    # Si c'est un objet (ex: CharacterTraitsResponse Pydantic), on le cast en dict
+    if hasattr(result, "model_dump"):
+        return result.model_dump()
+    if hasattr(result, "dict"):
+        return result.dict()
+    return result
+
+
+def build_result_row(item) -> dict:
+    """Construit les colonnes de la ligne ExtractionResult d'un élément terminé."""
+    return {
+        "request_id": item.request_id,
+        "user_id": item.user_id,
+        "user_email": item.user_email,
+        "status": item.status.value,
+        "result_json": serialize_result(item.result),
+        "error_message": item.error,
+        "timings_json": dict(item.timings),
+    }
+
+
+def upsert_result_rows(db, rows: List[dict]) -> Tuple[int, int]:
+    """
+    Insère ou remplace (par request_id) des résultats en une seule instruction.
+
+    Les lignes d'un même request_id sont réduites à la dernière. Les lignes
+    déjà présentes sont comptées avant l'écriture, dans la même transaction.
+    Les horodatages (timings_json) des lignes reçoivent l'étape "persisted".
+
+    Args:
+        db: Session SQLAlchemy (la validation reste à la charge de l'appelant)
+        rows: Colonnes des lignes (voir build_result_row)
+
+    Returns:
+        Tuple: nombre de résultats insérés, nombre de résultats remplacés
+    """
+    latest = {row["request_id"]: row for row in rows}
+    if not latest:
+        return 0, 0
+    existing = db.query(ExtractionResult.request_id).filter(
+        ExtractionResult.request_id.in_(list(latest))
+    ).count()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for row in latest.values():
+        # Remplacement (et non modification) : la ligne peut être lue en parallèle
+        row["timings_json"] = {**(row.get("timings_json") or {}), "persisted": now.timestamp()}
+    values = [{**row, "created_at": now} for row in latest.values()]
+    stmt = insert(ExtractionResult)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ExtractionResult.request_id],
+        set_={k: stmt.excluded[k] for k in values[0] if k != "request_id"},
+    )
+    db.execute(stmt, values)
+    return len(latest) - existing, existing
+
+
+def record_result_stage(db, item, stage: str, timestamp: float) -> int:
+    """
+    Ajoute l'horodatage d'une étape (ex: webhook_delivered) au résultat enregistré d'un élément.
+
+    La ligne est retrouvée par request_id, si l'étape n'y est pas encore
+    horodatée : une étape n'est jamais réécrite. (ResultStore.record_stage
+    écarte en amont les étapes d'une soumission remplacée par une surcharge.)
+
+    Args:
+        db: Session SQLAlchemy (la validation reste à la charge de l'appelant)
+        item: QueueItem dont le résultat est enregistré
+        stage: Nom de l'étape
+        timestamp: Horodatage (epoch)
+
+    Returns:
+        Nombre de lignes modifiées
+    """
+    return db.query(ExtractionResult).filter(
+        ExtractionResult.request_id == item.request_id,
+        func.json_type(ExtractionResult.timings_json, f"$.{stage}").is_(None),
+    ).update(
+        {ExtractionResult.timings_json: func.json_set(ExtractionResult.timings_json, f"$.{stage}", timestamp)},
+        synchronize_session=False,
+    )
+
+
+class _PendingResult:
+    """
+    Opération en attente d'écriture : résultat (row), étape à horodater
+    (stage), ou barrière de flush si item est None.
+    """
+
+    __slots__ = ("item", "row", "stage", "done", "created_at")
+
+    def __init__(self, item=None, row: Optional[dict] = None, stage: Optional[Tuple[str, float]] = None):
+        self.item = item
+        self.row = row
+        # Date d'enregistrement (UTC sans fuseau, comme les dates lues en base)
+        self.created_at = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) if row else None
+        self.stage = stage
+        self.done = threading.Event() if item is None else None
+
+
+class ResultStore:
+    """Résultats récents en mémoire (LRU borné, avec expiration) et écriture différée par lots."""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = None,
+        journal=None,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        flush_interval_ms: Optional[float] = None,
+    ):
+        """
+        Initialise le magasin et démarre le thread d'écriture.
+
+        Args:
+            session_factory: Fabrique de sessions SQLAlchemy (sinon SessionLocal)
+            journal: QueueJournal dont les éléments sortent avec l'écriture de leur résultat
+            max_entries: Nombre maximal de résultats gardés en mémoire (sinon RESULT_STORE_MAX_ENTRIES)
+            ttl_seconds: Durée de conservation en mémoire (sinon RESULT_STORE_TTL_SECONDS)
+            flush_interval_ms: Délai de regroupement des écritures en millisecondes
+                               (sinon RESULT_STORE_FLUSH_MS ou DEFAULT_FLUSH_INTERVAL_MS)
+        """
+        if session_factory is None:
+            from src.database import SessionLocal
+            session_factory = SessionLocal
+        if max_entries is None:
+            max_entries = int(os.environ.get("RESULT_STORE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        if ttl_seconds is None:
+            ttl_seconds = float(os.environ.get("RESULT_STORE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+        if flush_interval_ms is None:
+            flush_interval_ms = float(os.environ.get("RESULT_STORE_FLUSH_MS", DEFAULT_FLUSH_INTERVAL_MS))
+
+        self._session_factory = session_factory
+        self._journal = journal
+        self._flush_interval = max(0.0, flush_interval_ms) / 1000
+        self._recent = LRUCache(max_entries, ttl=ttl_seconds)
+        # Résultats non encore validés en base, par request_id (jamais évincés)
+        self._pending: Dict[str, _PendingResult] = {}
+        self._lock = threading.Lock()
+        # Bilan cumulé des écritures (lignes insérées, remplacées, en échec) et nombre de lots
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.batches = 0
+        self._ops: "queue.Queue[Optional[_PendingResult]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._writer_loop, name="result-store", daemon=True)
+        self._writer.start()
+
+    def put(self, item):
+        """
+        Enregistre le résultat d'un élément terminé (sans attendre l'écriture en base).
+
+        Args:
+            item: QueueItem terminé (succès ou échec)
+        """
+        entry = _PendingResult(item, build_result_row(item))
+        with self._lock:
+            self._pending[item.request_id] = entry
+        self._recent.put(item.request_id, entry.row)
+        self._ops.put(entry)
+
+    def record_stage(self, item, stage: str, timestamp: float):
+        """
+        Horodate une étape postérieure à l'enregistrement du résultat (ex: livraison du webhook).
+
+        L'écriture passe par le thread du magasin, après celle du résultat.
+        L'étape d'une soumission déjà remplacée par une surcharge plus récente
+        (autre heure d'ajout) est ignorée.
+
+        Args:
+            item: QueueItem dont le résultat a été enregistré avec put()
+            stage: Nom de l'étape
+            timestamp: Horodatage (epoch)
+        """
+        with self._lock:
+            entry = self._pending.get(item.request_id)
+        row = entry.row if entry is not None else self._recent.get(item.request_id)
+        if row is not None:
+            if (row["timings_json"] or {}).get("enqueued") != item.timings.get("enqueued"):
+                return
+            row["timings_json"] = {**row["timings_json"], stage: timestamp}
+        self._ops.put(_PendingResult(item, stage=(stage, timestamp)))
+
+    def get(self, request_id: str) -> Optional[dict]:
+        """
+        Recherche le résultat d'une requête parmi les résultats récents.
+
+        Args:
+            request_id: Identifiant de la requête
+
+        Returns:
+            Statut au format de RequestQueue.get_request_status, ou None (consulter la base)
+        """
+        with self._lock:
+            entry = self._pending.get(request_id)
+        row = entry.row if entry is not None else self._recent.get(request_id)
+        if row is None:
+            return None
+        return {
+            "request_id": request_id,
+            "status": row["status"],
+            "result": row["result_json"],
+            "error": row["error_message"],
+            "timings": row["timings_json"],
+        }
+
+    def pending_rows(self, user_id: int) -> List[dict]:
+        """
+        Retourne les résultats d'un utilisateur pas encore validés en base.
+
+        Les lectures en base les fusionnent à leur résultat (par request_id) au
+        lieu d'attendre l'écriture ; l'instantané doit être pris avant la
+        lecture, pour qu'un résultat écrit entre-temps figure dans l'un ou l'autre.
+
+        Args:
+            user_id: Utilisateur propriétaire des résultats
+
+        Returns:
+            Colonnes des lignes (voir build_result_row) et created_at, par date d'enregistrement
+        """
+        with self._lock:
+            entries = [entry for entry in self._pending.values() if entry.item.user_id == user_id]
+        entries.sort(key=lambda entry: entry.created_at)
+        return [{**entry.row, "created_at": entry.created_at} for entry in entries]
+
+    def pending_count(self) -> int:
+        """Retourne le nombre de résultats pas encore validés en base."""
+        with self._lock:
+            return len(self._pending)
+
+    def stats(self) -> dict:
+        """Retourne le bilan des écritures et l'occupation du magasin."""
+        with self._lock:
+            return {
+                "inserted": self.inserted,
+                "updated": self.updated,
+                "failed": self.failed,
+                "batches": self.batches,
+                "pending": len(self._pending),
+                "memory_entries": len(self._recent),
+            }
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Attend que les résultats déjà enregistrés soient validés en base.
+
+        Args:
+            timeout: Délai maximal d'attente en secondes
+
+        Returns:
+            True si tous les résultats antérieurs à l'appel sont écrits
+        """
+        if not self.pending_count():
+            return True
+        barrier = _PendingResult()
+        self._ops.put(barrier)
+        return barrier.done.wait(timeout)
+
+    def close(self):
+        """Écrit les résultats en attente puis arrête le thread d'écriture."""
+        self._ops.put(None)
+        self._writer.join(timeout=5)
+
+    def _writer_loop(self):
+        """Boucle du thread d'écriture : regroupe les résultats en transactions."""
+        stopping = False
+        while not stopping:
+            op = self._ops.get()
+            if op is None:
+                break
+            batch = [op]
+            # Laisser les résultats concurrents rejoindre le lot avant la validation
+            deadline = time.monotonic() + self._flush_interval
+            while len(batch) < MAX_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                try:
+                    next_op = self._ops.get(timeout=remaining) if remaining > 0 else self._ops.get_nowait()
+                except queue.Empty:
+                    break
+                if next_op is None:
+                    stopping = True
+                    break
+                batch.append(next_op)
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[_PendingResult]):
+        """Écrit un lot de résultats (et leur sortie du journal) dans une seule transaction."""
+        entries = [op for op in batch if op.row is not None]
+        stages = [op for op in batch if op.stage is not None]
+        inserted = updated = failed = 0
+        try:
+            if entries:
+                outcome = self._commit(entries)
+                if outcome is not None:
+                    inserted, updated = outcome
+                else:
+                    # Une ligne invalide ne doit pas faire perdre les autres : réessayer une à une
+                    for entry in entries:
+                        outcome = self._commit([entry])
+                        if outcome is not None:
+                            inserted += outcome[0]
+                            updated += outcome[1]
+                            continue
+                        failed += 1
+                        logger.error(f"Échec de la sauvegarde DB pour {entry.item.request_id}")
+                        if self._journal is not None:
+                            # L'élément a été traité : ne pas le rejouer au prochain démarrage
+                            self._journal.record_removed(entry.item)
+                logger.debug(
+                    f"Magasin de résultats : {inserted} résultat(s) inséré(s), "
+                    f"{updated} remplacé(s), {failed} en échec"
+                )
+            if stages:
+                self._commit_stages(stages)
+        finally:
+            with self._lock:
+                if entries:
+                    self.inserted += inserted
+                    self.updated += updated
+                    self.failed += failed
+                    self.batches += 1
+                for entry in entries:
+                    # Une surcharge plus récente du même request_id reste en attente
+                    if self._pending.get(entry.item.request_id) is entry:
+                        del self._pending[entry.item.request_id]
+            for op in batch:
+                if op.done is not None:
+                    op.done.set()
+
+    def _commit_stages(self, stages: List[_PendingResult]):
+        """Ajoute les horodatages d'étapes aux résultats déjà écrits, dans une transaction."""
+        db = self._session_factory()
+        try:
+            for op in stages:
+                record_result_stage(db, op.item, *op.stage)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Échec de l'écriture de {len(stages)} horodatage(s) : {str(e)}")
+        finally:
+            db.close()
+
+    def _commit(self, entries: List[_PendingResult]) -> Optional[Tuple[int, int]]:
+        """
+        Écrit des résultats et retire leurs éléments du journal dans une transaction.
+
+        Returns:
+            Tuple (insérés, remplacés), ou None si la transaction a échoué
+        """
+        db = self._session_factory()
+        try:
+            outcome = upsert_result_rows(db, [entry.row for entry in entries])
+            if self._journal is not None:
+                for entry in entries:
+                    # Sortie du journal dans la même transaction que le résultat
+                    self._journal.delete_in_session(db, entry.item)
+            db.commit()
+            return outcome
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Échec de l'écriture de {len(entries)} résultat(s) : {str(e)}")
+            return None
+        finally:
+            db.close()
@@ -4,18 +4,265 @@ Ce module interroge des modèles de type Instruct (comme Mistral) via l'API Serv
 de Hugging Face pour une analyse sémantique précise et multilingue.
 """
 
+import contextvars
 import logging
 import os
 import json
 import re
-from typing import List, Optional
+import threading
+import time
+from typing import Callable, Dict, List, Optional
 
-from huggingface_hub import InferenceClient
+import httpx
+from huggingface_hub import InferenceClient, set_client_factory
+from src.config import model_registry
 from src.models.character_traits import CharacterTrait
+from src.services import metrics
 
 # Configuration du logging
 logger = logging.getLogger(__name__)
 
+# Pool de connexions HTTP partagé (surchargeable via l'environnement)
+DEFAULT_HTTP_MAX_CONNECTIONS = 20
+DEFAULT_HTTP_KEEPALIVE_SECONDS = 60
+
+# Mesure du temps d'établissement des connexions (TCP + TLS) de l'appel en cours
+_connection_trace: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("connection_trace", default=None)
+
+
+def _trace_connection(event_name: str, info: dict):
+    """Callback de trace httpcore : cumule la durée des connexions TCP et des poignées de main TLS."""
+    trace = _connection_trace.get()
+    if trace is None or not event_name.startswith(("connection.connect_tcp", "connection.start_tls")):
+        return
+    if event_name.endswith(".started"):
+        trace["started"] = time.perf_counter()
+    elif event_name.endswith((".complete", ".failed")) and "started" in trace:
+        trace["seconds"] += time.perf_counter() - trace.pop("started")
+
+
+def _attach_connection_trace(request: httpx.Request):
+    """Hook httpx : active la trace de connexion sur chaque requête sortante."""
+    request.extensions["trace"] = _trace_connection
+
+
+def configure_http_pool(max_connections: Optional[int] = None, keepalive_seconds: Optional[float] = None):
+    """
+    Configure le client HTTP partagé par huggingface_hub (connexions persistantes).
+
+    Les appels d'inférence réutilisent ainsi les connexions keep-alive et les
+    sessions TLS au lieu d'en ouvrir de nouvelles.
+
+    Args:
+        max_connections: Nombre maximal de connexions (sinon HF_HTTP_MAX_CONNECTIONS)
+        keepalive_seconds: Durée de conservation d'une connexion inactive (sinon HF_HTTP_KEEPALIVE_SECONDS)
+    """
+    if max_connections is None:
+        max_connections = int(os.environ.get("HF_HTTP_MAX_CONNECTIONS", DEFAULT_HTTP_MAX_CONNECTIONS))
+    if keepalive_seconds is None:
+        keepalive_seconds = float(os.environ.get("HF_HTTP_KEEPALIVE_SECONDS", DEFAULT_HTTP_KEEPALIVE_SECONDS))
+
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=keepalive_seconds,
+    )
+    set_client_factory(lambda: httpx.Client(
+        limits=limits,
+        follow_redirects=True,
+        event_hooks={"request": [_attach_connection_trace]},
+    ))
+    logger.info(f"Pool HTTP d'inférence configuré ({max_connections} connexions, keep-alive {keepalive_seconds}s)")
+
+
+def build_messages(text: str, directive: Optional[str] = None) -> List[dict]:
+    """
+    Construit les messages du prompt d'extraction (réponse JSON imposée).
+
+    Args:
+        text: Texte de description du personnage
+        directive: Instructions supplémentaires
+
+    Returns:
+        Messages au format chat_completion
+    """
+    system_prompt = (
+        "Tu es un expert en analyse littéraire et psychologique de personnages. "
+        "Ta tâche est d'extraire les traits de caractère (personnalité, valeurs, émotions) du texte fourni. "
+        "Ignore les descriptions purement physiques. "
+        "Réponds UNIQUEMENT par un objet JSON au format suivant :\n"
+        '{"traits": [{"trait": "Nom du trait", "score": 0.95, "category": "Personnalité"}]}'
+    )
+
+    user_content = f"Description : {text}"
+    if directive:
+        user_content += f"\nDirective spécifique : {directive}"
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_content}
+    ]
+
+
+def is_unsupported_model_error(error: Exception) -> bool:
+    """Indique si une erreur de l'API signale un modèle inconnu ou non supporté."""
+    error_msg = str(error).lower()
+    return "model_not_supported" in error_msg or "not found" in error_msg
+
+
+def record_llm_call(model_name: str, seconds: float, error: Optional[Exception] = None):
+    """
+    Enregistre un appel d'inférence dans les métriques exposées par /metrics.
+
+    Args:
+        model_name: Modèle interrogé
+        seconds: Durée de l'appel
+        error: Erreur levée par l'appel, le cas échéant
+    """
+    metrics.LLM_REQUEST_SECONDS.labels(model=model_name).observe(seconds)
+    if error is not None:
+        reason = "unsupported_model" if is_unsupported_model_error(error) else "error"
+        metrics.LLM_ERRORS.labels(model=model_name, reason=reason).inc()
+
+
+def parse_llm_response(content: str) -> List[CharacterTrait]:
+    """Tente de parser la réponse JSON du modèle (traits triés par score décroissant)."""
+    try:
+        # Nettoyage minimal pour extraire le JSON si le modèle a ajouté du texte
+        json_match = re.search(r'\{.*\}', content, re.DOTALL)
+        if json_match:
+            content = json_match.group(0)
+
+        data = json.loads(content)
+        traits_data = data.get("traits", [])
+
+        results = []
+        for t in traits_data:
+            results.append(CharacterTrait(
+                trait=t.get("trait", "Inconnu"),
+                score=float(t.get("score", 0.5)),
+                category=t.get("category", "Général")
+            ))
+
+        # Trier par score décroissant
+        results.sort(key=lambda x: x.score, reverse=True)
+        return results
+
+    except Exception as e:
+        logger.error(f"Erreur de parsing JSON du résultat LLM : {str(e)}")
+        return []
+
+
+def summarize_traits(traits: List[CharacterTrait]) -> str:
+    """Génère un résumé textuel basé sur les traits."""
+    if not traits:
+        return "Aucun trait significatif identifié."
+
+    top_traits = traits[:5]
+    traits_str = ", ".join([f"{t.trait} ({t.category})" for t in top_traits])
+    return f"Basé sur l'analyse, ce personnage se distingue par : {traits_str}."
+
+
+def build_result(traits: List[CharacterTrait], model_name: str, validated_model: bool) -> dict:
+    """Construit le résultat d'extraction stocké par la file d'attente."""
+    return {
+        "traits": [{"trait": t.trait, "score": t.score, "category": t.category} for t in traits],
+        "summary": summarize_traits(traits),
+        "model_used": model_name,
+        "validated_model": validated_model,
+    }
+
+
+def record_inference_stages(stages: Dict[str, float], started: float, durations: Dict[str, float]):
+    """
+    Complète les horodatages d'étapes d'un élément de la file à partir des durées d'extract_traits.
+
+    Args:
+        stages: Horodatages (epoch) de l'élément (QueueItem.timings)
+        started: Horodatage (epoch) de l'appel à extract_traits
+        durations: Durées complétées par extract_traits (inference_seconds, first_token_seconds)
+    """
+    stages["inference_started"] = started
+    if "first_token_seconds" in durations:
+        stages["first_token"] = started + durations["first_token_seconds"]
+    if "inference_seconds" in durations:
+        stages["inference_finished"] = started + durations["inference_seconds"]
+    # extract_traits rend la main une fois la réponse analysée
+    stages["parsed"] = time.time()
+
+
+class StreamingTraitParser:
+    """
+    Analyse incrémentale de la réponse JSON du modèle reçue en flux.
+
+    Chaque objet trait (objet JSON de second niveau, dans le tableau "traits")
+    est émis dès que son accolade fermante arrive, sans attendre la fin de
+    la génération.
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start: Optional[int] = None
+        self._length = 0
+
+    def feed(self, chunk: str) -> List[CharacterTrait]:
+        """
+        Ajoute un fragment de texte et retourne les traits complétés par celui-ci.
+
+        Args:
+            chunk: Fragment de la réponse du modèle
+
+        Returns:
+            Liste (éventuellement vide) des nouveaux traits
+        """
+        traits = []
+        self._buffer.append(chunk)
+        for offset, char in enumerate(chunk):
+            position = self._length + offset
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+                if self._depth == 2:
+                    self._object_start = position
+            elif char == "}":
+                if self._depth == 2 and self._object_start is not None:
+                    trait = self._parse_object(position)
+                    if trait is not None:
+                        traits.append(trait)
+                    self._object_start = None
+                self._depth = max(0, self._depth - 1)
+        self._length += len(chunk)
+        return traits
+
+    @property
+    def text(self) -> str:
+        """Texte complet reçu jusqu'ici."""
+        return "".join(self._buffer)
+
+    def _parse_object(self, end: int) -> Optional[CharacterTrait]:
+        """Construit un trait à partir de l'objet JSON terminé à la position end."""
+        try:
+            data = json.loads(self.text[self._object_start:end + 1])
+            return CharacterTrait(
+                trait=data.get("trait", "Inconnu"),
+                score=float(data.get("score", 0.5)),
+                category=data.get("category", "Général"),
+            )
+        except Exception as e:
+            logger.debug(f"Trait partiel ignoré (JSON invalide) : {str(e)}")
+            return None
+
 
 class TraitsExtractor:
     """Service pour extraire les traits de caractère via LLM."""
@@ -29,101 +276,153 @@ class TraitsExtractor:
         """
         self.token = os.environ.get("HF_TOKEN")
         self.model_name = model_name or os.environ.get("HF_MODEL_NAME", "mistralai/Mistral-7B-Instruct-v0.3")
+        # Paramètres du modèle (deploy.conf) : délai d'appel et tokens générés
+        self.spec = model_registry.get(self.model_name)
         
         if not self.token:
             logger.warning("HF_TOKEN non défini. L'extraction risque d'échouer sur l'API Serverless.")
         
         logger.info(f"Initialisation de TraitsExtractor avec le modèle : {self.model_name}")
-        self.client = InferenceClient(model=self.model_name, token=self.token)
+        self.client = InferenceClient(model=self.model_name, token=self.token, timeout=self.spec.timeout)
 
-    def extract_traits(self, text: str, directive: Optional[str] = None) -> tuple[List[CharacterTrait], bool]:
+    def extract_traits(
+        self,
+        text: str,
+        directive: Optional[str] = None,
+        timings: Optional[Dict[str, float]] = None,
+        on_partial: Optional[Callable[[CharacterTrait], None]] = None,
+    ) -> tuple[List[CharacterTrait], bool]:
         """
         Extrait les traits de caractère en interrogeant le LLM via un prompt structuré.
 
         Args:
             text: Texte de description du personnage
             directive: Instructions supplémentaires
+            timings: Dictionnaire optionnel complété avec les durées de l'appel
+                     (inference_seconds, connection_setup_seconds, et
+                     first_token_seconds en mode flux)
+            on_partial: Si fourni, la réponse est reçue en flux et cette fonction
+                        est appelée pour chaque trait dès qu'il est complet
 
         Returns:
             Tuple: Liste d'objets CharacterTrait, et un booléen (validated_model)
         """
         logger.info(f"Extraction des traits (LLM) pour un texte de {len(text)} caractères")
-        
-        # Préparation du prompt système pour forcer le JSON
-        system_prompt = (
-            "Tu es un expert en analyse littéraire et psychologique de personnages. "
-            "Ta tâche est d'extraire les traits de caractère (personnalité, valeurs, émotions) du texte fourni. "
-            "Ignore les descriptions purement physiques. "
-            "Réponds UNIQUEMENT par un objet JSON au format suivant :\n"
-            '{"traits": [{"trait": "Nom du trait", "score": 0.95, "category": "Personnalité"}]}'
-        )
-        
-        user_content = f"Description : {text}"
-        if directive:
-            user_content += f"\nDirective spécifique : {directive}"
-
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_content}
-        ]
+        messages = build_messages(text, directive)
 
+        trace = {"seconds": 0.0}
+        trace_token = _connection_trace.set(trace)
+        start = time.perf_counter()
         try:
-            response = self.client.chat_completion(
-                messages=messages,
-                max_tokens=500,
-                temperature=0.1  # Basse pour la répétabilité et la précision
-            )
-            
-            raw_result = response.choices[0].message.content
+            try:
+                if on_partial is not None:
+                    raw_result = self._stream_completion(messages, on_partial, start, timings)
+                else:
+                    response = self.client.chat_completion(
+                        messages=messages,
+                        max_tokens=self.spec.max_tokens,
+                        temperature=0.1  # Basse pour la répétabilité et la précision
+                    )
+                    raw_result = response.choices[0].message.content
+            finally:
+                # Le client conserve chaque réponse dans sa pile de sortie : la vider
+                # pour qu'un client réutilisé ne les accumule pas (la connexion reste au pool)
+                self.client.close()
+                _connection_trace.reset(trace_token)
+                seconds = time.perf_counter() - start
+                if timings is not None:
+                    timings["inference_seconds"] = seconds
+                    timings["connection_setup_seconds"] = trace["seconds"]
+
             logger.debug(f"Réponse brute du modèle : {raw_result}")
-            
+            record_llm_call(self.model_name, seconds)
             
             return self._parse_llm_response(raw_result), True
             
         except Exception as e:
-            error_msg = str(e).lower()
             logger.error(f"Erreur lors de l'appel à l'API Hugging Face : {str(e)}")
-            
-            # Vérifier si c'est une erreur de type modèle non supporté
-            if "model_not_supported" in error_msg or "not found" in error_msg:
-                # Fallback propre indiquant que le modèle est invalide
-                return [], False
-                
-            # Autre erreur, on retourne vide mais avec modèle potentiellement valide (timeout, surcharge...)
-            return [], True
+            record_llm_call(self.model_name, time.perf_counter() - start, e)
+            # Modèle non supporté : fallback indiquant que le modèle est invalide.
+            # Autre erreur (timeout, surcharge...) : résultat vide, modèle potentiellement valide
+            return [], not is_unsupported_model_error(e)
+
+    def _stream_completion(
+        self,
+        messages: List[dict],
+        on_partial: Callable[[CharacterTrait], None],
+        start: float,
+        timings: Optional[Dict[str, float]],
+    ) -> str:
+        """Interroge le modèle en flux et émet les traits au fil de la génération."""
+        parser = StreamingTraitParser()
+        stream = self.client.chat_completion(
+            messages=messages,
+            max_tokens=self.spec.max_tokens,
+            temperature=0.1,
+            stream=True,
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if not content:
+                continue
+            if timings is not None and "first_token_seconds" not in timings:
+                timings["first_token_seconds"] = time.perf_counter() - start
+            for trait in parser.feed(content):
+                try:
+                    on_partial(trait)
+                except Exception as e:
+                    logger.error(f"Erreur lors de la diffusion d'un trait partiel : {str(e)}")
+        return parser.text
 
     def _parse_llm_response(self, content: str) -> List[CharacterTrait]:
         """Tente de parser la réponse JSON du modèle."""
-        try:
-            # Nettoyage minimal pour extraire le JSON si le modèle a ajouté du texte
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                content = json_match.group(0)
-                
-            data = json.loads(content)
-            traits_data = data.get("traits", [])
-            
-            results = []
-            for t in traits_data:
-                results.append(CharacterTrait(
-                    trait=t.get("trait", "Inconnu"),
-                    score=float(t.get("score", 0.5)),
-                    category=t.get("category", "Général")
-                ))
-            
-            # Trier par score décroissant
-            results.sort(key=lambda x: x.score, reverse=True)
-            return results
-            
-        except Exception as e:
-            logger.error(f"Erreur de parsing JSON du résultat LLM : {str(e)}")
-            return []
+        return parse_llm_response(content)
 
     def generate_summary(self, traits: List[CharacterTrait]) -> str:
         """Génère un résumé textuel basé sur les traits."""
-        if not traits:
-            return "Aucun trait significatif identifié."
-            
-        top_traits = traits[:5]
-        traits_str = ", ".join([f"{t.trait} ({t.category})" for t in top_traits])
-        return f"Basé sur l'analyse, ce personnage se distingue par : {traits_str}."
\ No newline at end of file
+        return summarize_traits(traits)
+
+
+class ExtractorRegistry:
+    """
+    Registre des extracteurs par modèle, réutilisés d'une requête à l'autre.
+
+    Chaque thread de traitement dispose de ses propres instances (le client
+    d'inférence n'est pas prévu pour un usage concurrent), qui partagent le
+    pool de connexions HTTP global. Un extracteur est recréé si HF_TOKEN ou
+    les paramètres du modèle dans deploy.conf changent.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.created = 0
+        self.setup_seconds = 0.0
+
+    def get(self, model_name: str) -> TraitsExtractor:
+        """
+        Retourne l'extracteur du modèle pour le thread courant.
+
+        Args:
+            model_name: Nom du modèle Hugging Face
+
+        Returns:
+            Instance de TraitsExtractor prête à l'emploi
+        """
+        extractors = self._local.__dict__.setdefault("extractors", {})
+        extractor = extractors.get(model_name)
+        if (extractor is None or extractor.token != os.environ.get("HF_TOKEN")
+                or extractor.spec != model_registry.get(model_name)):
+            start = time.perf_counter()
+            extractor = TraitsExtractor(model_name)
+            extractors[model_name] = extractor
+            with self._stats_lock:
+                self.created += 1
+                self.setup_seconds += time.perf_counter() - start
+        return extractor
+
+
+# Registre partagé par les workers de la file d'attente
+extractor_registry = ExtractorRegistry()
@@ -19,12 +19,96 @@ function escapeHtml(str) {
 }
 
 document.addEventListener('DOMContentLoaded', function () {
-    initQueuePolling();
+    initQueueEvents();
 });
 
+/** Nombre maximal d'éléments affichés (identique à l'état renvoyé par le serveur). */
+const MAX_DISPLAYED_ITEMS = 20;
+
+/**
+ * Initialise le flux SSE de la file d'attente.
+ *
+ * Le serveur envoie un état complet à la connexion ('snapshot'), puis
+ * uniquement les éléments modifiés ou déplacés ('queue') et la longueur de
+ * la file quand elle seule change ('queue_length'). En cas d'indisponibilité
+ * du flux (navigateur sans EventSource, session expirée), bascule sur le polling.
+ */
+function initQueueEvents() {
+    if (!window.EventSource) {
+        initQueuePolling();
+        return;
+    }
+
+    const state = {
+        items: new Map(),
+        queueLength: 0,
+        remainingRequests: undefined,
+    };
+    const source = new EventSource(`${APP_PREFIX}/api/v1/queue/events`);
+
+    source.addEventListener('snapshot', function (e) {
+        const data = JSON.parse(e.data);
+        state.items = new Map((data.items || []).map(item => [item.request_id, item]));
+        state.queueLength = data.queue_length || 0;
+        state.remainingRequests = data.remaining_requests;
+        renderQueueState(state);
+    });
+
+    source.addEventListener('queue', function (e) {
+        const data = JSON.parse(e.data);
+        (data.items || []).forEach(function (item) {
+            if (item.status === 'removed') {
+                state.items.delete(item.request_id);
+                return;
+            }
+            const previous = state.items.get(item.request_id);
+            state.items.set(item.request_id, Object.assign({}, previous, item));
+        });
+        state.queueLength = data.queue_length;
+        if (data.remaining_requests !== undefined) {
+            state.remainingRequests = data.remaining_requests;
+        }
+        renderQueueState(state);
+    });
+
+    source.addEventListener('queue_length', function (e) {
+        state.queueLength = JSON.parse(e.data).queue_length;
+        renderQueueState(state);
+    });
+
+    source.onerror = function () {
+        const indicator = document.getElementById('queue-indicator');
+        if (indicator) {
+            indicator.innerHTML = '<span class="text-danger"><i class="bi bi-wifi-off me-1"></i>Déconnecté</span>';
+        }
+        // Flux refusé (ex: 401) : EventSource ne se reconnecte pas, repli sur le polling
+        if (source.readyState === EventSource.CLOSED) {
+            initQueuePolling();
+        }
+    };
+}
+
+/**
+ * Reconstruit les données d'affichage à partir de l'état tenu par le flux SSE.
+ * @param {object} state - Éléments par request_id, longueur de file et requêtes restantes
+ */
+function renderQueueState(state) {
+    const items = Array.from(state.items.values())
+        .sort((a, b) => b.created_at - a.created_at);
+    // Oublier les éléments qui ne sont plus affichés
+    items.slice(MAX_DISPLAYED_ITEMS).forEach(item => state.items.delete(item.request_id));
+
+    updateQueueDisplay({
+        queue_length: state.queueLength,
+        remaining_requests: state.remainingRequests,
+        processing: items.find(item => item.status === 'processing') || null,
+        items: items.slice(0, MAX_DISPLAYED_ITEMS),
+    });
+}
+
 /**
- * Initialise le polling (requêtes périodiques) pour recevoir les mises à jour
- * de la file d'attente en temps réel, remplaçant l'ancienne méthode SSE.
+ * Initialise le polling (requêtes périodiques) de l'état de la file d'attente,
+ * utilisé lorsque le flux SSE n'est pas disponible.
  */
 function initQueuePolling() {
     const pollInterval = 2500; // 2.5 secondes
@@ -65,7 +149,7 @@ function initQueuePolling() {
 }
 
 /**
- * Met à jour l'affichage de la file d'attente à partir des données SSE.
+ * Met à jour l'affichage de la file d'attente (flux SSE ou polling).
  * @param {object} data - Données de la file d'attente
  */
 function updateQueueDisplay(data) {
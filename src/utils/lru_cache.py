@@ -0,0 +1,83 @@
+"""Cache LRU en mémoire, borné et thread-safe, avec expiration optionnelle.
+
+Ce module fournit une structure partagée par les différents caches de
+l'application (résultats, tokens...).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """Cache LRU borné en nombre d'entrées, avec durée de vie optionnelle."""
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None,
+                 on_evict: Optional[Callable[[Hashable, Any], None]] = None):
+        """
+        Initialise le cache.
+
+        Args:
+            maxsize: Nombre maximal d'entrées (les moins récemment utilisées sont évincées)
+            ttl: Durée de vie d'une entrée en secondes (None : pas d'expiration)
+            on_evict: Fonction appelée (clé, valeur) pour chaque entrée évincée par la
+                      taille ou expirée, hors du verrou du cache (pas pour pop ni clear)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._on_evict = on_evict
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Retourne la valeur associée à la clé (et la marque comme récente), ou default."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            expired = expires_at is not None and expires_at <= time.monotonic()
+            if expired:
+                del self._data[key]
+            else:
+                self._data.move_to_end(key)
+        if expired:
+            self._evicted([(key, value)])
+            return default
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        """Ajoute ou remplace une entrée, en évinçant la plus ancienne si nécessaire."""
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        evicted = []
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                old_key, (old_value, _) = self._data.popitem(last=False)
+                evicted.append((old_key, old_value))
+        self._evicted(evicted)
+
+    def _evicted(self, entries: list):
+        """Signale les entrées évincées à on_evict (hors du verrou)."""
+        if self._on_evict is not None:
+            for key, value in entries:
+                self._on_evict(key, value)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Retire une entrée et retourne sa valeur, ou default."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def clear(self):
+        """Vide le cache."""
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
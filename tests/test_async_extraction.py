@@ -0,0 +1,78 @@
+"""Tests pour le moteur d'extraction asynchrone.
+
+Ce module vérifie que les appels d'inférence sont exécutés simultanément
+sur la boucle du moteur, dans la limite de concurrence configurée.
+"""
+
+import asyncio
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.services.async_extraction import AsyncExtractionEngine
+
+
+def make_response(content: str):
+    """Construit une fausse réponse chat_completion."""
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=content))])
+
+
+@pytest.fixture
+def engine():
+    """Fournit un moteur limité à 3 appels simultanés."""
+    engine = AsyncExtractionEngine(max_concurrency=3)
+    yield engine
+    engine.close()
+
+
+@patch("src.services.async_extraction.AsyncInferenceClient")
+def test_calls_run_concurrently_up_to_the_limit(mock_client_class, engine):
+    """Vérifie que les appels sont simultanés, bornés par le sémaphore, sur un seul thread."""
+    threads = set()
+
+    async def chat_completion(**kwargs):
+        threads.add(threading.get_ident())
+        await asyncio.sleep(0.2)
+        return make_response('{"traits": [{"trait": "Loyal", "score": 0.9, "category": "Valeurs"}]}')
+
+    mock_client = mock_client_class.return_value
+    mock_client.chat_completion.side_effect = chat_completion
+    mock_client.close = MagicMock(side_effect=lambda: asyncio.sleep(0))
+
+    futures = [engine.submit(f"Texte {i} assez long", None, "model-a") for i in range(6)]
+    results = [future.result(timeout=5) for future in futures]
+
+    assert engine.peak_in_flight == 3
+    assert len(threads) == 1
+    assert results[0]["traits"] == [{"trait": "Loyal", "score": 0.9, "category": "Valeurs"}]
+    assert results[0]["model_used"] == "model-a"
+    assert mock_client.close.call_count == 6
+
+
+@patch("src.services.async_extraction.AsyncInferenceClient")
+def test_unsupported_model_is_flagged(mock_client_class, engine):
+    """Vérifie qu'un modèle inconnu donne un résultat vide non validé."""
+    async def chat_completion(**kwargs):
+        raise RuntimeError("Model not found")
+
+    mock_client = mock_client_class.return_value
+    mock_client.chat_completion.side_effect = chat_completion
+    mock_client.close = MagicMock(side_effect=lambda: asyncio.sleep(0))
+
+    result = engine.submit("Un texte quelconque", None, "inconnu/model").result(timeout=5)
+
+    assert result["traits"] == []
+    assert result["validated_model"] is False
+
+
+@patch("src.services.async_extraction.AsyncInferenceClient")
+def test_client_creation_error_releases_the_slot(mock_client_class, engine):
+    """Vérifie qu'une erreur à la création du client suit le chemin d'erreur sans fuite d'appel en cours."""
+    mock_client_class.side_effect = ValueError("timeout invalide")
+
+    result = engine.submit("Un texte quelconque", None, "model-a").result(timeout=5)
+
+    assert result["traits"] == []
+    assert result["validated_model"] is True
+    assert engine.in_flight == 0
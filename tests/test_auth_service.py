@@ -0,0 +1,125 @@
+"""Tests pour l'authentification par token API.
+
+Ce module vérifie que les tokens validés sont servis depuis le cache
+et que l'invalidation reflète les modifications des administrateurs.
+"""
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from src.database import Base
+from src.models.user import User, ApiToken, RequestLog
+from src.services.auth_service import authenticate_api_token, token_cache
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Fournit une session sur une base temporaire contenant un utilisateur et son token."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'auth.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine, tables=[User.__table__, ApiToken.__table__, RequestLog.__table__])
+    session = sessionmaker(bind=engine)()
+    session.add(User(id=1, email="api@example.com", hashed_password="x", status="normal", preferred_model="model-a"))
+    session.add(ApiToken(id=1, user_id=1, token="a" * 64, is_active=True))
+    session.commit()
+    session.statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: session.statements.append(statement))
+    token_cache.clear()
+    yield session
+    token_cache.clear()
+    session.close()
+    engine.dispose()
+
+
+def test_steady_state_authentication_skips_the_database(db):
+    """Vérifie qu'un token déjà validé ne déclenche aucune requête SQL."""
+    user, api_token = authenticate_api_token("Bearer " + "a" * 64, db)
+    assert (user.id, user.email, user.preferred_model, api_token.id) == (1, "api@example.com", "model-a", 1)
+    assert len(db.statements) == 1  # Token et utilisateur en une seule requête
+
+    authenticate_api_token("a" * 64, db)
+    assert len(db.statements) == 1
+
+
+def test_invalidation_reflects_admin_changes(db):
+    """Vérifie qu'une suspension et une désactivation de token sont prises en compte après invalidation."""
+    authenticate_api_token("a" * 64, db)
+
+    db.query(User).filter(User.id == 1).update({"status": "suspended"})
+    db.commit()
+    token_cache.invalidate_user(1)
+    with pytest.raises(HTTPException) as exc:
+        authenticate_api_token("a" * 64, db)
+    assert exc.value.status_code == 403
+
+    db.query(ApiToken).filter(ApiToken.id == 1).update({"is_active": False})
+    db.commit()
+    token_cache.invalidate_user(1)
+    with pytest.raises(HTTPException) as exc:
+        authenticate_api_token("a" * 64, db)
+    assert exc.value.status_code == 401
+
+
+def test_evicted_tokens_leave_the_user_index():
+    """Vérifie que l'index par utilisateur est élagué quand le LRU évince un token."""
+    from src.services.auth_service import ApiTokenCache, AuthenticatedToken, AuthenticatedUser
+
+    cache = ApiTokenCache(maxsize=2, ttl=3600)
+    for i in range(5):
+        user = AuthenticatedUser(id=i, email=f"user{i}@example.com", status="normal", role="user")
+        cache.put(f"token-{i}", user, AuthenticatedToken(id=i, user_id=i))
+
+    assert cache._tokens_by_user == {3: {"token-3"}, 4: {"token-4"}}
+
+
+def test_put_started_before_invalidation_is_dropped():
+    """Vérifie qu'une lecture en base antérieure à une invalidation ne remet pas le token en cache."""
+    from src.services.auth_service import ApiTokenCache, AuthenticatedToken, AuthenticatedUser
+
+    cache = ApiTokenCache(maxsize=10, ttl=3600)
+    user = AuthenticatedUser(id=1, email="api@example.com", status="normal", role="user")
+
+    generation = cache.generation()
+    # Suspension validée pendant la lecture en base
+    cache.invalidate_user(1)
+    cache.put("a" * 64, user, AuthenticatedToken(id=1, user_id=1), generation)
+    assert cache.get("a" * 64) is None
+
+    cache.put("a" * 64, user, AuthenticatedToken(id=1, user_id=1), cache.generation())
+    assert cache.get("a" * 64) is not None
+
+
+def test_password_hashing_does_not_block_the_event_loop(monkeypatch):
+    """Vérifie que la boucle asyncio reste réactive pendant un hachage bcrypt."""
+    import asyncio
+    import time
+
+    from src.services.auth_service import hash_password_async, verify_password_async
+
+    monkeypatch.setenv("BCRYPT_ROUNDS", "12")
+
+    async def scenario():
+        gaps = []
+
+        async def ticker():
+            last = time.perf_counter()
+            while True:
+                await asyncio.sleep(0.01)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        tick = asyncio.create_task(ticker())
+        hashed = await hash_password_async("mot-de-passe")
+        valid = await verify_password_async("mot-de-passe", hashed)
+        tick.cancel()
+        return hashed, valid, gaps
+
+    hashed, valid, gaps = asyncio.run(scenario())
+    assert hashed.startswith("$2b$12$")
+    assert valid
+    # Un hachage dure plusieurs centaines de millisecondes : la boucle a continué de tourner
+    assert len(gaps) > 10
+    assert max(gaps) < 0.2
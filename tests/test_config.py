@@ -0,0 +1,71 @@
+"""Tests pour le registre des modèles (config/deploy.conf)."""
+
+import os
+
+from src.config import ModelRegistry, ModelSpec, FALLBACK_MODELS
+
+
+def write_config(path, content, mtime_ns=None):
+    """Écrit deploy.conf et fixe sa date de modification."""
+    path.write_text(content, encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_registry_parses_names_and_specs(tmp_path):
+    """Teste la lecture des entrées simples et détaillées."""
+    config = tmp_path / "deploy.conf"
+    write_config(config, (
+        "models:\n"
+        "  - name: modele/a\n"
+        "    max_concurrency: 2\n"
+        "    timeout: 30\n"
+        "    max_tokens: 800\n"
+        "  - modele/b\n"
+    ))
+    registry = ModelRegistry(str(config), check_interval=0)
+
+    assert registry.names() == ["modele/a", "modele/b"]
+    assert registry.default_model() == "modele/a"
+    assert registry.get("modele/a") == ModelSpec("modele/a", max_concurrency=2, timeout=30.0, max_tokens=800)
+    assert registry.get("modele/b") == ModelSpec("modele/b")
+    assert registry.get("inconnu").max_tokens == 500
+    assert registry.model_limits() == {"modele/a": 2}
+
+
+def test_registry_falls_back_without_models(tmp_path):
+    """Teste le repli sur les modèles par défaut si deploy.conf est absent."""
+    registry = ModelRegistry(str(tmp_path / "absent.conf"), check_interval=0)
+    assert registry.names() == FALLBACK_MODELS
+
+
+def test_registry_reloads_only_when_modified(tmp_path):
+    """Teste que le fichier n'est relu que si sa date de modification change."""
+    config = tmp_path / "deploy.conf"
+    write_config(config, "models:\n  - modele/a\n", mtime_ns=1_000_000_000)
+    registry = ModelRegistry(str(config), check_interval=0)
+    reloads = []
+    registry.add_listener(lambda r: reloads.append(r.names()))
+
+    assert registry.names() == ["modele/a"]
+    assert registry.names() == ["modele/a"]
+    assert reloads == [["modele/a"]]
+
+    write_config(config, "models:\n  - modele/b\n", mtime_ns=2_000_000_000)
+    assert registry.default_model() == "modele/b"
+    assert reloads == [["modele/a"], ["modele/b"]]
+
+
+def test_registry_check_interval_skips_stat(tmp_path):
+    """Teste qu'aucune vérification n'a lieu avant la fin de l'intervalle."""
+    config = tmp_path / "deploy.conf"
+    write_config(config, "models:\n  - modele/a\n", mtime_ns=1_000_000_000)
+    registry = ModelRegistry(str(config), check_interval=3600)
+    assert registry.names() == ["modele/a"]
+    registry.names()  # Première vérification : l'intervalle démarre
+
+    write_config(config, "models:\n  - modele/b\n", mtime_ns=2_000_000_000)
+    assert registry.names() == ["modele/a"]
+
+    registry.reload()  # Rechargement explicite (SIGHUP)
+    assert registry.names() == ["modele/b"]
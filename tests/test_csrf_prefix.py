@@ -61,3 +61,17 @@ def test_api_exempt_with_prefix():
     # Should get 401 Unauthorized (from auth logic), not 403 CSRF or 500 error
     response = client.get(f"{prefix}/api/v1/queue/status", headers={"X-Forwarded-Prefix": prefix})
     assert response.status_code == 401
+
+def test_form_body_reaches_route_after_csrf_check():
+    """The form body read for the CSRF token must be replayed to the route."""
+    app = create_application(start_worker=False)
+    client = TestClient(app)
+
+    token = client.get("/login").cookies["csrftoken"]
+    response = client.post(
+        "/login",
+        data={"email": "absent@example.com", "password": "mauvais", "csrf_token": token},
+    )
+    # Login refusé (page de login), et non 422 (champs du formulaire manquants)
+    assert response.status_code == 200
+    assert "Email ou mot de passe incorrect" in response.text
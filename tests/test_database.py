@@ -0,0 +1,100 @@
+"""Tests pour les modes de connexion à la base de données.
+
+Ce module vérifie que le mode production applique les pragmas SQLite
+et que les lectures ne sont pas bloquées par une écriture en cours.
+"""
+
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from src.database import Base, create_db_engine
+from src.models.extraction_result import ExtractionResult
+
+
+@pytest.fixture
+def production_engine(tmp_path):
+    """Fournit un moteur en mode production sur une base temporaire."""
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'prod.db'}", mode="production")
+    Base.metadata.create_all(bind=engine, tables=[ExtractionResult.__table__])
+    yield engine
+    engine.dispose()
+
+
+def test_production_mode_sets_pragmas(production_engine):
+    """Vérifie le journal WAL et les pragmas appliqués à la connexion."""
+    with production_engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -65536
+
+
+def test_reads_proceed_during_a_write(production_engine):
+    """Vérifie que les lectures concurrentes aboutissent pendant une transaction d'écriture."""
+    Session = sessionmaker(bind=production_engine)
+    writer = Session()
+    writer.add(ExtractionResult(request_id="persisted", user_id=1, user_email="a@example.com", status="completed"))
+    writer.commit()
+
+    # Transaction d'écriture ouverte (verrou d'écriture détenu), comme pendant _persist_to_db
+    writer.add(ExtractionResult(request_id="pending", user_id=1, user_email="a@example.com", status="completed"))
+    writer.flush()
+
+    durations = []
+    found = []
+
+    def read():
+        start = time.perf_counter()
+        reader = Session()
+        try:
+            found.append(reader.query(ExtractionResult).filter_by(request_id="persisted").count())
+        finally:
+            reader.close()
+        durations.append(time.perf_counter() - start)
+
+    readers = [threading.Thread(target=read) for _ in range(8)]
+    for thread in readers:
+        thread.start()
+    for thread in readers:
+        thread.join(timeout=5)
+
+    assert found == [1] * 8
+    assert max(durations) < 1.0
+    writer.commit()
+    writer.close()
+
+
+def test_missing_columns_are_added_to_existing_tables(tmp_path):
+    """Vérifie qu'une colonne ajoutée à un modèle est créée sur une base déjà déployée."""
+    from src.database import _add_missing_columns
+
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        # Table extraction_result telle qu'avant l'ajout de timings_json
+        conn.execute(text(
+            "CREATE TABLE extraction_result (id INTEGER PRIMARY KEY, request_id VARCHAR(100) NOT NULL UNIQUE, "
+            "user_id INTEGER NOT NULL, user_email VARCHAR(255) NOT NULL, status VARCHAR(20) NOT NULL, "
+            "result_json JSON, error_message TEXT, created_at DATETIME)"
+        ))
+        conn.execute(text(
+            "INSERT INTO extraction_result (request_id, user_id, user_email, status) VALUES ('old-1', 1, 'a@b.c', 'completed')"
+        ))
+    Base.metadata.create_all(bind=engine, tables=[ExtractionResult.__table__])
+
+    _add_missing_columns(engine)
+    _add_missing_columns(engine)  # Idempotent
+
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    try:
+        row = db.query(ExtractionResult).filter_by(request_id="old-1").one()
+        assert row.timings_json is None
+        row.timings_json = {"enqueued": 1.0}
+        db.commit()
+    finally:
+        db.close()
+        engine.dispose()
@@ -0,0 +1,88 @@
+"""Tests pour les métriques exposées par /metrics.
+
+Ce module vérifie le format d'exposition texte, la justesse des
+enregistrements concurrents et l'alimentation des métriques par la file.
+"""
+
+import threading
+import time
+
+from src.services import metrics
+from src.services.metrics import MetricsRegistry
+from src.services.request_queue import QueueItem, QueueItemStatus, RequestQueue
+
+
+def test_render_text_exposition_format():
+    """Vérifie les lignes HELP/TYPE, les labels échappés et les cases cumulées des histogrammes."""
+    registry = MetricsRegistry()
+    counter = registry.counter("demo_events_total", "Événements.", ["kind"])
+    gauge = registry.gauge("demo_depth", "Profondeur.")
+    histogram = registry.histogram("demo_seconds", "Durées.", buckets=(0.1, 1.0))
+
+    counter.labels(kind='a"b').inc()
+    counter.labels(kind='a"b').inc(2)
+    gauge.set_function(lambda: 7)
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value)
+
+    lines = registry.render().splitlines()
+    assert lines[:3] == [
+        "# HELP demo_events_total Événements.",
+        "# TYPE demo_events_total counter",
+        'demo_events_total{kind="a\\"b"} 3',
+    ]
+    assert "demo_depth 7" in lines
+    assert lines[-5:] == [
+        'demo_seconds_bucket{le="0.1"} 1',
+        'demo_seconds_bucket{le="1.0"} 3',
+        'demo_seconds_bucket{le="+Inf"} 4',
+        "demo_seconds_sum 4.05",
+        "demo_seconds_count 4",
+    ]
+
+
+def test_concurrent_recording_loses_no_updates():
+    """Vérifie qu'aucun incrément n'est perdu lorsque plusieurs threads enregistrent en même temps."""
+    registry = MetricsRegistry()
+    counter = registry.counter("demo_hits_total", "Succès.", ["model"])
+    histogram = registry.histogram("demo_latency_seconds", "Latences.", ["model"])
+
+    def record():
+        for i in range(2000):
+            counter.labels(model=f"m{i % 4}").inc()
+            histogram.labels(model="m0").observe(0.01)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(counter.labels(model=f"m{i}").value for i in range(4)) == 16000
+    assert histogram.labels(model="m0").snapshot()[2] == 16000
+
+
+def test_queue_records_wait_time_and_exposes_length():
+    """Vérifie l'attente en file par modèle et la longueur de la file, lue au moment du rendu."""
+    RequestQueue._instance = None
+    queue = RequestQueue()
+    wait = metrics.QUEUE_WAIT_SECONDS.labels(model="metrics-model")
+    observed_before = wait.snapshot()[2]
+    try:
+        for i in range(2):
+            queue.enqueue(QueueItem(
+                request_id=f"metrics-{i}", user_id=1, user_email="metrics@example.com",
+                text=f"Un personnage patient numéro {i}.", model_name="metrics-model",
+            ))
+        assert metrics.QUEUE_LENGTH.labels().value == 2
+        assert "character_queue_length 2" in metrics.registry.render()
+
+        time.sleep(0.02)
+        item = queue._dequeue(block=False)
+        assert item.status == QueueItemStatus.PROCESSING
+        assert metrics.QUEUE_LENGTH.labels().value == 1
+        assert metrics.QUEUE_PROCESSING.labels().value == 1
+        assert wait.snapshot()[2] == observed_before + 1
+        assert wait.snapshot()[1] >= 0.02
+    finally:
+        RequestQueue._instance = None
@@ -60,3 +60,28 @@ def test_persist_result(db_session):
     assert saved_result.user_email == "test@example.com"
     assert saved_result.status == "completed"
     assert saved_result.result_json["summary"] == "Test"
+
+
+def test_persist_result_replaces_previous_result(db_session):
+    """Teste qu'une requête resoumise (surcharge) remplace son ancien résultat en base."""
+    from src.models.extraction_result import ExtractionResult
+    db_session.query(ExtractionResult).filter_by(request_id="test-persist-002").delete()
+    db_session.commit()
+
+    queue = RequestQueue()
+    for status, error in ((QueueItemStatus.FAILED, "Délai dépassé"), (QueueItemStatus.COMPLETED, None)):
+        queue._persist_to_db(QueueItem(
+            request_id="test-persist-002",
+            user_id=1,
+            user_email="test@example.com",
+            text="Texte de test",
+            result={"traits": [], "summary": "Test"} if error is None else None,
+            status=status,
+            error=error,
+        ))
+
+    db_session.expire_all()
+    saved = db_session.query(ExtractionResult).filter_by(request_id="test-persist-002").all()
+    assert len(saved) == 1
+    assert saved[0].status == "completed"
+    assert saved[0].error_message is None
@@ -0,0 +1,127 @@
+"""Tests pour le journal persistant de la file d'attente.
+
+Ce module vérifie que les requêtes en attente survivent à un redémarrage
+et que leur rejeu est idempotent par request_id.
+"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database import Base
+from src.models.queued_request import QueuedRequest
+from src.services.queue_journal import QueueJournal
+from src.services.request_queue import QueueItem, RequestQueue, QueueItemStatus
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Fournit une fabrique de sessions sur une base SQLite temporaire."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'journal.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine, tables=[QueuedRequest.__table__])
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def fresh_queue():
+    """Fournit une fabrique de RequestQueue neuves (simule un redémarrage)."""
+    def make():
+        RequestQueue._instance = None
+        queue = RequestQueue()
+        queue._initialize()
+        return queue
+    yield make
+    RequestQueue._instance = None
+
+
+def make_item(request_id: str) -> QueueItem:
+    """Construit un élément de file avec webhook."""
+    return QueueItem(
+        request_id=request_id,
+        user_id=7,
+        user_email="durable@example.com",
+        text=f"Un personnage prudent et méthodique ({request_id}).",
+        directive="Insister sur les valeurs",
+        model_name="model-a",
+        webhook="https://example.com/hook",
+    )
+
+
+def test_waiting_and_inflight_items_are_replayed(session_factory, fresh_queue):
+    """Vérifie que les éléments en attente et en cours sont rejoués dans l'ordre."""
+    journal = QueueJournal(session_factory, flush_interval_ms=1)
+    queue = fresh_queue()
+    queue.attach_journal(journal)
+    for i in range(3):
+        item = make_item(f"durable-{i}")
+        item.stream = i == 1
+        queue.enqueue(item)
+    queue.remove_waiting_request("durable-2")
+    assert queue._dequeue().request_id == "durable-0"
+    journal.close()
+
+    # Redémarrage : nouvelle file, nouveau journal sur la même base
+    journal = QueueJournal(session_factory, flush_interval_ms=1)
+    queue = fresh_queue()
+    assert queue.attach_journal(journal) == 2
+
+    first = queue._dequeue()
+    assert first.request_id == "durable-0"
+    assert first.webhook == "https://example.com/hook"
+    assert first.directive == "Insister sur les valeurs"
+    assert not first.stream
+    # Une requête en flux le reste après le rejeu
+    second = queue._dequeue()
+    assert second.request_id == "durable-1"
+    assert second.stream
+    assert queue._dequeue() is None
+    journal.close()
+
+
+def test_replay_is_idempotent_by_request_id(session_factory, fresh_queue):
+    """Vérifie qu'un élément déjà en file n'est pas rejoué deux fois."""
+    journal = QueueJournal(session_factory, flush_interval_ms=1)
+    queue = fresh_queue()
+    queue.attach_journal(journal)
+    queue.enqueue(make_item("idem-0"))
+
+    assert queue.attach_journal(journal) == 0
+    assert queue.get_queue_status()["queue_length"] == 1
+
+    # Une surcharge remplace la ligne du journal au lieu de la dupliquer
+    queue.remove_waiting_request("idem-0")
+    queue.enqueue(make_item("idem-0"))
+    journal.close()
+
+    db = session_factory()
+    try:
+        assert db.query(QueuedRequest).filter_by(request_id="idem-0").count() == 1
+    finally:
+        db.close()
+
+
+def test_completed_item_leaves_journal(session_factory):
+    """Vérifie que la sortie du journal ne supprime pas une surcharge plus récente."""
+    journal = QueueJournal(session_factory, flush_interval_ms=1)
+    old_item = make_item("done-0")
+    journal.record_enqueue(old_item)
+
+    newer_item = make_item("done-0")
+    newer_item.created_at = old_item.created_at + 1
+    journal.record_enqueue(newer_item)
+
+    db = session_factory()
+    try:
+        # Le résultat de l'ancien élément ne doit pas effacer la nouvelle soumission
+        old_item.status = QueueItemStatus.COMPLETED
+        QueueJournal.delete_in_session(db, old_item)
+        db.commit()
+        assert db.query(QueuedRequest).filter_by(request_id="done-0").count() == 1
+
+        QueueJournal.delete_in_session(db, newer_item)
+        db.commit()
+        assert db.query(QueuedRequest).count() == 0
+    finally:
+        db.close()
+        journal.close()
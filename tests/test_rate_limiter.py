@@ -0,0 +1,121 @@
+"""Tests pour le limiteur de requêtes par fenêtre glissante.
+
+Ce module vérifie le glissement de la fenêtre, le décompte atomique,
+la persistance des compteurs et l'amorçage depuis request_log.
+"""
+
+import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from src.database import Base
+from src.models.rate_limit_bucket import RateLimitBucket
+from src.models.user import User, ApiToken, RequestLog
+from src.services.rate_limiter import RateLimiter
+
+# Instant de référence aligné sur une tranche de 60 s
+T0 = 1_700_000_040
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Fournit une fabrique de sessions sur une base SQLite temporaire."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'limits.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine, tables=[
+        User.__table__, ApiToken.__table__, RequestLog.__table__, RateLimitBucket.__table__,
+    ])
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def make_limiter(session_factory) -> RateLimiter:
+    """Construit un limiteur à fenêtre de 10 minutes et tranches d'une minute."""
+    return RateLimiter(window_seconds=600, bucket_seconds=60, session_factory=session_factory)
+
+
+def test_requests_expire_as_the_window_slides(session_factory):
+    """Vérifie que les requêtes sortent du décompte à l'expiration de leur tranche."""
+    limiter = make_limiter(session_factory)
+    limiter.record(1, now=T0)
+    limiter.record(1, amount=2, now=T0 + 300)
+
+    assert limiter.count(1, now=T0 + 599) == 3
+    assert limiter.count(1, now=T0 + 600) == 2
+    assert limiter.remaining(1, 5, now=T0 + 600) == 3
+    # Inactivité plus longue que la fenêtre : tout est expiré
+    assert limiter.count(1, now=T0 + 5000) == 0
+    assert limiter.count(2, now=T0) == 0
+
+
+def test_try_consume_is_all_or_nothing(session_factory):
+    """Vérifie que try_consume refuse un lot qui dépasserait la limite."""
+    limiter = make_limiter(session_factory)
+    assert limiter.try_consume(1, limit=5, amount=4, now=T0)
+    assert not limiter.try_consume(1, limit=5, amount=2, now=T0)
+    assert limiter.count(1, now=T0) == 4
+    assert limiter.try_consume(1, limit=5, now=T0)
+    assert not limiter.try_consume(1, limit=5, now=T0)
+    # Sans limite (administrateur), la requête est toujours décomptée
+    assert limiter.try_consume(1, limit=None, now=T0)
+    assert limiter.count(1, now=T0) == 6
+
+
+def test_counters_survive_a_restart(session_factory, monkeypatch):
+    """Vérifie que les compteurs écrits par flush() sont rechargés par un nouveau limiteur."""
+    monkeypatch.setattr("src.services.rate_limiter.time.time", lambda: T0 + 120)
+    limiter = make_limiter(session_factory)
+    limiter.record(1, now=T0)
+    limiter.record(1, now=T0 + 60)
+    limiter.record(2, now=T0 + 60)
+    limiter.flush()
+
+    restarted = make_limiter(session_factory)
+    assert restarted.count(1, now=T0 + 120) == 2
+    assert restarted.count(2, now=T0 + 120) == 1
+
+
+def test_bootstrap_from_request_log(session_factory, monkeypatch):
+    """Vérifie l'amorçage depuis request_log lorsqu'aucun compteur n'a été persisté."""
+    monkeypatch.setattr("src.services.rate_limiter.time.time", lambda: T0)
+    db = session_factory()
+    db.add(User(id=1, email="a@example.com", hashed_password="x", status="normal"))
+    db.add(ApiToken(id=1, user_id=1, token="t" * 64))
+    for age in (30, 120, 3600):
+        created_at = datetime.datetime.fromtimestamp(T0 - age, datetime.timezone.utc)
+        db.add(RequestLog(user_id=1, token_id=1, request_id=f"r{age}", created_at=created_at))
+    db.commit()
+    db.close()
+
+    limiter = make_limiter(session_factory)
+    # La requête vieille d'une heure est hors de la fenêtre de 10 minutes
+    assert limiter.count(1, now=T0) == 2
+
+
+def test_failed_load_is_retried_without_losing_counters(session_factory, monkeypatch):
+    """Vérifie qu'un chargement en échec est retenté et que les compteurs persistés ne sont pas écrasés entre-temps."""
+    monkeypatch.setattr("src.services.rate_limiter.time.time", lambda: T0)
+    limiter = make_limiter(session_factory)
+    limiter.record(1, amount=3, now=T0)
+    limiter.flush()
+
+    database_down = [True]
+
+    def flaky_session_factory():
+        if database_down[0]:
+            raise OperationalError("SELECT", {}, Exception("database is locked"))
+        return session_factory()
+
+    restarted = make_limiter(flaky_session_factory)
+    # Base indisponible : la requête est décomptée en mémoire seulement
+    assert restarted.try_consume(1, limit=5, now=T0)
+    assert not restarted._loaded
+    restarted.flush()
+
+    database_down[0] = False
+    # Nouvel essai au prochain appel : compteurs persistés et décompte en mémoire s'additionnent
+    assert restarted.count(1, now=T0) == 4
+    assert restarted._loaded
+    assert not restarted.try_consume(1, limit=4, now=T0)
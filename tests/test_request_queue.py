@@ -0,0 +1,524 @@
+"""Tests pour le service de file d'attente RequestQueue.
+
+Ce module vérifie le fonctionnement du pool de workers et le respect
+des limites de traitements simultanés par modèle.
+"""
+
+import threading
+import time
+
+import pytest
+
+from src.services.request_queue import QueueItem, RequestQueue, QueueItemStatus
+
+
+@pytest.fixture
+def queue():
+    """Fournit une instance neuve de RequestQueue (le singleton est réinitialisé)."""
+    RequestQueue._instance = None
+    q = RequestQueue()
+    q._initialize()
+    # Pas d'accès à la base pendant ces tests
+    q._persist_to_db = lambda item: None
+    yield q
+    q.stop_worker()
+    RequestQueue._instance = None
+
+
+def make_item(request_id: str, model_name: str = "model-a", user_id: int = 1,
+              text: str = None) -> QueueItem:
+    """Construit un élément de file minimal (texte propre à la requête par défaut)."""
+    return QueueItem(
+        request_id=request_id,
+        user_id=user_id,
+        user_email=f"user{user_id}@example.com",
+        text=text or f"Un personnage courageux et loyal ({request_id}).",
+        model_name=model_name,
+    )
+
+
+def wait_for(predicate, timeout: float = 5.0) -> bool:
+    """Attend qu'une condition soit vraie (ou l'expiration du délai)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_worker_pool_processes_in_parallel(queue):
+    """Vérifie que plusieurs workers traitent des éléments simultanément."""
+    release = threading.Event()
+    started = []
+
+    def process(text, directive, model_name):
+        started.append(model_name)
+        release.wait(5)
+        return {"traits": []}
+
+    queue.start_worker(process, num_workers=3, model_limits={})
+    for i in range(3):
+        queue.enqueue(make_item(f"pool-{i}"))
+
+    assert wait_for(lambda: len(started) == 3)
+    status = queue.get_queue_status()
+    assert len(status["processing_items"]) == 3
+    assert status["processing"] is not None
+    assert queue.get_request_status("pool-0")["status"] == QueueItemStatus.PROCESSING.value
+
+    release.set()
+    assert wait_for(lambda: not queue.get_queue_status()["processing_items"])
+
+
+def test_model_limit_lets_other_models_pass(queue):
+    """Vérifie qu'un modèle saturé n'empêche pas le traitement des autres modèles."""
+    release = threading.Event()
+    started = []
+
+    def process(text, directive, model_name):
+        started.append(model_name)
+        release.wait(5)
+        return {"traits": []}
+
+    queue.start_worker(process, num_workers=3, model_limits={"model-a": 1})
+    queue.enqueue(make_item("limit-a1", "model-a"))
+    queue.enqueue(make_item("limit-a2", "model-a"))
+    queue.enqueue(make_item("limit-b1", "model-b"))
+
+    assert wait_for(lambda: len(started) == 2)
+    time.sleep(0.1)
+    assert sorted(started) == ["model-a", "model-b"]
+
+    waiting = queue.get_request_status("limit-a2")
+    assert waiting["status"] == QueueItemStatus.WAITING.value
+    assert waiting["position"] == 1
+
+    release.set()
+    assert wait_for(lambda: len(started) == 3)
+
+
+def test_enqueue_wakes_idle_worker_immediately(queue):
+    """Vérifie que l'ajout réveille un worker inactif sans attente de polling."""
+    latencies = []
+    done = threading.Event()
+
+    def process(text, directive, model_name):
+        latencies.append(time.perf_counter() - float(text))
+        done.set()
+        return {"traits": []}
+
+    queue.start_worker(process, num_workers=1, model_limits={})
+    for i in range(10):
+        time.sleep(0.02)  # Laisser le worker retourner en attente
+        done.clear()
+        item = make_item(f"wake-{i}")
+        item.text = repr(time.perf_counter())
+        queue.enqueue(item)
+        assert done.wait(2)
+
+    # Le polling précédent (0.5 s) donnait ~250 ms en moyenne
+    assert sum(latencies) / len(latencies) < 0.05
+
+
+def test_stop_worker_interrupts_idle_wait(queue):
+    """Vérifie que l'arrêt réveille immédiatement les workers en attente."""
+    queue.start_worker(lambda text, directive, model_name: {}, num_workers=2, model_limits={})
+    time.sleep(0.05)
+
+    start = time.monotonic()
+    queue.stop_worker()
+    assert time.monotonic() - start < 1.0
+    assert not queue._worker_threads
+
+
+def test_positions_follow_removals(queue):
+    """Vérifie que les positions restent exactes après retrait et dequeue."""
+    for i in range(5):
+        assert queue.enqueue(make_item(f"pos-{i}", user_id=i % 2)) == i
+
+    assert queue.remove_waiting_request("pos-1")
+    assert not queue.remove_waiting_request("pos-1")
+    assert queue.get_request_status("pos-4")["position"] == 3
+
+    item = queue._dequeue()
+    assert item.request_id == "pos-0"
+    # Un élément en cours occupe la position 0
+    assert queue.get_request_status("pos-2")["position"] == 1
+    assert queue.get_request_status("pos-4")["position"] == 3
+
+    user_status = queue.get_queue_status(user_id=0)
+    assert [i["request_id"] for i in user_status["items"]] == ["pos-2", "pos-4"]
+    assert user_status["queue_length"] == 3
+
+
+def test_resubmitted_request_takes_new_place(queue):
+    """Vérifie qu'une requête retirée puis ré-ajoutée passe en fin de file."""
+    queue.enqueue(make_item("again-0"))
+    queue.enqueue(make_item("again-1"))
+    queue.remove_waiting_request("again-0")
+    queue.enqueue(make_item("again-0"))
+
+    assert queue._dequeue().request_id == "again-1"
+    assert queue._dequeue().request_id == "again-0"
+    assert queue._dequeue() is None
+
+
+def test_enqueue_replaces_waiting_item_with_same_request_id(queue):
+    """Vérifie qu'un ajout direct remplace la requête en attente de même request_id (positions, regroupement)."""
+    text = "Un personnage courageux et loyal."
+    queue.enqueue(make_item("twice", text=text))
+    queue.enqueue(make_item("next"))
+    queue.enqueue(make_item("twice", text="Un personnage méfiant et rusé."))
+
+    # L'ancienne soumission ne compte plus dans les positions
+    assert queue.get_request_status("next")["position"] == 0
+    assert queue.get_request_status("twice")["position"] == 1
+    assert queue._positions.prefix_sum(queue._next_seq) == len(queue._waiting) == 2
+
+    # Son contenu n'a plus de référence : une nouvelle requête ne s'y regroupe pas
+    late = make_item("late", user_id=2, text=text)
+    queue.enqueue(late)
+    assert late.coalesced_with is None
+    assert [queue._dequeue().request_id for _ in range(3)] == ["next", "twice", "late"]
+
+
+def test_concurrent_submissions_of_same_request_id_keep_one_waiting(queue):
+    """Vérifie que deux soumissions simultanées du même request_id n'en laissent qu'une en attente."""
+    rounds = 50
+    for i in range(rounds):
+        barrier = threading.Barrier(2)
+
+        def submit(side, request_id=f"race-{i}", barrier=barrier):
+            item = make_item(request_id, text=f"Un personnage {side} ({request_id}).")
+            barrier.wait()
+            queue.enqueue(item)
+
+        threads = [threading.Thread(target=submit, args=(side,)) for side in ("loyal", "rusé")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert len(queue._waiting) == len(queue._leaders) == rounds
+    assert queue._positions.prefix_sum(queue._next_seq) == rounds
+    assert [queue.get_request_status(f"race-{i}")["position"] for i in range(rounds)] == list(range(rounds))
+
+
+def test_resubmission_while_processing_starts_after_previous_run(queue):
+    """Vérifie qu'un request_id resoumis pendant son traitement ne perturbe ni l'ancien ni le nouveau."""
+    releases = {"model-a": threading.Event(), "model-b": threading.Event()}
+    started = []
+    persisted = []
+    queue._persist_to_db = persisted.append
+
+    def process(text, directive, model_name):
+        started.append(model_name)
+        releases[model_name].wait(5)
+        return {"traits": [], "summary": model_name}
+
+    queue.start_worker(process, num_workers=2, model_limits={"model-a": 1, "model-b": 1})
+    queue.enqueue(make_item("dup", "model-a"))
+    assert wait_for(lambda: started == ["model-a"])
+
+    # Resoumission (autre modèle, autre texte) : elle attend la fin de la précédente
+    queue.enqueue(make_item("dup", "model-b", text="Un personnage méfiant et rusé."))
+    time.sleep(0.1)
+    assert started == ["model-a"]
+    assert queue.get_request_status("dup")["status"] == QueueItemStatus.WAITING.value
+
+    releases["model-a"].set()
+    assert wait_for(lambda: started == ["model-a", "model-b"])
+    assert queue.get_request_status("dup")["status"] == QueueItemStatus.PROCESSING.value
+
+    releases["model-b"].set()
+    assert wait_for(lambda: len(persisted) == 2 and not queue._processing)
+    assert [item.result["summary"] for item in persisted] == ["model-a", "model-b"]
+    assert queue._running_by_model == {"model-a": 0, "model-b": 0}
+
+
+def test_fenwick_tree_growth():
+    """Vérifie les sommes préfixes de l'arbre de Fenwick après agrandissement."""
+    from src.services.request_queue import _FenwickTree
+
+    tree = _FenwickTree()
+    for i in range(1, 200):
+        tree.add(i, 1)
+    tree.add(50, -1)
+    assert tree.prefix_sum(49) == 49
+    assert tree.prefix_sum(100) == 99
+    assert tree.prefix_sum(1000) == 198
+
+
+def test_identical_requests_share_one_inference(queue):
+    """Vérifie que des requêtes de même contenu ne déclenchent qu'une inférence."""
+    release = threading.Event()
+    calls = []
+    persisted = []
+    queue._persist_to_db = persisted.append
+
+    def process(text, directive, model_name):
+        calls.append(text)
+        release.wait(5)
+        return {"traits": [{"trait": "Loyal", "score": 0.9, "category": "Personnalité"}]}
+
+    queue.start_worker(process, num_workers=2, model_limits={})
+    text = "Un personnage courageux et loyal."
+    queue.enqueue(make_item("leader", user_id=1, text=text))
+    assert wait_for(lambda: len(calls) == 1)
+
+    # Même contenu (aux espaces près) soumis pendant le traitement par deux autres utilisateurs
+    assert queue.enqueue(make_item("follower-1", user_id=2, text=text)) == 0
+    queue.enqueue(make_item("follower-2", user_id=3, text="  Un personnage   courageux et loyal. "))
+    status = queue.get_request_status("follower-1")
+    assert status["status"] == QueueItemStatus.PROCESSING.value
+    assert status["coalesced_with"] == "leader"
+    assert queue.get_queue_status(user_id=2)["processing"]["request_id"] == "follower-1"
+
+    release.set()
+    assert wait_for(lambda: len(persisted) == 3)
+    assert len(calls) == 1
+    by_id = {item.request_id: item for item in persisted}
+    assert by_id["follower-2"].status == QueueItemStatus.COMPLETED
+    assert by_id["follower-2"].result == by_id["leader"].result
+    assert by_id["follower-2"].result is not by_id["leader"].result
+    assert wait_for(lambda: not queue._follower_items)
+
+
+def test_cancelled_leader_promotes_follower(queue):
+    """Vérifie qu'une référence retirée est remplacée par sa requête regroupée, à la même place."""
+    text = "Un personnage courageux et loyal."
+    queue.enqueue(make_item("other", model_name="model-b"))
+    queue.enqueue(make_item("lead", text=text))
+    queue.enqueue(make_item("follow", user_id=2, text=text))
+    queue.enqueue(make_item("late-follow", user_id=3, text=text))
+    assert queue.get_request_status("follow")["position"] == 1
+
+    assert queue.remove_waiting_request("lead")
+    assert queue.get_request_status("follow")["position"] == 1
+    assert queue.get_request_status("late-follow")["coalesced_with"] == "follow"
+
+    assert queue._dequeue().request_id == "other"
+    promoted = queue._dequeue()
+    assert promoted.request_id == "follow"
+    assert [f.request_id for f in queue._followers[promoted.content_key]] == ["late-follow"]
+    assert queue.remove_waiting_request("late-follow") is False
+
+
+def test_stream_item_records_partial_traits(queue):
+    """Vérifie que les traits reçus en flux sont conservés pour la requête et ses regroupées."""
+    release = threading.Event()
+    trait = {"trait": "Loyal", "score": 0.9, "category": "Personnalité"}
+
+    def process(text, directive, model_name, on_partial=None):
+        on_partial(trait)
+        release.wait(5)
+        return {"traits": [trait]}
+
+    queue.start_worker(process, num_workers=1, model_limits={})
+    text = "Un personnage courageux et loyal."
+    leader = make_item("streamed", text=text)
+    leader.stream = True
+    queue.enqueue(leader)
+    assert wait_for(lambda: queue.get_request_status("streamed").get("partial_traits") == [trait])
+
+    # Une requête regroupée en cours de génération reçoit les traits déjà produits
+    queue.enqueue(make_item("joined", user_id=2, text=text))
+    assert queue.get_request_status("joined")["partial_traits"] == [trait]
+    release.set()
+
+
+def test_async_worker_bounds_in_flight_items(queue):
+    """Vérifie que le mode asynchrone soumet sans attendre, dans la limite des éléments en cours."""
+    import concurrent.futures
+
+    futures = {}
+
+    def submit(text, directive, model_name):
+        future = concurrent.futures.Future()
+        futures[text] = future
+        return future
+
+    queue.start_async_worker(submit, max_in_flight=2, model_limits={})
+    items = [make_item(f"async-{i}") for i in range(3)]
+    for item in items:
+        queue.enqueue(item)
+
+    # Deux soumissions en vol sans thread bloqué ; le troisième garde sa place en file
+    assert wait_for(lambda: len(futures) == 2)
+    assert queue.get_request_status("async-2")["status"] == QueueItemStatus.WAITING.value
+
+    futures[items[1].text].set_result({"traits": []})
+    assert wait_for(lambda: len(futures) == 3)
+    assert wait_for(lambda: items[1].status == QueueItemStatus.COMPLETED)
+
+    futures[items[0].text].set_exception(RuntimeError("surcharge"))
+    assert wait_for(lambda: items[0].status == QueueItemStatus.FAILED)
+    assert items[0].error == "surcharge"
+
+
+def test_dashboard_receives_only_its_changed_items(queue):
+    """Vérifie que les tableaux de bord connectés reçoivent les changements de leurs seuls éléments."""
+    import asyncio
+
+    from src.services.queue_events import event_broker
+
+    async def scenario():
+        subscription = event_broker.subscribe(user_id=1)
+        other = event_broker.subscribe(user_id=2)
+        try:
+            queue.enqueue(make_item("dash-1", user_id=1))
+            queue.enqueue(make_item("dash-2", user_id=1))
+            first = await subscription.get(timeout=1)
+            second = await subscription.get(timeout=1)
+
+            # Démarrage du premier élément : le second garde sa place (l'élément en cours compte)
+            queue._dequeue()
+            started = await subscription.get(timeout=1)
+
+            queue.remove_waiting_request("dash-2")
+            removed = await subscription.get(timeout=1)
+            # L'autre utilisateur n'a que la longueur de la file, à chacun de ses changements
+            other_events = [await other.get(timeout=1) for _ in range(4)]
+            return first, second, started, removed, other_events
+        finally:
+            event_broker.unsubscribe(subscription)
+            event_broker.unsubscribe(other)
+
+    first, second, started, removed, other_events = asyncio.run(scenario())
+
+    assert first["event"] == "queue"
+    assert first["queue_length"] == 1
+    assert [i["request_id"] for i in first["items"]] == ["dash-1"]
+    # La position de dash-1 n'a pas changé : elle n'est pas republiée
+    assert {i["request_id"]: i["position"] for i in second["items"]} == {"dash-2": 1}
+
+    started_items = {i["request_id"]: i for i in started["items"]}
+    assert started_items["dash-1"]["status"] == QueueItemStatus.PROCESSING.value
+    assert "dash-2" not in started_items
+    assert started["queue_length"] == 1
+
+    assert removed["items"] == [{"request_id": "dash-2", "status": "removed"}]
+    assert other_events == [{"event": "queue_length", "queue_length": length} for length in (1, 2, 1, 0)]
+
+
+def test_dashboard_position_updates_cover_displayed_items_only(queue):
+    """Vérifie que seuls les déplacements des éléments affichés sont publiés, sans événement vide."""
+    import asyncio
+
+    from src.services.queue_events import event_broker
+    from src.services.request_queue import DASHBOARD_MAX_ITEMS
+
+    for i in range(DASHBOARD_MAX_ITEMS + 10):
+        queue.enqueue(make_item(f"bulk-{i}", user_id=1))
+
+    async def scenario():
+        subscription = event_broker.subscribe(user_id=1)
+        try:
+            # Un ajout en fin de file ne déplace aucun élément de l'utilisateur 1
+            queue.enqueue(make_item("tail", user_id=2))
+            quiet = await subscription.get(timeout=0.2)
+            # Le retrait du plus ancien fait avancer tous les autres
+            queue.remove_waiting_request("bulk-0")
+            return quiet, await subscription.get(timeout=1)
+        finally:
+            event_broker.unsubscribe(subscription)
+
+    quiet, shifted = asyncio.run(scenario())
+
+    assert quiet == {"event": "queue_length", "queue_length": DASHBOARD_MAX_ITEMS + 11}
+    items = {i["request_id"]: i for i in shifted["items"]}
+    assert items.pop("bulk-0") == {"request_id": "bulk-0", "status": "removed"}
+    assert len(items) == DASHBOARD_MAX_ITEMS
+    assert items[f"bulk-{DASHBOARD_MAX_ITEMS + 9}"]["position"] == DASHBOARD_MAX_ITEMS + 8
+
+
+def test_no_dashboard_updates_without_subscribers(queue, monkeypatch):
+    """Vérifie qu'aucune vue n'est calculée si aucun tableau de bord n'est connecté."""
+    calls = []
+    monkeypatch.setattr(queue, "_user_item_view", lambda item: calls.append(item))
+
+    queue.enqueue(make_item("silent-1"))
+    queue._dequeue()
+
+    assert calls == []
+
+
+def test_enqueue_many_replaces_waiting_and_keeps_order(queue):
+    """Vérifie l'ajout groupé : ordre conservé, doublons en attente remplacés, regroupement actif."""
+    queue.enqueue(make_item("many-0"))
+    items = [
+        make_item("many-1"),
+        make_item("many-0", text="Texte remplacé pour many-0."),
+        make_item("many-2", text="Un personnage courageux et loyal (many-1)."),
+    ]
+
+    positions = queue.enqueue_many(items)
+
+    assert positions == [0, 1, 0]
+    assert items[2].coalesced_with == "many-1"
+    status = queue.get_queue_status()
+    assert status["queue_length"] == 2
+    assert queue._waiting["many-0"].text == "Texte remplacé pour many-0."
+
+
+def test_status_reads_do_not_take_the_queue_lock(queue):
+    """Vérifie que le statut se lit sans verrou, et qu'une lecture concurrente d'une modification est recommencée."""
+    for i in range(3):
+        queue.enqueue(make_item(f"poll-{i}"))
+
+    results = []
+    with queue._queue_lock:
+        reader = threading.Thread(target=lambda: results.append(queue.get_request_status("poll-2")))
+        reader.start()
+        reader.join(timeout=2)
+        assert results and results[0]["position"] == 2
+
+    # Modification en cours (version impaire) : la lecture attend sa fin sous verrou
+    results.clear()
+    with queue._queue_lock, queue._writing():
+        reader = threading.Thread(target=lambda: results.append(queue.get_request_status("poll-0")))
+        reader.start()
+        reader.join(timeout=0.2)
+        assert not results
+        queue._processing["poll-0"] = queue._waiting.pop("poll-0")
+    reader.join(timeout=2)
+    assert results[0]["status"] == QueueItemStatus.PROCESSING.value
+
+
+def test_stage_timings_are_recorded_on_each_item(queue):
+    """Vérifie les horodatages des étapes, complétés par la fonction de traitement, et leur décomposition."""
+    from src.services.request_queue import stage_durations
+
+    release = threading.Event()
+    persisted = []
+    queue._persist_to_db = persisted.append
+
+    def process(text, directive, model_name, timings=None):
+        release.wait(5)
+        timings["inference_finished"] = time.time()
+        timings["parsed"] = time.time()
+        return {"traits": []}
+
+    queue.start_worker(process, num_workers=1, model_limits={})
+    queue.enqueue(make_item("timed-0", text="Même texte."))
+    assert wait_for(lambda: "timed-0" in queue._processing)
+    queue.enqueue(make_item("timed-1", text="Même texte."))
+    release.set()
+    assert wait_for(lambda: len(persisted) == 2)
+
+    leader, follower = sorted(persisted, key=lambda item: item.request_id)
+    stages = ["enqueued", "dequeued", "inference_started", "inference_finished", "parsed"]
+    assert list(leader.timings) == stages
+    assert [leader.timings[s] for s in stages] == sorted(leader.timings[s] for s in stages)
+    # La requête regroupée partage les étapes de sa référence mais garde son heure d'ajout
+    assert follower.timings["enqueued"] > leader.timings["dequeued"]
+    assert follower.timings["parsed"] == leader.timings["parsed"]
+
+    durations = stage_durations({**leader.timings, "persisted": leader.timings["parsed"] + 0.5})
+    assert set(durations) == {"queue_wait_seconds", "inference_seconds", "parse_seconds",
+                              "persist_seconds", "total_seconds"}
+    assert durations["persist_seconds"] == pytest.approx(0.5)
+    assert stage_durations({"enqueued": 10.0, "persisted": 10.25}) == {
+        "persist_seconds": 0.25, "total_seconds": 0.25,
+    }
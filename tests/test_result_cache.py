@@ -0,0 +1,127 @@
+"""Tests pour le cache des résultats d'extraction.
+
+Ce module vérifie le calcul des empreintes, les deux niveaux du cache
+(mémoire et SQLite), l'expiration et l'éviction, ainsi que la terminaison
+immédiate d'un élément de file dont le résultat est en cache.
+"""
+
+import copy
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database import Base
+from src.models.cached_result import CachedResult
+from src.services.result_cache import ResultCache, make_cache_key, is_cacheable
+from src.services.request_queue import QueueItem, RequestQueue, QueueItemStatus
+
+RESULT = {
+    "traits": [{"trait": "Courageux", "score": 0.9, "category": "Personnalité"}],
+    "summary": "Courageux",
+    "model_used": "model-a",
+    "validated_model": True,
+}
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Fournit une fabrique de sessions sur une base SQLite temporaire."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    Base.metadata.create_all(bind=engine, tables=[CachedResult.__table__])
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def test_cache_key_normalizes_whitespace():
+    """Vérifie que l'empreinte ignore les espaces superflus mais pas le modèle."""
+    key = make_cache_key("Un héros  courageux.\n", None, "model-a")
+    assert key == make_cache_key(" Un héros courageux.", "", "model-a")
+    assert key != make_cache_key("Un héros courageux.", None, "model-b")
+    assert key != make_cache_key("Un héros courageux.", "Valeurs", "model-a")
+
+
+def test_empty_results_are_not_cacheable():
+    """Vérifie qu'un résultat sans traits (erreur transitoire possible) n'est pas conservé."""
+    assert is_cacheable(RESULT)
+    assert not is_cacheable({**RESULT, "traits": []})
+    assert not is_cacheable({**RESULT, "validated_model": False})
+
+
+def test_memory_and_persistent_tiers(session_factory):
+    """Vérifie la lecture depuis SQLite quand le niveau mémoire est vide."""
+    cache = ResultCache(session_factory, memory_entries=10, max_entries=100, ttl_hours=1)
+    key = make_cache_key("texte", None, "model-a")
+
+    assert cache.get(key) is None
+    cache.put(key, "model-a", RESULT)
+    assert cache.get(key) == RESULT
+
+    # Nouveau processus : seul le niveau SQLite est disponible
+    restarted = ResultCache(session_factory, memory_entries=10, max_entries=100, ttl_hours=1)
+    assert restarted.get(key) == RESULT
+    assert restarted.get(key) == RESULT
+
+    stats = restarted.stats()
+    assert stats["persistent_hits"] == 1
+    assert stats["memory_hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_callers_cannot_alter_cached_results(session_factory):
+    """Vérifie que modifier un résultat lu ou enregistré ne modifie pas l'entrée du cache."""
+    cache = ResultCache(session_factory, memory_entries=10, max_entries=100, ttl_hours=1)
+    key = make_cache_key("texte modifiable", None, "model-a")
+    stored = copy.deepcopy(RESULT)
+    cache.put(key, "model-a", stored)
+    stored["traits"].clear()
+
+    first = cache.get(key)
+    first["traits"][0]["score"] = 0.1
+    first["request_id"] = "autre"
+
+    assert cache.get(key) == RESULT
+
+
+def test_ttl_and_size_eviction(session_factory):
+    """Vérifie l'expiration des entrées et l'éviction au-delà de la taille maximale."""
+    expired = ResultCache(session_factory, memory_entries=10, max_entries=100, ttl_hours=0)
+    key = make_cache_key("expiré", None, "model-a")
+    expired.put(key, "model-a", RESULT)
+    expired._memory.clear()
+    assert expired.get(key) is None
+
+    cache = ResultCache(session_factory, memory_entries=10, max_entries=3, ttl_hours=1)
+    for i in range(5):
+        cache.put(make_cache_key(f"texte {i}", None, "model-a"), "model-a", RESULT)
+    assert cache.prune() >= 2
+
+    db = session_factory()
+    try:
+        assert db.query(CachedResult).count() == 3
+    finally:
+        db.close()
+
+
+def test_cache_hit_completes_item_without_worker(session_factory):
+    """Vérifie qu'un contenu déjà en cache termine l'élément dès son ajout."""
+    RequestQueue._instance = None
+    queue = RequestQueue()
+    queue._initialize()
+    persisted = []
+    queue._persist_to_db = persisted.append
+
+    cache = ResultCache(session_factory, memory_entries=10, max_entries=100, ttl_hours=1)
+    queue.attach_result_cache(cache)
+    item = QueueItem(request_id="cached-1", user_id=1, user_email="a@example.com",
+                     text="Un personnage loyal.", model_name="model-a")
+    cache.put(item.content_key, "model-a", RESULT)
+
+    try:
+        assert queue.enqueue(item) == -1
+        assert item.status == QueueItemStatus.COMPLETED
+        assert item.result == RESULT
+        assert persisted == [item]
+        assert queue.get_queue_status()["queue_length"] == 0
+    finally:
+        RequestQueue._instance = None
@@ -0,0 +1,281 @@
+"""Tests pour le magasin des résultats récents (écriture différée).
+
+Ce module vérifie que les résultats sont servis depuis la mémoire avant
+leur écriture, que celle-ci est faite par lots avec la sortie du journal,
+et qu'une ligne invalide ne fait pas perdre le reste du lot.
+"""
+
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database import Base
+from src.models.extraction_result import ExtractionResult
+from src.models.queued_request import QueuedRequest
+from src.services.queue_journal import QueueJournal
+from src.services.request_queue import QueueItem, QueueItemStatus, RequestQueue
+from src.services.result_store import ResultStore
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Fournit une fabrique de sessions sur une base SQLite temporaire."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'results.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine, tables=[ExtractionResult.__table__, QueuedRequest.__table__])
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def make_done_item(request_id: str, status: QueueItemStatus = QueueItemStatus.COMPLETED) -> QueueItem:
+    """Construit un élément terminé."""
+    item = QueueItem(
+        request_id=request_id,
+        user_id=3,
+        user_email="store@example.com",
+        text=f"Un personnage rusé ({request_id}).",
+        model_name="model-a",
+        status=status,
+    )
+    if status == QueueItemStatus.COMPLETED:
+        item.result = {"traits": [{"trait": "Rusé", "score": 0.9, "category": "Personnalité"}]}
+    else:
+        item.error = "Délai dépassé"
+    return item
+
+
+def stored_ids(session_factory) -> list:
+    """Retourne les request_id présents en base."""
+    db = session_factory()
+    try:
+        return sorted(row.request_id for row in db.query(ExtractionResult))
+    finally:
+        db.close()
+
+
+def test_results_are_served_before_the_write(session_factory):
+    """Vérifie que le worker n'attend pas l'écriture et que les résultats non écrits ne sont jamais évincés."""
+    release = threading.Event()
+
+    def slow_sessions():
+        release.wait(5)
+        return session_factory()
+
+    store = ResultStore(slow_sessions, max_entries=1, flush_interval_ms=0)
+    try:
+        store.put(make_done_item("hot-0"))
+        store.put(make_done_item("hot-1", QueueItemStatus.FAILED))
+
+        # Écriture bloquée : les deux résultats restent consultables malgré max_entries=1
+        assert store.get("hot-0")["result"]["traits"][0]["trait"] == "Rusé"
+        assert store.get("hot-1") == {
+            "request_id": "hot-1", "status": "failed", "result": None, "error": "Délai dépassé", "timings": {},
+        }
+        assert stored_ids(session_factory) == []
+
+        release.set()
+        assert store.flush(timeout=5)
+        assert store.pending_count() == 0
+        assert stored_ids(session_factory) == ["hot-0", "hot-1"]
+        # Seul le plus récent reste en mémoire
+        assert store.get("hot-0") is None
+        assert store.get("hot-1")["status"] == "failed"
+    finally:
+        release.set()
+        store.close()
+
+
+def test_batch_write_removes_journal_entries_and_isolates_bad_rows(session_factory):
+    """Vérifie la sortie du journal avec le résultat, et qu'une ligne invalide ne fait pas perdre le lot."""
+    journal = QueueJournal(session_factory, flush_interval_ms=1)
+    items = [make_done_item(f"batch-{i}") for i in range(3)]
+    for item in items:
+        journal.record_enqueue(item)
+    # Colonne obligatoire manquante : l'écriture de cette ligne échoue
+    items[1].user_email = None
+
+    store = ResultStore(session_factory, journal=journal, flush_interval_ms=50)
+    try:
+        for item in items:
+            store.put(item)
+        assert store.flush(timeout=5)
+        journal.close()
+
+        assert stored_ids(session_factory) == ["batch-0", "batch-2"]
+        assert store.stats()["failed"] == 1
+        db = session_factory()
+        try:
+            # Chaque élément traité sort du journal, y compris celui dont l'écriture a échoué
+            assert db.query(QueuedRequest).count() == 0
+        finally:
+            db.close()
+    finally:
+        store.close()
+
+
+def test_queue_serves_finished_items_from_the_store(session_factory):
+    """Vérifie qu'un élément terminé est consultable sans interruption, puis présent en base."""
+    RequestQueue._instance = None
+    queue = RequestQueue()
+    store = ResultStore(session_factory)
+    queue.attach_result_store(store)
+    queue.start_worker(lambda text, directive, model_name: {"traits": [], "summary": "ok"}, num_workers=1)
+    try:
+        item = make_done_item("queued-0")
+        item.status = QueueItemStatus.WAITING
+        item.result = None
+        queue.enqueue(item)
+
+        # Le statut ne disparaît jamais entre la fin du traitement et l'écriture en base
+        deadline = time.monotonic() + 5
+        while True:
+            status = queue.get_request_status("queued-0")
+            assert status is not None
+            if status["status"] == "completed" or time.monotonic() > deadline:
+                break
+            time.sleep(0.01)
+        assert status["result"]["summary"] == "ok"
+        assert store.flush(timeout=5)
+        assert stored_ids(session_factory) == ["queued-0"]
+    finally:
+        queue.stop_worker()
+        store.close()
+        RequestQueue._instance = None
+
+
+def test_resubmitted_results_are_upserted_in_one_batch(session_factory):
+    """Vérifie qu'un résultat existant est remplacé (surcharge) et le bilan inséré/remplacé."""
+    db = session_factory()
+    db.add(ExtractionResult(request_id="again-0", user_id=3, user_email="store@example.com",
+                            status="failed", error_message="Ancienne erreur"))
+    db.commit()
+    db.close()
+
+    store = ResultStore(session_factory, flush_interval_ms=50)
+    try:
+        store.put(make_done_item("again-0"))
+        store.put(make_done_item("again-1", QueueItemStatus.FAILED))
+        store.put(make_done_item("again-1"))
+        assert store.flush(timeout=5)
+
+        stats = store.stats()
+        assert (stats["inserted"], stats["updated"], stats["failed"]) == (1, 1, 0)
+        assert stats["batches"] == 1
+        db = session_factory()
+        try:
+            rows = {row.request_id: row for row in db.query(ExtractionResult)}
+            assert len(rows) == 2
+            assert rows["again-0"].status == "completed"
+            assert rows["again-0"].error_message is None
+            assert rows["again-0"].result_json["traits"][0]["trait"] == "Rusé"
+            # Le dernier résultat d'un même request_id l'emporte
+            assert rows["again-1"].status == "completed"
+        finally:
+            db.close()
+    finally:
+        store.close()
+
+
+def test_persist_and_webhook_stages_are_stored(session_factory):
+    """Vérifie l'horodatage de l'écriture et de la livraison du webhook, limité à la soumission concernée."""
+    store = ResultStore(session_factory, flush_interval_ms=0)
+    try:
+        old = make_done_item("stage-0")
+        old.timings = {"enqueued": 100.0, "dequeued": 101.0}
+        store.put(old)
+        assert store.flush(timeout=5)
+        assert store.get("stage-0")["timings"]["persisted"] >= 101.0
+
+        store.record_stage(old, "webhook_delivered", 105.0)
+        # Surcharge plus récente : un webhook tardif de l'ancienne soumission ne la modifie pas
+        newer = make_done_item("stage-0")
+        newer.timings = {"enqueued": 200.0}
+        store.put(newer)
+        store.record_stage(old, "webhook_delivered", 206.0)
+        store.record_stage(newer, "webhook_delivered", 207.0)
+        assert store.flush(timeout=5)
+
+        db = session_factory()
+        try:
+            timings = db.query(ExtractionResult).filter_by(request_id="stage-0").one().timings_json
+        finally:
+            db.close()
+        assert timings["enqueued"] == 200.0
+        assert timings["webhook_delivered"] == 207.0
+        assert "persisted" in timings
+    finally:
+        store.close()
+
+
+def test_queue_reads_merge_pending_results_without_waiting(session_factory, monkeypatch):
+    """Vérifie que les lectures de la file n'attendent pas l'écriture et fusionnent les résultats en attente."""
+    import src.database
+    monkeypatch.setattr(src.database, "SessionLocal", session_factory)
+    db = session_factory()
+    db.add(ExtractionResult(request_id="merge-0", user_id=3, user_email="store@example.com",
+                            status="failed", error_message="Ancienne erreur"))
+    db.add(ExtractionResult(request_id="merge-1", user_id=3, user_email="store@example.com",
+                            status="completed", result_json={"traits": []}))
+    db.commit()
+    db.close()
+
+    release = threading.Event()
+
+    def slow_sessions():
+        release.wait(5)
+        return session_factory()
+
+    RequestQueue._instance = None
+    queue = RequestQueue()
+    store = ResultStore(slow_sessions, flush_interval_ms=0)
+    queue.attach_result_store(store)
+    try:
+        # Écriture bloquée : une surcharge de merge-0 et un nouveau résultat restent en attente
+        store.put(make_done_item("merge-0"))
+        store.put(make_done_item("merge-2", QueueItemStatus.FAILED))
+
+        start = time.monotonic()
+        results, cursor = queue.get_results(3)
+        by_ids, _ = queue.get_results(3, request_ids=["merge-0", "merge-2", "merge-9"])
+        recent = {item["request_id"]: item for item in queue.get_user_recent_items(3)}
+        assert time.monotonic() - start < 2
+
+        assert cursor is None
+        assert [(r["request_id"], r["status"]) for r in results] == [
+            ("merge-0", "completed"), ("merge-1", "completed"), ("merge-2", "failed"),
+        ]
+        assert results[0]["result"]["traits"][0]["trait"] == "Rusé"
+        assert [(r["request_id"], r["status"]) for r in by_ids] == [
+            ("merge-0", "completed"), ("merge-2", "failed"), ("merge-9", "unknown"),
+        ]
+        assert recent["merge-0"]["status"] == "completed"
+        assert recent["merge-2"]["error"] == "Délai dépassé"
+    finally:
+        release.set()
+        store.close()
+        RequestQueue._instance = None
+
+    # Après l'arrêt du magasin, les lectures ne bloquent pas
+    assert [r["request_id"] for r in queue.get_results(3)[0]] == ["merge-0", "merge-1", "merge-2"]
+
+
+def test_stage_is_found_by_request_id_and_written_once(session_factory):
+    """Vérifie qu'une étape est horodatée même si l'heure d'ajout relue en base diffère, et jamais réécrite."""
+    from src.services.result_store import record_result_stage
+
+    db = session_factory()
+    # Heure d'ajout relue en base légèrement différente de celle de l'élément (arrondi)
+    db.add(ExtractionResult(request_id="round-0", user_id=3, user_email="store@example.com",
+                            status="completed", timings_json={"enqueued": 0.3}))
+    db.commit()
+    item = make_done_item("round-0")
+    item.timings = {"enqueued": 0.1 + 0.2}
+
+    assert record_result_stage(db, item, "webhook_delivered", 5.0) == 1
+    assert record_result_stage(db, item, "webhook_delivered", 6.0) == 0
+    db.commit()
+    timings = db.query(ExtractionResult).filter_by(request_id="round-0").one().timings_json
+    db.close()
+    assert timings == {"enqueued": 0.3, "webhook_delivered": 5.0}
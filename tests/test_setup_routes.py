@@ -0,0 +1,56 @@
+"""Tests pour l'état du setup initial mis en cache."""
+
+import pytest
+
+from src.api import setup_routes
+
+
+@pytest.fixture
+def env_file(tmp_path, monkeypatch):
+    """Redirige ENV_FILE vers un fichier temporaire et réinitialise le cache."""
+    path = tmp_path / ".env"
+    monkeypatch.setattr(setup_routes, "ENV_FILE", str(path))
+    setup_routes.mark_setup_done(False)
+    yield path
+    setup_routes.mark_setup_done(False)
+
+
+def test_setup_not_done_without_env_file(env_file):
+    """Teste qu'un .env absent signifie que le setup reste à faire."""
+    assert setup_routes.is_setup_done() is False
+
+
+def test_env_file_is_reread_only_when_modified(env_file, monkeypatch):
+    """Teste que le .env n'est relu que lorsque sa date de modification change."""
+    env_file.write_text("PORT=8000\n")
+    reads = []
+    real_open = open
+
+    def counting_open(path, *args, **kwargs):
+        reads.append(path)
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr("builtins.open", counting_open)
+    assert setup_routes.is_setup_done() is False
+    assert setup_routes.is_setup_done() is False
+    assert len(reads) == 1
+
+    env_file.write_text("PORT=8000\nADMIN_EMAIL=admin@example.com\n")
+    assert setup_routes.is_setup_done() is True
+    assert len(reads) == 2
+
+
+def test_setup_done_is_cached(env_file, monkeypatch):
+    """Teste qu'une fois le setup constaté, le fichier n'est plus consulté."""
+    setup_routes.mark_setup_done()
+
+    def fail_stat(path):
+        raise AssertionError("Le .env ne devrait plus être consulté")
+
+    monkeypatch.setattr(setup_routes.os, "stat", fail_stat)
+    assert setup_routes.is_setup_done() is True
+
+    setup_routes.mark_setup_done(False)
+    monkeypatch.undo()
+    monkeypatch.setattr(setup_routes, "ENV_FILE", str(env_file))
+    assert setup_routes.is_setup_done() is False
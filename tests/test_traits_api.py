@@ -36,7 +36,8 @@ def mock_extractor():
 def test_extract_traits_endpoint(mock_validate, test_app):
     """Teste le point de terminaison d'extraction de traits."""
     # Préparation
-    mock_validate.return_value = (MagicMock(email="test@example.com", id=1), MagicMock(id=1))
+    # Administrateur : pas de quota à décompter
+    mock_validate.return_value = _bulk_user()
     
     # Action
     response = test_app.post(
@@ -99,6 +100,22 @@ def test_health_endpoint(test_app):
     assert "version" in data
 
 
+def test_metrics_endpoint(test_app, monkeypatch):
+    """Teste l'exposition des métriques au format texte de Prometheus, réservée au collecteur."""
+    monkeypatch.setenv("METRICS_TOKEN", "jeton-collecteur")
+
+    assert test_app.get("/metrics").status_code == 401
+    assert test_app.get("/metrics", headers={"Authorization": "Bearer autre"}).status_code == 401
+
+    response = test_app.get("/metrics", headers={"Authorization": "Bearer jeton-collecteur"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE character_queue_length gauge" in response.text
+    assert "# TYPE character_llm_request_seconds histogram" in response.text
+    assert "character_db_sessions_total" in response.text
+
+
 @patch("src.api.traits_endpoints.validate_api_token")
 @patch("src.api.traits_endpoints.fetch_text_content")
 @patch("src.api.traits_endpoints.is_url")
@@ -107,7 +124,8 @@ def test_extract_traits_with_url(mock_is_url, mock_fetch, mock_validate, test_ap
     # Préparation
     mock_is_url.return_value = True
     mock_fetch.return_value = "Harry Potter est un jeune sorcier courageux et loyal."
-    mock_validate.return_value = (MagicMock(email="test@example.com", id=1), MagicMock(id=1))
+    # Administrateur : pas de quota à décompter
+    mock_validate.return_value = _bulk_user()
 
     # Action
     response = test_app.post(
@@ -159,7 +177,8 @@ def test_extract_traits_normal_text_not_affected(mock_is_url, mock_fetch, mock_v
     """Vérifie que le texte normal n'est pas affecté par la détection d'URL."""
     # Préparation
     mock_is_url.return_value = False
-    mock_validate.return_value = (MagicMock(email="test@example.com", id=1), MagicMock(id=1))
+    # Administrateur : pas de quota à décompter
+    mock_validate.return_value = _bulk_user()
 
     # Action
     response = test_app.post(
@@ -173,4 +192,274 @@ def test_extract_traits_normal_text_not_affected(mock_is_url, mock_fetch, mock_v
 
     # Vérification
     assert response.status_code == 202
-    mock_fetch.assert_not_called()
\ No newline at end of file
+    mock_fetch.assert_not_called()
+
+def test_stream_unknown_request(test_app):
+    """Vérifie qu'un flux sur un ID inconnu renvoie 404."""
+    with patch("src.api.traits_endpoints.RequestQueue") as mock_queue:
+        mock_queue.return_value.get_request_status.return_value = None
+        response = test_app.get("/api/v1/traits/stream/inconnu-001")
+    assert response.status_code == 404
+
+
+def test_stream_sends_partial_then_final_events(test_app):
+    """Vérifie que le flux SSE envoie les traits déjà reçus, les nouveaux, puis le résultat."""
+    import json
+    import threading
+    import time
+
+    from src.services.queue_events import event_broker
+
+    known = {"trait": "Courageux", "score": 0.9, "category": "Personnalité"}
+    new = {"trait": "Loyal", "score": 0.8, "category": "Personnalité"}
+
+    def publish():
+        deadline = time.monotonic() + 5
+        while not event_broker.has_subscribers(request_id="stream-001") and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # Le trait déjà transmis avec l'état initial est ignoré
+        event_broker.publish({"event": "partial", "request_id": "stream-001", "index": 0, "trait": known},
+                             request_id="stream-001")
+        event_broker.publish({"event": "partial", "request_id": "stream-001", "index": 1, "trait": new},
+                             request_id="stream-001")
+        event_broker.publish({"event": "completed", "request_id": "stream-001", "result": {"traits": [known, new]}},
+                             request_id="stream-001")
+
+    with patch("src.api.traits_endpoints.RequestQueue") as mock_queue:
+        mock_queue.return_value.get_request_status.return_value = {
+            "request_id": "stream-001", "status": "processing", "position": 0, "partial_traits": [known],
+        }
+        publisher = threading.Thread(target=publish)
+        publisher.start()
+        with test_app.stream("GET", "/api/v1/traits/stream/stream-001") as response:
+            assert response.headers["content-type"].startswith("text/event-stream")
+            body = "".join(response.iter_text())
+        publisher.join()
+
+    events = [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+    assert [e["event"] for e in events] == ["partial", "partial", "completed"]
+    assert [e["trait"]["trait"] for e in events[:2]] == ["Courageux", "Loyal"]
+    assert not event_broker.has_subscribers(request_id="stream-001")
+
+
+def test_database_lookups_do_not_block_the_event_loop():
+    """Vérifie que /health répond pendant qu'une consultation de résultat attend la base."""
+    import asyncio
+    import time
+
+    import httpx
+
+    app = create_application(start_worker=False)
+
+    def slow_status(request_id):
+        time.sleep(0.5)  # Requête SQL lente simulée
+        return None
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            lookup = asyncio.create_task(client.get("/api/v1/traits/get_character/lent-001"))
+            await asyncio.sleep(0.05)
+            start = time.perf_counter()
+            health = await client.get("/health")
+            health_latency = time.perf_counter() - start
+            return (await lookup).status_code, health.status_code, health_latency
+
+    with patch("src.services.request_queue.RequestQueue.get_request_status", side_effect=slow_status):
+        lookup_status, health_status, health_latency = asyncio.run(scenario())
+
+    assert lookup_status == 404
+    assert health_status == 200
+    assert health_latency < 0.25
+
+
+def test_queue_events_requires_authentication(test_app):
+    """Teste que le flux de la file du tableau de bord refuse les clients non connectés."""
+    response = test_app.get("/api/v1/queue/events")
+    assert response.status_code == 401
+
+
+def _bulk_user(role="admin"):
+    """Utilisateur et token authentifiés pour les tests d'extraction en masse."""
+    from src.services.auth_service import AuthenticatedToken, AuthenticatedUser
+    return (AuthenticatedUser(id=1, email="bulk@example.com", status="vip", role=role),
+            AuthenticatedToken(id=1, user_id=1))
+
+
+@patch("src.api.traits_endpoints.authenticate_api_token")
+def test_extract_bulk_json_array(mock_auth, test_app):
+    """Teste l'extraction en masse à partir d'un tableau JSON."""
+    from src.services.request_queue import RequestQueue
+
+    mock_auth.return_value = _bulk_user()
+    payload = [
+        {"text": f"Un personnage numéro {i} courageux et loyal.", "request_id": f"bulk-json-{i}"}
+        for i in range(3)
+    ]
+    try:
+        response = test_app.post("/api/v1/traits/extract/bulk", json=payload, headers={"token": "test-token"})
+
+        assert response.status_code == 202
+        data = response.json()
+        assert data["accepted"] == 3
+        assert [item["request_id"] for item in data["items"]] == ["bulk-json-0", "bulk-json-1", "bulk-json-2"]
+        positions = [item["position"] for item in data["items"]]
+        assert positions == sorted(positions)
+        assert RequestQueue().get_request_status("bulk-json-2")["status"] == "waiting"
+    finally:
+        for item in payload:
+            RequestQueue().remove_waiting_request(item["request_id"])
+
+
+@patch("src.api.traits_endpoints.authenticate_api_token")
+def test_extract_bulk_ndjson(mock_auth, test_app):
+    """Teste l'extraction en masse à partir d'un corps NDJSON."""
+    import json
+    from src.services.request_queue import RequestQueue
+
+    mock_auth.return_value = _bulk_user()
+    lines = [
+        json.dumps({"text": f"Une héroïne numéro {i} rusée et patiente.", "request_id": f"bulk-nd-{i}"})
+        for i in range(2)
+    ]
+    try:
+        response = test_app.post(
+            "/api/v1/traits/extract/bulk",
+            content="\n".join(lines) + "\n\n",
+            headers={"token": "test-token", "Content-Type": "application/x-ndjson"},
+        )
+
+        assert response.status_code == 202
+        assert [item["request_id"] for item in response.json()["items"]] == ["bulk-nd-0", "bulk-nd-1"]
+    finally:
+        for i in range(2):
+            RequestQueue().remove_waiting_request(f"bulk-nd-{i}")
+
+
+@patch("src.api.traits_endpoints.rate_limiter")
+@patch("src.api.traits_endpoints.authenticate_api_token")
+def test_extract_bulk_rejects_batch_over_quota(mock_auth, mock_limiter, test_app):
+    """Teste que le lot est refusé en entier si le quota restant est insuffisant."""
+    mock_auth.return_value = _bulk_user(role="user")
+    mock_limiter.remaining.return_value = 1
+    payload = [
+        {"text": f"Un personnage numéro {i} courageux et loyal.", "request_id": f"bulk-quota-{i}"}
+        for i in range(2)
+    ]
+
+    response = test_app.post("/api/v1/traits/extract/bulk", json=payload, headers={"token": "test-token"})
+
+    assert response.status_code == 429
+    mock_limiter.try_consume.assert_not_called()
+
+
+@patch("src.api.traits_endpoints.rate_limiter")
+@patch("src.api.traits_endpoints.validate_api_token")
+def test_extract_consumes_quota_atomically(mock_validate, mock_limiter, test_app):
+    """Teste qu'une requête passée à la vérification préalable est refusée si le décompte atomique échoue."""
+    mock_validate.return_value = _bulk_user(role="user")
+    mock_limiter.try_consume.return_value = False
+
+    response = test_app.post(
+        "/api/v1/traits/extract",
+        json={"text": "Un personnage courageux et loyal.", "request_id": "quota-race"},
+        headers={"token": "test-token"},
+    )
+
+    assert response.status_code == 429
+    mock_limiter.try_consume.assert_called_once()
+    mock_limiter.record.assert_not_called()
+
+
+@patch("src.api.traits_endpoints.authenticate_api_token")
+def test_extract_bulk_reports_invalid_items(mock_auth, test_app):
+    """Teste que les demandes invalides ou en double sont signalées par leur index."""
+    mock_auth.return_value = _bulk_user()
+    payload = [
+        {"text": "Un personnage courageux et loyal.", "request_id": "bulk-dup"},
+        {"text": "court", "request_id": "bulk-short"},
+        {"text": "Un autre personnage courageux.", "request_id": "bulk-dup"},
+    ]
+
+    response = test_app.post("/api/v1/traits/extract/bulk", json=payload, headers={"token": "test-token"})
+
+    assert response.status_code == 422
+    assert [error["index"] for error in response.json()["detail"]] == [1, 2]
+
+
+@pytest.fixture
+def stored_results():
+    """Enregistre trois résultats pour un utilisateur dédié, puis les supprime."""
+    import src.database
+    from src.models.extraction_result import ExtractionResult
+
+    if src.database.engine is None:
+        src.database.init_db()
+    db = src.database.SessionLocal()
+    db.query(ExtractionResult).filter(ExtractionResult.user_id == 4242).delete()
+    for i in range(3):
+        db.add(ExtractionResult(
+            request_id=f"results-{i}", user_id=4242, user_email="results@example.com",
+            status="completed", result_json={"traits": [], "summary": f"Résumé {i}", "model_used": "model-a"},
+            timings_json={"enqueued": 10.0, "dequeued": 12.5, "persisted": 15.0},
+        ))
+    db.commit()
+    try:
+        yield
+    finally:
+        db.query(ExtractionResult).filter(ExtractionResult.user_id == 4242).delete()
+        db.commit()
+        db.close()
+
+
+def _results_user():
+    from src.services.auth_service import AuthenticatedToken, AuthenticatedUser
+    return (AuthenticatedUser(id=4242, email="results@example.com", status="normal", role="user"),
+            AuthenticatedToken(id=1, user_id=4242))
+
+
+@patch("src.api.traits_endpoints.authenticate_api_token")
+def test_results_by_ids_as_ndjson(mock_auth, test_app, stored_results):
+    """Teste la récupération groupée par identifiants (résultats connus et inconnus)."""
+    import json
+
+    mock_auth.return_value = _results_user()
+    response = test_app.post(
+        "/api/v1/traits/results",
+        json={"request_ids": ["results-2", "results-0", "absent-001"]},
+        headers={"token": "test-token"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    by_id = {line["request_id"]: line for line in lines}
+    assert by_id["results-2"]["result"]["summary"] == "Résumé 2"
+    assert by_id["absent-001"]["status"] == "unknown"
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_get_character_exposes_stage_timings(test_app, stored_results):
+    """Teste l'exposition des horodatages des étapes et de leurs durées."""
+    response = test_app.get("/api/v1/traits/get_character/results-1")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["timings"]["dequeued"] == 12.5
+    assert data["durations"] == {"queue_wait_seconds": 2.5, "persist_seconds": 2.5, "total_seconds": 5.0}
+
+
+@patch("src.api.traits_endpoints.authenticate_api_token")
+def test_results_pagination_with_cursor(mock_auth, test_app, stored_results):
+    """Teste la pagination par curseur de tous les résultats de l'utilisateur."""
+    import json
+
+    mock_auth.return_value = _results_user()
+    first = test_app.post("/api/v1/traits/results", json={"limit": 2}, headers={"token": "test-token"})
+    cursor = int(first.headers["X-Next-Cursor"])
+    second = test_app.post("/api/v1/traits/results", json={"limit": 2, "cursor": cursor},
+                           headers={"token": "test-token"})
+
+    ids = [json.loads(line)["request_id"] for line in first.text.splitlines() + second.text.splitlines()]
+    assert ids == ["results-0", "results-1", "results-2"]
+    assert "X-Next-Cursor" not in second.headers
@@ -44,7 +44,7 @@ def test_traits_extractor_initialization(mock_inference_client_class):
     from unittest.mock import ANY
     extractor = TraitsExtractor(model_name)
     
-    mock_inference_client_class.assert_called_once_with(model=model_name, token=ANY)
+    mock_inference_client_class.assert_called_once_with(model=model_name, token=ANY, timeout=None)
     assert extractor.model_name == model_name
 
 @patch("src.services.traits_extractor.InferenceClient")
@@ -83,4 +83,69 @@ def test_generate_summary_from_llm(mock_inference_client_class, mock_llm_respons
     # Le comportement de fallback generate_summary formaté
     summary = extractor.generate_summary(traits)
     assert "Courageux (Personnalité)" in summary
-    assert "Loyal (Personnalité)" in summary
\ No newline at end of file
+    assert "Loyal (Personnalité)" in summary
+
+@patch("src.services.traits_extractor.InferenceClient")
+def test_extractor_registry_reuses_and_refreshes_on_token_change(mock_inference_client_class, monkeypatch):
+    """Vérifie que le registre réutilise l'extracteur et le recrée si HF_TOKEN change."""
+    from src.services.traits_extractor import ExtractorRegistry
+
+    registry = ExtractorRegistry()
+    monkeypatch.setenv("HF_TOKEN", "token-1")
+
+    first = registry.get("test-model")
+    assert registry.get("test-model") is first
+    assert registry.get("other-model") is not first
+    assert registry.created == 2
+
+    monkeypatch.setenv("HF_TOKEN", "token-2")
+    refreshed = registry.get("test-model")
+    assert refreshed is not first
+    assert refreshed.token == "token-2"
+
+
+@patch("src.services.traits_extractor.InferenceClient")
+def test_extract_traits_records_timings(mock_inference_client_class, mock_llm_response, sample_text):
+    """Vérifie que les durées de l'appel sont renseignées et la pile du client vidée."""
+    mock_client_instance = mock_inference_client_class.return_value
+    mock_client_instance.chat_completion.return_value = mock_llm_response
+
+    extractor = TraitsExtractor("test-model")
+    timings = {}
+    extractor.extract_traits(sample_text, timings=timings)
+
+    assert timings["inference_seconds"] >= 0
+    assert timings["connection_setup_seconds"] == 0
+    mock_client_instance.close.assert_called_once()
+
+
+@patch("src.services.traits_extractor.InferenceClient")
+def test_extract_traits_streams_partial_traits(mock_inference_client_class, sample_text):
+    """Vérifie que chaque trait est émis dès que son objet JSON est complet."""
+    fragments = [
+        'Voici : {"traits": [{"trait": "Cour', 'ageux", "score": 0.9, "category": "Pers',
+        'onnalité"}, {"trait": "Dit \\"loyal\\" {sic}", ', '"score": 0.8}',
+        ']}',
+    ]
+    received = []
+
+    def stream_chunks():
+        for fragment in fragments:
+            # Au moment de produire un fragment, seuls les traits déjà complets ont été émis
+            received.append(len(partial))
+            yield MagicMock(choices=[MagicMock(delta=MagicMock(content=fragment))])
+
+    partial = []
+    mock_client_instance = mock_inference_client_class.return_value
+    mock_client_instance.chat_completion.return_value = stream_chunks()
+
+    extractor = TraitsExtractor("test-model")
+    timings = {}
+    traits, valid_model = extractor.extract_traits(sample_text, timings=timings, on_partial=partial.append)
+
+    assert mock_client_instance.chat_completion.call_args.kwargs["stream"] is True
+    assert [t.trait for t in partial] == ["Courageux", 'Dit "loyal" {sic}']
+    assert received == [0, 0, 0, 1, 2]
+    assert [t.trait for t in traits] == ["Courageux", 'Dit "loyal" {sic}']
+    assert valid_model is True
+    assert timings["first_token_seconds"] <= timings["inference_seconds"]